@@ -0,0 +1,126 @@
+# backend/aggregator.py
+"""Constant-memory, incremental video-level aggregation (EMA + percentile + k-hits).
+
+VideoAggregator replaces the susp_list / full EMA series / per_frame list that
+score_single_video used to keep. Memory is bounded by `bins` + `reservoir` +
+`top_k` regardless of video length.
+
+Tolerance vs. the old exact `np.percentile(ema, p)`:
+  * frames_scored <= reservoir: every EMA value is still held, so video_score
+    and decision are identical.
+  * longer videos: video_score comes from a fixed-bin histogram of the EMA on
+    [0, 1]; every order statistic is placed inside its own bin, so
+    |video_score - exact| <= 1 / bins (2.4e-4 with the default 4096 bins).
+    The decision can only differ when video_score is that close to the
+    threshold. k-hits are counted exactly.
+
+Non-finite suspicions (a flat / black crop gives 0/0 in chroma_luma_mismatch)
+are skipped and counted in `nonfinite`; they don't enter the EMA or `n`.
+"""
+import heapq
+import random
+import numpy as np
+
+def ema_alpha(every: int, fps: float, tau: float) -> float:
+    """EMA weight for one sampled step of `every` frames at `fps`, from a time constant `tau` (seconds)."""
+    return float(min(0.6, max(0.15, 1.0 - np.exp(- (every / max(1.0, fps)) / tau))))
+
+class VideoAggregator:
+    def __init__(self, alpha: float, percentile: float = 95.0, threshold: float = 0.5,
+                 bins: int = 4096, reservoir: int = 2000, top_k: int = 50, seed: int = 1337):
+        self.alpha = float(alpha)
+        self.percentile = float(percentile)
+        self.threshold = float(threshold)
+        self.bins = int(bins)
+        self.hist = np.zeros(self.bins, np.int64)
+        self.reservoir_size = int(reservoir)
+        self.top_k = int(top_k)
+        self.n = 0
+        self.nonfinite = 0
+        self.hits = 0
+        self.ema = None
+        self.last = None
+        self._reservoir = []   # uniform sample of per-frame dicts (all of them while n <= reservoir)
+        self._top = []         # min-heap of (suspicion, frame_idx, dict)
+        self._rng = random.Random(seed)
+
+    def update(self, suspicion: float, detail: dict = None) -> float:
+        """Fold one scored frame in; returns the updated EMA, or None if the suspicion was NaN/inf (skipped)."""
+        s = float(suspicion)
+        if not np.isfinite(s):
+            self.nonfinite += 1
+            return None
+        self.ema = s if self.ema is None else self.alpha * s + (1 - self.alpha) * self.ema
+        self.n += 1
+        self.hist[min(self.bins - 1, max(0, int(self.ema * self.bins)))] += 1
+        if self.ema >= self.threshold:
+            self.hits += 1
+
+        rec = dict(detail or {}, suspicion=s, ema=float(self.ema))
+        self.last = rec
+        if len(self._reservoir) < self.reservoir_size:
+            self._reservoir.append(rec)
+        else:
+            j = self._rng.randrange(self.n)
+            if j < self.reservoir_size:
+                self._reservoir[j] = rec
+        if self.top_k > 0:
+            item = (s, rec.get("frame_idx", self.n), rec)
+            if len(self._top) < self.top_k:
+                heapq.heappush(self._top, item)
+            elif item[:2] > self._top[0][:2]:
+                heapq.heapreplace(self._top, item)
+        return self.ema
+
+    @property
+    def complete(self) -> bool:
+        """True while every frame's detail (and EMA value) is still held."""
+        return self.n <= self.reservoir_size
+
+    def _order_stat(self, k: int) -> float:
+        # k-th smallest EMA value (0-based), placed uniformly inside its histogram bin
+        cum = np.cumsum(self.hist)
+        b = int(np.searchsorted(cum, k, side="right"))
+        before = cum[b - 1] if b else 0
+        return (b + (k - before + 0.5) / self.hist[b]) / self.bins
+
+    def video_score(self) -> float:
+        if self.n == 0:
+            return float("nan")
+        if self.complete:
+            return float(np.percentile([r["ema"] for r in self._reservoir], self.percentile))
+        r = self.percentile / 100.0 * (self.n - 1)
+        lo = int(np.floor(r))
+        v0 = self._order_stat(lo)
+        v1 = self._order_stat(min(lo + 1, self.n - 1))
+        return float(v0 + (r - lo) * (v1 - v0))
+
+    def k_required(self) -> int:
+        return max(3, self.n // 20)
+
+    def decision(self) -> bool:
+        return bool(self.video_score() >= self.threshold and self.hits >= self.k_required())
+
+    def per_frame(self) -> list:
+        """Kept per-frame detail (reservoir + top-K most suspicious), in frame order."""
+        seen, out = set(), []
+        for rec in self._reservoir + [t[2] for t in self._top]:
+            if id(rec) not in seen:
+                seen.add(id(rec)); out.append(rec)
+        return sorted(out, key=lambda r: r.get("frame_idx", 0))
+
+    def ema_values(self) -> np.ndarray:
+        """Retained EMA values in frame order (every frame while `complete`, else a uniform sample)."""
+        recs = sorted(self._reservoir, key=lambda r: r.get("frame_idx", 0))
+        return np.array([r["ema"] for r in recs], np.float64)
+
+    def snapshot(self) -> dict:
+        """Running state for live progress reporting."""
+        return {
+            "frames_scored": self.n,
+            "ema": self.ema,
+            "video_score": self.video_score() if self.n else None,
+            "k_hits": self.hits,
+            "k_required": self.k_required(),
+            "last": self.last,
+        }
@@ -1,15 +1,32 @@
 """Flask API server for NovaGuard deepfake detection."""
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from pathlib import Path
+import contextlib
+import gzip
+import itertools
+import json
 import uuid
 import sys
 import os
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-# Import the scoring function from runner.py
-from runner import score_single_video
+import governor
+import uploads
+
+# host-wide cap on concurrent analyses (ANALYSIS_SLOTS / _QUEUE / _THREADS, see governor.py);
+# BLAS threads must be pinned before NumPy is first imported
+GOVERNOR = governor.Governor.from_env()
+governor.pin_blas_threads(GOVERNOR.threads)
+
+# ANALYSIS_MODE=spool: analyses run in spool.py workers (any host sharing SPOOL_DIR and
+# uploads/); this process only enqueues and reads results
+SPOOL = None
+if os.environ.get("ANALYSIS_MODE", "inline") == "spool":
+    import spool
+    SPOOL = spool.Spool.from_env()
+SPOOL_WAIT_S = float(os.environ.get("SPOOL_WAIT_S", "0"))
 
 app = Flask(__name__)
 
@@ -23,12 +40,24 @@ else:
 
 UPLOAD_FOLDER = Path(__file__).parent / "uploads"
 UPLOAD_FOLDER.mkdir(exist_ok=True)
-HEATMAP_FOLDER = Path(__file__).parent / "out" / "heatmaps"
+HEATMAP_FOLDER = Path(os.environ.get("HEATMAP_DIR", Path(__file__).parent / "out" / "heatmaps"))
 HEATMAP_FOLDER.mkdir(parents=True, exist_ok=True)
 
 ALLOWED_EXTENSIONS = {'mp4', 'mov', 'mkv', 'avi', 'webm', 'm4v'}
+DETAIL_LEVELS = ('summary', 'timeline', 'full')
+GZIP_MIN_BYTES = 4096
+MAX_UPLOAD_BYTES = 500 * 1024 * 1024
+ARTIFACT_CHECK_S = float(os.environ.get("ARTIFACT_CHECK_S", "1.0"))
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+# live sources the API may open, by name: LIVE_SOURCES="lobby=rtsp://cam/stream,desk=0"
+LIVE_SOURCES = dict(s.split("=", 1) for s in os.environ.get("LIVE_SOURCES", "").split(",") if "=" in s)
+LIVE_MAX_S = float(os.environ.get("LIVE_MAX_S", "600"))
+# longest a finalize request blocks on an early analysis before answering 202 (finalize again later)
+EARLY_WAIT_S = float(os.environ.get("EARLY_WAIT_S", "30"))
+SAVE_JOBS = os.environ.get("SAVE_JOBS", "0") == "1"   # keep per-frame features for /api/jobs/.../rescore
+RESCORE_PAGE_MAX = 500   # jobs per /api/jobs/rescore request
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -44,12 +73,199 @@ def round_numbers(obj, decimals=2):
     else:
         return obj
 
+@app.before_request
+def reload_artifacts():
+    """Swap in a newly published model bundle between requests (one stat() per loaded profile)."""
+    import registry
+    registry.refresh(min_interval=ARTIFACT_CHECK_S)
+
+@app.after_request
+def gzip_response(response):
+    """Gzip large JSON bodies for clients that accept it."""
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code >= 300
+            or 'gzip' not in request.headers.get('Accept-Encoding', '').lower()
+            or 'Content-Encoding' in response.headers
+            or response.mimetype != 'application/json'):
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Content-Length'] = str(len(response.get_data()))
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.errorhandler(governor.Busy)
+def busy(e):
+    response = jsonify({"error": e.reason, "retry_after": e.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "service": "NovaGuard API"})
+    load = SPOOL.stats() if SPOOL is not None else GOVERNOR.status()
+    return jsonify({"status": "healthy", "service": "NovaGuard API", "load": load})
+
+def _budget_params(src):
+    """(deadline_ms, max_frames) from the request; ValueError on bad input."""
+    out = []
+    for name, cast in (('deadline_ms', float), ('max_frames', int)):
+        raw = src.get(name)
+        try:
+            v = cast(raw) if raw not in (None, '') else None
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number")
+        if v is not None and v <= 0:
+            raise ValueError(f"{name} must be positive")
+        out.append(v)
+    return tuple(out)
+
+class OptionError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+def _profile(src):
+    """The requested feature profile; OptionError if unknown (400) or not calibrated yet (503)."""
+    import profiles
+    profile = src.get('profile') or profiles.DEFAULT_PROFILE
+    if profile not in profiles.PROFILES:
+        raise OptionError(f"profile must be one of {', '.join(profiles.PROFILES)}")
+    missing = profiles.missing_artifacts(profile)
+    if missing:
+        raise OptionError(f"profile '{profile}' is not calibrated yet", 503, missing=missing)
+    return profile
+
+def _options(src):
+    """Analysis options shared by /api/analyze and chunked uploads; OptionError on bad input."""
+    detail = str(src.get('detail') or 'summary').lower()
+    if detail not in DETAIL_LEVELS:
+        raise OptionError(f"detail must be one of {', '.join(DETAIL_LEVELS)}")
+    try:
+        points = min(5000, max(3, int(src.get('points', 500))))
+    except (TypeError, ValueError):
+        raise OptionError("points must be an integer")
+    profile = _profile(src)
+    sampling = str(src.get('sampling') or 'dense').lower()
+    if sampling not in ('dense', 'adaptive'):
+        raise OptionError("sampling must be dense or adaptive")
+    try:
+        deadline_ms, max_frames = _budget_params(src)
+    except ValueError as e:
+        raise OptionError(str(e))
+    faces = str(src.get('faces') or 'largest').lower()
+    if faces not in ('largest', 'all'):
+        raise OptionError("faces must be largest or all")
+    cascade = str(src.get('cascade') or '0').lower() in ('1', 'true', 'yes')
+    try:
+        cascade_band = float(src.get('cascade_band', 0.1))
+    except (TypeError, ValueError):
+        raise OptionError("cascade_band must be a number")
+    if faces == 'all' and (sampling != 'dense' or deadline_ms or max_frames or cascade):
+        raise OptionError("faces=all supports dense sampling only (no deadline_ms, max_frames or cascade)")
+    return {"detail": detail, "points": points, "profile": profile, "sampling": sampling,
+            "deadline_ms": deadline_ms, "max_frames": max_frames,
+            "cascade": cascade, "cascade_band": cascade_band, "faces": faces}
+
+@app.errorhandler(OptionError)
+def option_error(e):
+    return jsonify({"error": str(e), **e.extra}), e.status
+
+def _score(video_path, opts, job_id=None):
+    # runner (and with it cv2/NumPy/the scaler cache) is imported on first analysis,
+    # so cold starts and lightweight routes like /api/health never load OpenCV.
+    from runner import score_options
+    return score_options(video_path, opts, job_id=job_id, heatmap_root=HEATMAP_FOLDER, save_job=SAVE_JOBS)
+
+def _enqueue(video_path, opts, job_id, src):
+    """Spool mode: queue the analysis; answer with its result if it lands within `wait` s, else 202."""
+    SPOOL.enqueue({"video": str(video_path), "options": opts, "save_job": SAVE_JOBS}, job_id)
+    try:
+        wait = min(600.0, max(0.0, float(src.get('wait', SPOOL_WAIT_S))))
+    except (TypeError, ValueError):
+        wait = SPOOL_WAIT_S
+    return _job_response(SPOOL.wait(job_id, wait) if wait else SPOOL.status(job_id))
+
+def _respond(results, opts, extra=None):
+    # Check for errors in results
+    if "error" in results:
+        print(f"[ERROR] {results['error']}")
+        return jsonify(results), 500
+
+    # Add user-friendly verdict field
+    results["verdict"] = "DEEPFAKE DETECTED" if results["decision"] else "AUTHENTIC"
+    decider = results.get("stages", {}).get(results.get("decided_by"), {})
+    results["confidence"] = float(decider.get("score", results["video_score"]) * 100)
+
+    from encoding import columnar, timeline
+    per_frame = results.pop("per_frame", [])
+    results["detail"] = opts["detail"]
+
+    # Round all summary values to 2 decimal places
+    results = round_numbers(results, decimals=2)
+
+    # Extract frame details for frontend (first 10 frames)
+    results["frame_details"] = round_numbers(per_frame[:10], decimals=2)
+    if opts["detail"] in ('timeline', 'full'):
+        results["timeline"] = timeline(per_frame, points=opts["points"])
+    if opts["detail"] == 'full':
+        results["per_frame"] = columnar(per_frame, decimals=2)
+    results.update(extra or {})
+
+    print(f"[INFO] Analysis complete: {results.get('verdict', 'Unknown')}")
+    print(f"[INFO] Frames scored: {results.get('frames_scored', 0)}, Score: {results.get('video_score', 0):.2f}")
+
+    return jsonify(results), 200
+
+@app.route('/api/probe', methods=['POST'])
+def probe():
+    """Pre-flight: container metadata and the estimated processing time, without analyzing."""
+    if 'video' not in request.files:
+        return jsonify({"error": "No video file provided"}), 400
+    file = request.files['video']
+    if not allowed_file(file.filename):
+        return jsonify({"error": "Invalid file type"}), 400
+    import profiles
+    profile = request.values.get('profile') or profiles.DEFAULT_PROFILE
+    if profile not in profiles.PROFILES:
+        return jsonify({"error": f"profile must be one of {', '.join(profiles.PROFILES)}"}), 400
+    try:
+        deadline_ms, max_frames = _budget_params(request.values)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    import budget
+    from werkzeug.utils import secure_filename
+    filepath = UPLOAD_FOLDER / f"probe_{uuid.uuid4()}_{secure_filename(file.filename)}"
+    file.save(str(filepath))
+    try:
+        info = budget.probe(filepath)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        filepath.unlink(missing_ok=True)
+    every = profiles.get(profile)["every"]
+    return jsonify({
+        "video": info,
+        "profile": profile,
+        "full": budget.plan(info, every),
+        "planned": budget.plan(info, every, deadline_ms=deadline_ms, max_frames=max_frames),
+        "throughput": budget.MODEL.snapshot(),
+        "load": GOVERNOR.status(),
+    })
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
+    # admission before the upload body is read: a full queue costs the client no upload
+    if SPOOL is not None:
+        SPOOL.admit()
+        return _analyze()
+    with GOVERNOR.admit():
+        return _analyze()
+
+def _analyze():
     if 'video' not in request.files:
         return jsonify({"error": "No video file provided"}), 400
     file = request.files['video']
@@ -57,48 +273,281 @@ def analyze():
         return jsonify({"error": "No file selected"}), 400
     if not allowed_file(file.filename):
         return jsonify({"error": "Invalid file type"}), 400
+    opts = _options(request.values)
     try:
         from werkzeug.utils import secure_filename
         original_filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{original_filename}"
+        job_id = str(uuid.uuid4())
+        unique_filename = f"{job_id}_{original_filename}"
         filepath = UPLOAD_FOLDER / unique_filename
         file.save(str(filepath))
 
+        if SPOOL is not None:
+            return _enqueue(filepath, opts, job_id, request.values)
         print(f"[INFO] Analyzing video: {original_filename}")
+        with GOVERNOR.run():
+            results = _score(filepath, opts, job_id)
+        return _respond(results, opts)
+    except governor.Busy:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
-        # Use runner.py's score_single_video function
-        results = score_single_video(
-            video_path=filepath,
-            every=3,
-            tau=0.6,
-            percentile=95.0,
-            heatmap_root=HEATMAP_FOLDER,
-            save_first_n_heatmaps=50
-        )
+# ---------- chunked, resumable uploads (see uploads.py) ----------
 
-        # Check for errors in results
-        if "error" in results:
-            print(f"[ERROR] {results['error']}")
-            return jsonify(results), 500
+@app.errorhandler(uploads.UploadError)
+def upload_error(e):
+    return jsonify({"error": str(e), **e.extra}), e.status
 
-        # Add user-friendly verdict field
-        results["verdict"] = "DEEPFAKE DETECTED" if results["decision"] else "AUTHENTIC"
-        results["confidence"] = float(results["video_score"] * 100)
+@app.route('/api/uploads', methods=['POST'])
+def upload_create():
+    """Start an upload: filename, size (bytes; needed for early analysis) + any /api/analyze options."""
+    src = request.get_json(silent=True) or request.values
+    from werkzeug.utils import secure_filename
+    filename = secure_filename(str(src.get('filename') or ''))
+    if not allowed_file(filename):
+        return jsonify({"error": "Invalid file type"}), 400
+    try:
+        size = int(src['size']) if src.get('size') not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "size must be an integer"}), 400
+    if size is not None and (size <= 0 or size > MAX_UPLOAD_BYTES):
+        return jsonify({"error": "size out of range"}), 413 if size > 0 else 400
+    opts = _options(src)
+    st = uploads.create(UPLOAD_FOLDER, filename, size, opts)
+    return jsonify(dict(uploads.public(st), chunk_bytes=UPLOAD_CHUNK_BYTES)), 201
 
-        # Extract frame details for frontend (first 10 frames)
-        results["frame_details"] = results.get("per_frame", [])[:10]
+@app.route('/api/uploads/<upload_id>', methods=['GET', 'HEAD'])
+def upload_status(upload_id):
+    return jsonify(uploads.public(uploads.load(UPLOAD_FOLDER, upload_id)))
 
-        # Round all numeric values to 2 decimal places
-        results = round_numbers(results, decimals=2)
+@app.route('/api/uploads/<upload_id>', methods=['PUT', 'PATCH'])
+def upload_chunk(upload_id):
+    """Raw body at `Content-Range: bytes start-end/total`; answers with the new offset."""
+    start, total = uploads.parse_content_range(request.headers.get('Content-Range'), request.content_length)
+    st = uploads.write_range(UPLOAD_FOLDER, upload_id, start, request.stream, total,
+                             max_size=MAX_UPLOAD_BYTES)
+    opts = st["options"]
+    if (SPOOL is None and st["early"] is None and st["size"] and st["offset"] < st["size"]
+            and opts["sampling"] == 'dense' and st["filename"].lower().endswith(('.mp4', '.mov', '.m4v'))
+            and uploads.fast_start(st["path"], st["offset"])):
+        # the early analysis holds a queue ticket like any /api/analyze; with none free the
+        # upload just continues and finalize analyses the whole file (under admission)
+        ticket = contextlib.ExitStack()
+        try:
+            ticket.enter_context(GOVERNOR.admit())
+        except governor.Busy:
+            ticket = None
+        if ticket is not None:
+            def run_early(fifo):
+                with ticket, GOVERNOR.run():
+                    return _score(fifo, opts, upload_id)
+            if not uploads.start_early(UPLOAD_FOLDER, st, run_early):
+                ticket.close()
+            st = uploads.load(UPLOAD_FOLDER, upload_id)
+    return jsonify(uploads.public(st))
 
-        print(f"[INFO] Analysis complete: {results.get('verdict', 'Unknown')}")
-        print(f"[INFO] Frames scored: {results.get('frames_scored', 0)}, Score: {results.get('video_score', 0):.2f}")
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def upload_finalize(upload_id):
+    """Check size (+ optional sha256) and return the analysis, reusing an early one when it covered the file."""
+    src = request.get_json(silent=True) or request.values
+    st = uploads.finalize(UPLOAD_FOLDER, upload_id, src.get('sha256'))
+    if SPOOL is not None:
+        SPOOL.admit()
+        return _enqueue(Path(st["path"]), st["options"], upload_id, src)
+    results = None
+    if st["early"] is not None:
+        status, results = uploads.wait_early(UPLOAD_FOLDER, st, timeout=EARLY_WAIT_S)
+        if status == 'running':
+            resp = jsonify(dict(uploads.public(st), status="analyzing"))
+            resp.headers['Retry-After'] = str(max(1, round(EARLY_WAIT_S)))
+            return resp, 202
+    early = results is not None
+    if results is None:
+        with GOVERNOR.admit(), GOVERNOR.run():
+            results = _score(Path(st["path"]), st["options"], upload_id)
+    try:
+        uploads.result_path(UPLOAD_FOLDER, upload_id).unlink(missing_ok=True)
+    except OSError:
+        pass
+    return _respond(results, st["options"], extra={"upload": {
+        "upload_id": upload_id, "bytes": st["size"], "sha256": st["sha256"], "early_analysis": early,
+        "started_at_offset": st["early"]["started_at_offset"] if early else None}})
 
-        return jsonify(results), 200
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+# ---------- bulk images / crop stacks (see bulk.py) ----------
+
+@app.route('/api/score/images', methods=['POST'])
+def score_images():
+    """Score many `images` (multipart, repeatable) and/or one `stack` (.npy/.npz N x H x W x 3) in one request."""
+    import bulk
+    src = request.values
+    profile = _profile(src)  # before admission: an uncalibrated profile is a JSON 503, not a 500
+    flag = lambda k: str(src.get(k) or '0').lower() in ('1', 'true', 'yes')
+    parts, ids = [], []
+    with GOVERNOR.admit():
+        stack = request.files.get('stack')
+        if stack is not None:
+            # spooled to a temp .npy next to the uploads and memory-mapped, never read whole
+            try:
+                arr = bulk.load_stack(stack.stream, stack.filename or 'stack.npy',
+                                      rgb=str(src.get('color') or 'rgb').lower() != 'bgr', tmp_dir=UPLOAD_FOLDER)
+            except bulk.BulkError as e:
+                return jsonify({"error": str(e)}), 400
+            parts.append(bulk.stack_rows(arr))
+            ids.extend(range(len(arr)))
+        images = request.files.getlist('images')
+        if images:
+            labels = [f.filename or f"image-{i}" for i, f in enumerate(images)]
+            parts.append(bulk.decode_images(zip(labels, (f.read for f in images))))
+            ids.extend(labels)
+        if not ids:
+            return jsonify({"error": "No images or stack provided"}), 400
+        items = itertools.chain.from_iterable(parts)
+        with GOVERNOR.run():
+            res = bulk.score_items(items, ids, profile=profile, detect=flag('detect'),
+                                   with_features=flag('features'))
+    cols = res["columns"]
+    for k, v in cols.items():
+        if v and isinstance(v[0], float):
+            cols[k] = [round(x, 4) for x in v]
+    return jsonify(res)
+
+# ---------- live streams (see live.py) ----------
+
+@app.route('/api/live/<name>', methods=['GET'])
+def live_stream(name):
+    """Server-sent events: a sliding-window verdict every `cadence` s for a configured LIVE_SOURCES entry."""
+    if name not in LIVE_SOURCES:
+        return jsonify({"error": "unknown live source", "sources": sorted(LIVE_SOURCES)}), 404
+    src = request.values
+    profile = _profile(src)  # before the source is opened or the 200 starts: JSON 400/503
+    try:
+        kw = {k: float(src.get(k, d)) for k, d in (('cadence', 1.0), ('window', 5.0), ('max_latency_ms', 250.0),
+                                                  ('tau', 0.6), ('percentile', 95.0))}
+        duration = min(LIVE_MAX_S, float(src.get('duration', LIVE_MAX_S)))
+    except (TypeError, ValueError):
+        return jsonify({"error": "cadence, window, max_latency_ms, tau, percentile, duration must be numbers"}), 400
+    if min(kw['cadence'], kw['window'], kw['max_latency_ms'], kw['tau'], duration) <= 0:
+        return jsonify({"error": "cadence, window, max_latency_ms, tau and duration must be positive"}), 400
+
+    # a stream holds an analysis slot for its whole life; take it before the response starts (429 if busy)
+    hold = contextlib.ExitStack()
+    hold.enter_context(GOVERNOR.admit())
+    try:
+        hold.enter_context(GOVERNOR.run(record=False))
+    except governor.Busy:
+        hold.close()
+        raise
+    import live
+    try:
+        verdicts = live.stream_verdicts(LIVE_SOURCES[name], profile=profile, duration=duration, **kw)
+    except ValueError as e:
+        hold.close()
+        return jsonify({"error": str(e)}), 502
+    except BaseException:
+        hold.close()
+        raise
+
+    def events():
+        try:
+            for v in verdicts:
+                yield f"data: {json.dumps(v)}\n\n"
+        finally:
+            verdicts.close()  # client went away: stops the reader thread
+            hold.close()
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# ---------- spooled jobs (ANALYSIS_MODE=spool, see spool.py) ----------
+
+def _job_response(rec):
+    if rec is None:
+        return jsonify({"error": "unknown job"}), 404
+    if rec["state"] == 'done':
+        opts = rec["payload"]["options"]
+        return _respond(rec["result"], opts, extra={"job_id": rec["id"], "attempts": rec["attempts"]})
+    if rec["state"] == 'failed':
+        return jsonify({"job_id": rec["id"], "state": "failed", "attempts": rec["attempts"],
+                        "error": rec["errors"][-1] if rec["errors"] else "failed"}), 500
+    body = {"job_id": rec["id"], "state": rec["state"], "attempts": rec["attempts"],
+            "status_url": f"/api/jobs/{rec['id']}"}
+    if "position" in rec:
+        body["position"] = rec["position"]
+    resp = jsonify(body)
+    resp.headers['Retry-After'] = str(SPOOL.retry_after(rec.get("position", 0)))
+    return resp, 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Spool mode: 202 + state while queued/running, the usual analysis response once done."""
+    if SPOOL is None:
+        return jsonify({"error": "analyses run inline (ANALYSIS_MODE is not spool)"}), 404
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return jsonify({"error": "unknown job"}), 404
+    return _job_response(SPOOL.status(job_id))
+
+# ---------- re-scoring stored jobs (see jobs.py) ----------
+
+def _rescore_params(src):
+    out = {}
+    for name in ('tau', 'percentile', 'threshold'):
+        raw = src.get(name)
+        if raw in (None, ''):
+            continue
+        try:
+            out[name] = float(raw)
+        except (TypeError, ValueError):
+            raise OptionError(f"{name} must be a number")
+    if out.get('tau', 1.0) <= 0 or not 0 <= out.get('percentile', 50.0) <= 100:
+        raise OptionError("tau must be positive and percentile within [0, 100]")
+    return out
+
+@app.route('/api/jobs/<job_id>/rescore', methods=['POST'])
+def job_rescore(job_id):
+    """Recompute a past job's video_score/decision from its stored features (tau, percentile, threshold)."""
+    import jobs
+    params = _rescore_params(request.get_json(silent=True) or request.values)
+    try:
+        return jsonify(jobs.rescore(job_id, **params))
+    except jobs.JobError as e:
+        return jsonify({"error": str(e)}), 404 if "unknown" in str(e) else 409
+
+@app.route('/api/jobs/rescore', methods=['POST'])
+def jobs_rescore():
+    """Backfill: rescore `job_ids`, or one page of the stored jobs (`limit`, `after`), under the same parameters.
+
+    Paging: pass the response's `next_after` as `after` until it is null.
+    """
+    import jobs
+    src = request.get_json(silent=True) or request.values
+    params = _rescore_params(src)
+    ids = src.get('job_ids')
+    if ids is not None and not (isinstance(ids, list) and all(isinstance(i, str) for i in ids)):
+        raise OptionError("job_ids must be a list of strings")
+    try:
+        limit = min(RESCORE_PAGE_MAX, max(1, int(src.get('limit', 100))))
+    except (TypeError, ValueError):
+        raise OptionError("limit must be an integer")
+    if ids is not None and len(ids) > RESCORE_PAGE_MAX:
+        raise OptionError(f"at most {RESCORE_PAGE_MAX} job_ids per request")
+    after = src.get('after')
+    if after is not None and not isinstance(after, str):
+        raise OptionError("after must be a job id")
+    next_after = None
+    if ids is None:
+        ids = jobs.list_ids(after=after, limit=limit + 1)
+        if len(ids) > limit:
+            ids = ids[:limit]
+            next_after = ids[-1]
+    with GOVERNOR.admit(), GOVERNOR.run(record=False):
+        results = jobs.rescore_many(ids, **params)
+    return jsonify({"jobs": results, "changed": sum(1 for r in results if r.get("changed")),
+                    "errors": sum(1 for r in results if "error" in r), "next_after": next_after})
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', '5001'))
@@ -0,0 +1,134 @@
+# backend/artifacts.py
+"""Versioned model bundles: scaler + W/B + thresholds in one checksummed file.
+
+scaler_values.py and tune_loss.py keep writing their usual
+scaler_values_cache.npz / weights.py; tune_loss.py then publish()es the pair it
+trained (the scaler it z-scored with + the weights it fitted) as the profile's
+model_bundle.json with a single atomic rename. A bundle records the
+feature-definition version it was fitted on and a SHA-256 over its payload;
+load() refuses a bundle whose checksum or feature version doesn't match.
+
+registry.py serves the current bundle and swaps in a newer one between API
+requests (registry.refresh()), so recalibrating no longer needs a restart.
+
+    python backend/artifacts.py --profile balanced          # publish from the legacy files
+    python backend/artifacts.py --profile balanced --show
+"""
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = Path(__file__).resolve().parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import profiles
+
+PAYLOAD_KEYS = ("profile", "feature_version", "features", "scaler", "W", "B", "thresh", "thresh_video")
+
+class BundleError(ValueError):
+    pass
+
+def checksum(bundle: dict) -> str:
+    payload = {k: bundle[k] for k in PAYLOAD_KEYS}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def make(profile, mean, scale, count, W, B, thresh, thresh_video, source=None) -> dict:
+    prof = profiles.get(profile)
+    b = {
+        "profile": prof["name"],
+        "feature_version": profiles.feature_version(prof["name"]),
+        "features": list(prof["features"]),
+        "scaler": {"mean": [float(x) for x in mean], "scale": [float(x) for x in scale],
+                   "count": None if count is None else int(count)},
+        "W": [float(x) for x in W],
+        "B": float(B),
+        "thresh": float(thresh),
+        "thresh_video": float(thresh_video),
+    }
+    b["checksum"] = checksum(b)
+    b["created"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    b["version"] = f"{prof['name']}-{time.strftime('%Y%m%d%H%M%S')}-{b['checksum'][:8]}"
+    b["source"] = source or {}
+    return b
+
+def write(bundle: dict, path: Path):
+    """Atomic replace: readers see the old bundle or the new one, never a partial file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(bundle, indent=2) + "\n")
+    os.replace(tmp, path)
+
+def load(path: Path, profile=None) -> dict:
+    try:
+        b = json.loads(Path(path).read_text())
+    except (OSError, ValueError) as e:
+        raise BundleError(f"cannot read bundle {path}: {e}")
+    missing = [k for k in PAYLOAD_KEYS + ("checksum", "version") if k not in b]
+    if missing:
+        raise BundleError(f"bundle {path} lacks {', '.join(missing)}")
+    if checksum(b) != b["checksum"]:
+        raise BundleError(f"bundle {path} failed its checksum")
+    want = profiles.feature_version(profile or b["profile"])
+    if b["feature_version"] != want:
+        raise BundleError(f"bundle {path} was fitted on features {b['feature_version']}, code is {want}")
+    if not (len(b["W"]) == len(b["scaler"]["mean"]) == len(b["scaler"]["scale"]) == len(b["features"])):
+        raise BundleError(f"bundle {path} has inconsistent feature dimensions")
+    return b
+
+def _read_weights(path: Path) -> dict:
+    import runpy
+    ns = runpy.run_path(str(path))
+    return {"W": list(ns["W"]), "B": ns["B"], "thresh": ns.get("THRESH", 0.5),
+            "thresh_video": ns.get("THRESH_VIDEO", ns.get("THRESH", 0.5))}
+
+def _source(path: Path) -> str:
+    # relative to backend/: the bundle is committed, so no machine-specific absolute paths
+    return Path(os.path.relpath(Path(path).resolve(), BACKEND_DIR)).as_posix()
+
+def from_legacy(profile=None, scaler_path=None, weights_path=None) -> dict:
+    """Bundle built from a scaler_values_cache.npz + weights.py (default: the profile's)."""
+    import numpy as np
+    paths = profiles.artifact_paths(profile)
+    scaler_path = Path(scaler_path or paths["scaler"])
+    weights_path = Path(weights_path or paths["weights"])
+    for p in (scaler_path, weights_path):
+        if not p.exists():
+            raise BundleError(f"missing {p}")
+    d = np.load(scaler_path)
+    w = _read_weights(weights_path)
+    count = int(d["count"]) if "count" in d.files else None
+    return make(profile, d["mean"], d["scale"], count, w["W"], w["B"], w["thresh"], w["thresh_video"],
+                source={"scaler": _source(scaler_path), "weights": _source(weights_path)})
+
+def publish(profile=None, scaler_path=None, weights_path=None) -> dict:
+    """Rebuild and atomically replace the profile's bundle; running API workers pick it up.
+
+    Pass the scaler the weights were trained against: a freshly refitted scaler
+    with old weights is not a valid pair (tune_loss.py publishes for that reason).
+    """
+    b = from_legacy(profile, scaler_path, weights_path)
+    path = profiles.artifact_paths(profile)["bundle"]
+    write(b, path)
+    print(f"[artifacts] published {b['version']} -> {path}")
+    return b
+
+def main():
+    ap = argparse.ArgumentParser(description="Publish/inspect the versioned model bundle of a profile.")
+    ap.add_argument("--profile", choices=sorted(profiles.PROFILES), default=profiles.DEFAULT_PROFILE)
+    ap.add_argument("--show", action="store_true", help="Print and verify the current bundle instead")
+    args = ap.parse_args()
+    if args.show:
+        b = load(profiles.artifact_paths(args.profile)["bundle"], args.profile)
+        print(json.dumps({k: b[k] for k in ("version", "created", "feature_version", "thresh_video", "checksum")},
+                         indent=2))
+    else:
+        publish(args.profile)
+
+if __name__ == "__main__":
+    main()
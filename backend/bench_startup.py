@@ -0,0 +1,54 @@
+# backend/bench_startup.py
+"""Cold-start benchmark: import api_server in a fresh interpreter and hit /api/health."""
+from pathlib import Path
+import argparse, json, subprocess, sys
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+PROBE = r"""
+import sys, time, json
+t0 = time.perf_counter()
+import api_server
+t1 = time.perf_counter()
+resp = api_server.app.test_client().get("/api/health")
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_ms": 1000 * (t1 - t0),
+    "health_ms": 1000 * (t2 - t1),
+    "health_status": resp.status_code,
+    "cv2_loaded": "cv2" in sys.modules,
+    "numpy_loaded": "numpy" in sys.modules,
+}))
+"""
+
+def run_once():
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=str(BACKEND_DIR),
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure api_server cold-start import time.")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--max-import-ms", type=float, default=1000.0,
+                    help="Fail if the median import time exceeds this budget")
+    args = ap.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    imp = sorted(r["import_ms"] for r in runs)
+    med = imp[len(imp) // 2]
+    print(f"[bench] import api_server: median={med:.1f}ms  min={imp[0]:.1f}ms  max={imp[-1]:.1f}ms")
+    print(f"[bench] first /api/health: {runs[-1]['health_ms']:.1f}ms (status {runs[-1]['health_status']})")
+
+    problems = []
+    if any(r["cv2_loaded"] for r in runs):
+        problems.append("cv2 imported during startup")
+    if any(r["health_status"] != 200 for r in runs):
+        problems.append("/api/health did not return 200")
+    if med > args.max_import_ms:
+        problems.append(f"median import {med:.1f}ms > budget {args.max_import_ms:.0f}ms")
+    for p in problems:
+        print(f"[fail] {p}")
+    sys.exit(1 if problems else 0)
+
+if __name__ == "__main__":
+    main()
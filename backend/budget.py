@@ -0,0 +1,103 @@
+# backend/budget.py
+"""Deadline / frame-budget planning for score_single_video.
+
+Cost model (per process, updated after every scored video):
+    seconds ~= frames_decoded * decode_s_per_mpx * mpx
+             + frames_scored  * score_s_per_mpx * (mpx * scale**2 + FIXED_MPX)
+Decoding touches every frame (the dense loop reads them all); scoring is
+dominated by the Haar pass, which scales with the (downscaled) frame area, plus
+a roughly constant texture-feature cost expressed as FIXED_MPX of Haar work.
+
+plan() keeps the profile's stride when it fits, else widens it, and only then
+runs face detection on downscaled frames (crops still come from the full
+frame); runner stops early (partial=True)
+if the budget runs out anyway.
+"""
+import math
+import threading
+
+FIXED_MPX = 0.06
+SCALES = (1.0, 0.75)  # below ~0.75 Haar starts missing 80px faces
+MIN_FRAMES = 16      # never plan fewer scored frames than this (unless the video is shorter)
+SAFETY = 0.85        # plan against 85% of the deadline
+
+def info_from_cap(cap) -> dict:
+    """Container metadata of an open capture (no decoding): fps, frame count, size, duration."""
+    import cv2
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    return {"fps": float(fps), "frames": total, "width": w, "height": h,
+            "duration_sec": total / fps if total else None, "mpx": w * h / 1e6}
+
+def probe(path) -> dict:
+    from runner import open_video
+    cap = open_video(path)
+    if not cap.isOpened():
+        raise ValueError(f"cannot open video: {path}")
+    try:
+        return info_from_cap(cap)
+    finally:
+        cap.release()
+
+class ThroughputModel:
+    def __init__(self, decode_s_per_mpx: float = 0.007, score_s_per_mpx: float = 0.28, alpha: float = 0.3):
+        self.decode_s_per_mpx = decode_s_per_mpx
+        self.score_s_per_mpx = score_s_per_mpx
+        self.alpha = alpha
+        self.videos = 0
+        self._lock = threading.Lock()
+
+    def estimate(self, mpx: float, decoded: int, scored: int, scale: float = 1.0) -> float:
+        return (decoded * self.decode_s_per_mpx * mpx
+                + scored * self.score_s_per_mpx * (mpx * scale ** 2 + FIXED_MPX))
+
+    def frame_cost(self, mpx: float, scale: float = 1.0) -> float:
+        return self.score_s_per_mpx * (mpx * scale ** 2 + FIXED_MPX)
+
+    def observe(self, mpx: float, decoded: int, decode_s: float, scored: int, score_s: float, scale: float = 1.0):
+        """Fold one run's measured decode/score time into the model (EMA)."""
+        a = self.alpha
+        with self._lock:
+            if decoded and mpx:
+                d = decode_s / (decoded * mpx)
+                self.decode_s_per_mpx = d if not self.videos else a * d + (1 - a) * self.decode_s_per_mpx
+            if scored:
+                s = score_s / (scored * (mpx * scale ** 2 + FIXED_MPX))
+                self.score_s_per_mpx = s if not self.videos else a * s + (1 - a) * self.score_s_per_mpx
+            self.videos += 1
+
+    def snapshot(self) -> dict:
+        return {"decode_s_per_mpx": self.decode_s_per_mpx, "score_s_per_mpx": self.score_s_per_mpx,
+                "videos_observed": self.videos}
+
+MODEL = ThroughputModel()
+
+def plan(info: dict, every: int, deadline_ms: float = None, max_frames: int = None,
+         model: ThroughputModel = None) -> dict:
+    """Stride + downscale that fit `max_frames` and/or `deadline_ms` for a probed video."""
+    model = model or MODEL
+    total, mpx = info["frames"], info["mpx"]
+    out = {"every": int(every), "scale": 1.0, "fits": True}
+    if total <= 0:  # unknown length: keep the stride, rely on the early stop
+        out["estimated_ms"] = None
+        return out
+    if max_frames:
+        out["every"] = max(out["every"], math.ceil(total / max_frames))
+    if deadline_ms:
+        budget = deadline_ms / 1000.0 * SAFETY - total * model.decode_s_per_mpx * mpx
+        max_every = max(1, total // MIN_FRAMES)
+        for scale in SCALES:
+            need = math.ceil(total * model.frame_cost(mpx, scale) / budget) if budget > 0 else math.inf
+            if max(out["every"], need) <= max(out["every"], max_every):
+                out["every"], out["scale"] = max(out["every"], need), scale
+                break
+        else:
+            # even the widest stride + smallest scale overruns: expect an early stop (partial)
+            out.update(every=max(out["every"], max_every), scale=SCALES[-1], fits=False)
+    scored = math.ceil(total / out["every"])
+    out["frames_planned"] = scored
+    out["estimated_ms"] = 1000.0 * model.estimate(mpx, total, scored, out["scale"])
+    if deadline_ms:
+        out["fits"] = out["fits"] and out["estimated_ms"] <= deadline_ms
+    return out
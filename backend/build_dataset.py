@@ -2,6 +2,8 @@
 from pathlib import Path
 import argparse, csv
 import numpy as np, cv2
+import registry
+import profiles
 
 # Keep in sync with scaler_values/texture_model
 ROI_LOWER_FRAC = 0.55
@@ -69,16 +71,15 @@ def chroma_luma_mismatch(bgr):
     cv = np.corrcoef(Gy.ravel(), Gv.ravel())[0, 1]
     return float(1.0 - 0.5*(cu + cv))
 
-HAAR = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
 def get_face(bgr, target=256):
     g = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-    faces = HAAR.detectMultiScale(g, 1.1, 5, minSize=(80,80))
+    faces = registry.haar().detectMultiScale(g, 1.1, 5, minSize=(80,80))
     if len(faces)==0:
         return cv2.resize(bgr,(target,target),cv2.INTER_AREA)
     x,y,w,h = max(faces, key=lambda f:f[2]*f[3])
     return cv2.resize(bgr[y:y+h, x:x+w], (target,target), cv2.INTER_AREA)
 
-def extract_rows(video_path, label, every=5, max_frames=300):
+def extract_rows(video_path, label, every=5, max_frames=300, profile=None):
     cap = cv2.VideoCapture(str(video_path))
     if not cap.isOpened():
         print(f"[warn] cannot open: {video_path.name}"); return []
@@ -89,6 +90,17 @@ def extract_rows(video_path, label, every=5, max_frames=300):
         if not ok: break
         if idx % every:
             idx += 1; continue
+        row = dict(video=video_path.name, label=label, frame_idx=idx,
+                   time_sec=round(idx/float(fps),3))
+        if (profile or profiles.DEFAULT_PROFILE) != profiles.DEFAULT_PROFILE:
+            import texture_model
+            prof = profiles.get(profile)
+            metrics, _ = texture_model.extract_features(get_face(frame, target=prof["face_size"]), profile)
+            rows.append(dict(row, **metrics))
+            saved += 1
+            if saved >= max_frames: break
+            idx += 1
+            continue
         face = get_face(frame)
         gray = preprocess_gray(face)
         m1 = compute_sharpness(gray)
@@ -98,9 +110,7 @@ def extract_rows(video_path, label, every=5, max_frames=300):
         m3 = edge_glitch_score(gray[y0:H, :])
         m4 = block_boundary_energy(gray)
         m5 = chroma_luma_mismatch(face)
-        rows.append(dict(video=video_path.name, label=label, frame_idx=idx,
-                         time_sec=round(idx/float(fps),3),
-                         sharp_var=m1, high_ratio=m2, edge_glitch=m3,
+        rows.append(dict(row, sharp_var=m1, high_ratio=m2, edge_glitch=m3,
                          block_energy=m4, chroma_mismatch=m5))
         saved += 1
         if saved >= max_frames: break
@@ -112,7 +122,8 @@ def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--real-dir", default="backend/real_data")
     ap.add_argument("--fake-dir", default="backend/test_data")
-    ap.add_argument("--out-csv",  default="backend/dataset.csv")
+    ap.add_argument("--out-csv",  default=None, help="Default: the profile's dataset.csv")
+    ap.add_argument("--profile", choices=sorted(profiles.PROFILES), default=profiles.DEFAULT_PROFILE)
     ap.add_argument("--every", type=int, default=5)
     ap.add_argument("--max-frames", type=int, default=300)
     args = ap.parse_args()
@@ -124,14 +135,15 @@ def main():
     if not fake: raise SystemExit(f"No fake videos in {args.fake_dir}")
     print(f"[info] real={len(real)}  fake={len(fake)}")
 
-    out = Path(args.out_csv); out.parent.mkdir(parents=True, exist_ok=True)
-    cols = ["video","label","frame_idx","time_sec","sharp_var","high_ratio","edge_glitch","block_energy","chroma_mismatch"]
+    out = Path(args.out_csv or profiles.artifact_paths(args.profile)["dataset"])
+    out.parent.mkdir(parents=True, exist_ok=True)
+    cols = ["video","label","frame_idx","time_sec", *profiles.get(args.profile)["features"]]
     with out.open("w", newline="") as f:
         w = csv.DictWriter(f, fieldnames=cols); w.writeheader()
         for p in real:
-            for r in extract_rows(p, label=0, every=args.every, max_frames=args.max_frames): w.writerow(r)
+            for r in extract_rows(p, label=0, every=args.every, max_frames=args.max_frames, profile=args.profile): w.writerow(r)
         for p in fake:
-            for r in extract_rows(p, label=1, every=args.every, max_frames=args.max_frames): w.writerow(r)
+            for r in extract_rows(p, label=1, every=args.every, max_frames=args.max_frames, profile=args.profile): w.writerow(r)
     print(f"[done] wrote {out.resolve()}")
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+# backend/bulk.py
+"""Bulk scoring of still images and pre-extracted face crops (no video involved).
+
+Items are either encoded images (JPEG/PNG/..., decoded with cv2.imdecode) or
+an N x H x W x 3 uint8 stack in a .npy/.npz (RGB by default, as most decoders
+hand it out). Stacks are memory-mapped and images decoded lazily, so only one
+batch is resident. Each item is resized to the profile's face size, or with
+`detect` cropped to its largest Haar face first (the whole item when none is
+found), and scored `batch` at a time through
+texture_model.score_batch. Per-item frame scores come back as columns, flagged
+against the bundle's frame-level THRESH.
+
+    python backend/bulk.py crops.npy
+    python backend/bulk.py thumbs/ --detect --out scores.csv
+"""
+from pathlib import Path
+import argparse
+import csv
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+import cv2
+
+BACKEND_DIR = Path(__file__).resolve().parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import profiles
+import registry
+import texture_model as tm
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+STACK_SUFFIXES = {".npy", ".npz"}
+
+class BulkError(ValueError):
+    pass
+
+def _spool(stream, tmp_dir=None) -> np.ndarray:
+    """Copy a .npy byte stream to a temp file and memory-map it; the file is unlinked once mapped."""
+    with tempfile.NamedTemporaryFile(suffix=".npy", dir=tmp_dir, delete=False) as f:
+        shutil.copyfileobj(stream, f, 1 << 20)
+    try:
+        return np.load(f.name, mmap_mode="r")
+    finally:
+        os.unlink(f.name)
+
+def load_stack(src, name: str = "stack.npy", rgb: bool = True, tmp_dir=None):
+    """(N, H, W, 3) memory-mapped stack from a .npy/.npz path or file object.
+
+    .npy paths are mapped in place; uploads and .npz members are first spooled
+    to a temp .npy under `tmp_dir`, so the pixels are never all resident. Rows
+    come out BGR; pass the result through stack_rows for uint8 crops.
+    """
+    try:
+        if name.lower().endswith(".npz"):
+            with zipfile.ZipFile(src) as z:
+                names = [n[:-4] for n in z.namelist() if n.endswith(".npy")]
+                key = "crops" if "crops" in names else ("images" if "images" in names else names[0])
+                with z.open(key + ".npy") as member:
+                    arr = _spool(member, tmp_dir)
+        elif isinstance(src, (str, Path)):
+            arr = np.load(src, mmap_mode="r")
+        else:
+            arr = _spool(src, tmp_dir)
+    except (OSError, ValueError, IndexError, zipfile.BadZipFile) as e:
+        raise BulkError(f"cannot read {name}: {e}")
+    if arr.ndim != 4 or arr.shape[-1] != 3:
+        raise BulkError(f"{name}: expected an N x H x W x 3 stack, got shape {arr.shape}")
+    if arr.dtype != np.uint8 and arr.dtype.kind != "f":
+        raise BulkError(f"{name}: expected uint8 or float pixels, got {arr.dtype}")
+    return arr[..., ::-1] if rgb else arr
+
+def stack_rows(arr):
+    """uint8 rows of a load_stack result, one at a time; float rows in [0, 1] are scaled."""
+    for row in arr:
+        if row.dtype != np.uint8:
+            row = np.clip(row * 255.0 + 0.5, 0, 255).astype(np.uint8)
+        yield row
+
+def decode_image(data: bytes):
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise BulkError("not a decodable image")
+    return img
+
+def decode_images(sources):
+    """Decode `(label, read)` pairs lazily, one image at a time; failures become BulkError items."""
+    for label, read in sources:
+        try:
+            yield decode_image(read())
+        except (OSError, BulkError) as e:
+            yield BulkError(f"{label}: {e}")
+
+def prepare(img, size: int, detect: bool = False):
+    """(crop, face_found) at size x size."""
+    from runner import crop_face, detect_face
+    img = np.ascontiguousarray(img)
+    box = detect_face(img) if detect else None
+    if box is None:
+        if img.shape[0] == size and img.shape[1] == size:
+            return img, False
+        return cv2.resize(img, (size, size), interpolation=cv2.INTER_AREA), False
+    return crop_face(img, box, target=size), True
+
+def score_items(items, ids=None, profile=None, detect: bool = False, batch: int = 256,
+                with_features: bool = False) -> dict:
+    """Score an iterable of BGR images / crops (or BulkError placeholders); columnar result.
+
+    Items are consumed `batch` at a time, so pass generators (stack_rows over a
+    memory-mapped stack, decode_images) to keep only one batch resident.
+    """
+    t0 = time.perf_counter()
+    prof = profiles.get(profile)
+    art = registry.bundle(prof["name"])
+    size = prof["face_size"]
+    cols = {"id": [], "suspicion": [], "flagged": [], "face_found": []}
+    feats, errors = [], []
+    chunk, chunk_ids, chunk_found = [], [], []
+
+    def flush():
+        if not chunk:
+            return
+        out = tm.score_batch(chunk, prof["name"], art)
+        cols["id"].extend(chunk_ids)
+        cols["suspicion"].extend(out["suspicion"].tolist())
+        cols["flagged"].extend((out["suspicion"] >= art["thresh"]).tolist())
+        cols["face_found"].extend(chunk_found)
+        if with_features:
+            feats.append(out["features"])
+        chunk.clear(); chunk_ids.clear(); chunk_found.clear()
+
+    for i, item in enumerate(items):
+        item_id = ids[i] if ids is not None else i
+        if isinstance(item, Exception):
+            errors.append({"index": i, "id": item_id, "error": str(item)})
+            continue
+        crop, found = prepare(item, size, detect)
+        chunk.append(crop); chunk_ids.append(item_id); chunk_found.append(found if detect else None)
+        if len(chunk) >= batch:
+            flush()
+    flush()
+
+    if with_features:
+        F = np.concatenate(feats) if feats else np.zeros((0, len(prof["features"])), np.float32)
+        for j, name in enumerate(prof["features"]):
+            cols[name] = F[:, j].tolist()
+    n = len(cols["id"])
+    return {
+        "n": n,
+        "profile": prof["name"],
+        "artifact_version": art["version"],
+        "threshold_used": art["thresh"],
+        "detect": bool(detect),
+        "flagged": int(sum(cols["flagged"])),
+        "columns": cols,
+        "errors": errors,
+        "seconds": time.perf_counter() - t0,
+    }
+
+def iter_paths(paths):
+    """Images and stacks under the given files/directories, in sorted order."""
+    for p in map(Path, paths):
+        if p.is_dir():
+            yield from sorted(q for q in p.rglob("*") if q.suffix.lower() in IMAGE_SUFFIXES | STACK_SUFFIXES)
+        else:
+            yield p
+
+def load_paths(paths, rgb: bool = True):
+    """(items, ids): a lazy item iterator; stacks contribute '<file>:<row>' ids.
+
+    Stacks are mapped (and validated) up front; rows and images are only read
+    when score_items reaches them.
+    """
+    parts, ids = [], []
+    for p in iter_paths(paths):
+        if p.suffix.lower() in STACK_SUFFIXES:
+            arr = load_stack(p, p.name, rgb)
+            parts.append(stack_rows(arr))
+            ids.extend(f"{p.name}:{i}" for i in range(len(arr)))
+        else:
+            parts.append(decode_images([(p, p.read_bytes)]))
+            ids.append(str(p))
+    return itertools.chain.from_iterable(parts), ids
+
+def main():
+    ap = argparse.ArgumentParser(description="Score images / face-crop stacks in bulk (no video decoding).")
+    ap.add_argument("inputs", nargs="+", help="Image files, directories of images, or .npy/.npz N x H x W x 3 stacks")
+    ap.add_argument("--profile", choices=sorted(profiles.PROFILES), default=profiles.DEFAULT_PROFILE)
+    ap.add_argument("--detect", action="store_true", help="Crop to the largest Haar face first")
+    ap.add_argument("--bgr", action="store_true", help="Stacks are BGR (default: RGB)")
+    ap.add_argument("--batch", type=int, default=256, help="Crops per feature pass")
+    ap.add_argument("--features", action="store_true", help="Include the raw feature columns")
+    ap.add_argument("--out", default=None, help="Write the columns to .csv or .json (default: JSON to stdout)")
+    args = ap.parse_args()
+
+    try:
+        items, ids = load_paths(args.inputs, rgb=not args.bgr)
+    except BulkError as e:
+        raise SystemExit(f"[error] {e}")
+    res = score_items(items, ids, profile=args.profile, detect=args.detect, batch=args.batch,
+                      with_features=args.features)
+    print(f"[bulk] {res['n']} items in {res['seconds']:.2f}s "
+          f"({res['n'] / max(res['seconds'], 1e-9):.0f}/s), {res['flagged']} flagged, "
+          f"{len(res['errors'])} errors", file=sys.stderr)
+    if args.out and args.out.endswith(".csv"):
+        with open(args.out, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(res["columns"].keys())
+            w.writerows(zip(*res["columns"].values()))
+    elif args.out:
+        Path(args.out).write_text(json.dumps(res))
+    else:
+        print(json.dumps(res))
+
+if __name__ == "__main__":
+    main()
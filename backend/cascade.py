@@ -0,0 +1,117 @@
+# backend/cascade.py
+"""Second (deep) stage of the texture -> Xception cascade.
+
+runner.score_single_video(cascade=True) scores every sampled frame with the
+cheap texture model, keeping the `cascade_crops` most suspicious face crops
+(already resized for the deep model). Only when the texture video score lands
+within `band` of THRESH_VIDEO are those crops sent to deepfake_model; nothing
+is decoded twice. torch, PyYAML and the checkpoint are only needed once a video
+is actually escalated; if they are missing the texture verdict stands and the
+deep stage reports the error.
+"""
+from functools import lru_cache
+from pathlib import Path
+import heapq
+import math
+import sys
+import time
+
+DEEP_DIR = Path(__file__).resolve().parent / "deepfake_model"
+DEFAULT_CROP = {"input_size": 299, "face_margin": 0.25}
+
+def uncertain(score: float, threshold: float, band: float) -> bool:
+    return abs(float(score) - float(threshold)) <= band
+
+@lru_cache(maxsize=None)
+def deep_config(path: str = str(DEEP_DIR / "config.yaml")):
+    import yaml
+    with open(path) as f:
+        cfg = yaml.safe_load(f)
+    ckpt = cfg["model"].get("ckpt_path")
+    if ckpt and not Path(ckpt).is_absolute():
+        cfg["model"]["ckpt_path"] = str(DEEP_DIR / ckpt)
+    return cfg
+
+def crop_spec() -> dict:
+    """Size/margin the deep model wants its face crops at (defaults if the config can't be read)."""
+    try:
+        cfg = deep_config()
+        return {"input_size": int(cfg["model"]["input_size"]),
+                "face_margin": float(cfg["data"]["face_margin"])}
+    except Exception:
+        return dict(DEFAULT_CROP)
+
+class TopCrops:
+    """Min-heap of the k most suspicious (suspicion, frame_idx, crop) seen so far."""
+    def __init__(self, k: int):
+        self.k = int(k)
+        self._heap = []
+
+    def wants(self, suspicion: float, idx: int) -> bool:
+        """True if a frame with this suspicion would be kept (so the crop is worth building).
+
+        Non-finite suspicions (flat crops) are never kept: NaN compares false both ways
+        and would break the heap order.
+        """
+        if self.k <= 0 or not math.isfinite(suspicion):
+            return False
+        return len(self._heap) < self.k or (suspicion, idx) > self._heap[0][:2]
+
+    def push(self, suspicion: float, idx: int, crop):
+        if not math.isfinite(suspicion):
+            return
+        item = (float(suspicion), int(idx), crop)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+        else:
+            heapq.heapreplace(self._heap, item)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def crops(self):
+        """(frame_idxs, crops) in frame order."""
+        items = sorted(self._heap, key=lambda t: t[1])
+        return [t[1] for t in items], [t[2] for t in items]
+
+def _load():
+    if str(DEEP_DIR) not in sys.path:
+        sys.path.insert(0, str(DEEP_DIR))
+    import deepfake_registry
+    from deepfake_model_main import get_device
+    cfg = deep_config()
+    # model only: the crops come from the texture stage, so no MTCNN sampler is loaded
+    model = deepfake_registry.get_model(cfg["model"], cfg["calibration"].get("temperature", 1.0))
+    return cfg, get_device(), model
+
+def deep_score(crops_rgb) -> dict:
+    """Deep-model video record for pre-cropped RGB faces (model loaded once per process)."""
+    cfg, device, model = _load()
+    from deepfake_inference import run_inference
+    from deepfake_model_main import summarize_logits
+    mcfg, icfg = cfg["model"], cfg["inference"]
+    logits = run_inference(
+        model, crops_rgb, mean=mcfg["mean"], std=mcfg["std"],
+        batch_size=icfg["batch_size"], half=icfg["half"], device=device, size=mcfg["input_size"],
+        channels_last=icfg.get("channels_last", False),  # threads: pinned per analysis by governor
+    )
+    rec = summarize_logits("", logits, [{"face": True}] * len(crops_rgb), model, mcfg)
+    rec["threshold"] = float(cfg["calibration"].get("threshold", 0.5))
+    return rec
+
+def run_deep_stage(top: TopCrops) -> dict:
+    """Escalate the kept crops; returns the stage record (score/decision or error, and its cost)."""
+    t0 = time.perf_counter()
+    idxs, crops = top.crops()
+    stage = {"crops": len(crops), "frame_idxs": idxs}
+    if not crops:
+        stage["error"] = "no face crops kept"
+    else:
+        try:
+            rec = deep_score(crops)
+            stage.update(score=rec["score"], ci=rec["ci"], threshold=rec["threshold"],
+                         decision=bool(rec["score"] >= rec["threshold"]))
+        except Exception as e:
+            stage["error"] = f"deep model unavailable: {e!r}"
+    stage["seconds"] = time.perf_counter() - t0
+    return stage
@@ -0,0 +1,62 @@
+# bench_model_cache.py
+# Per-video model overhead before/after the process-level model cache.
+# Uses a small stand-in nn.Module saved to a temporary checkpoint, so it runs
+# without timm/pretrainedmodels or the real Xception weights.
+
+import argparse, functools, os, tempfile, time
+import torch
+import torch.nn as nn
+import deepfake_registry
+
+class StandIn(nn.Module):
+    def __init__(self, num_classes=2, width=64):
+        super().__init__()
+        self.net = nn.Sequential(
+            nn.Conv2d(3, width, 3, stride=2, padding=1), nn.ReLU(),
+            nn.Conv2d(width, width, 3, stride=2, padding=1), nn.ReLU(),
+            nn.AdaptiveAvgPool2d(1), nn.Flatten(), nn.Linear(width, num_classes),
+        )
+        self.register_buffer("temperature", torch.tensor(1.0))
+        self.head_type = "2c"
+
+    def forward(self, x): return self.net(x)
+
+    def set_temperature(self, t): self.temperature = torch.tensor(float(t))
+
+def standin_factory(mcfg, width=64):
+    # mirrors DeepfakeModel: build the network, then torch.load + load_state_dict
+    m = StandIn(mcfg.get('num_classes', 2), width=width)
+    m.load_state_dict(torch.load(mcfg['ckpt_path'], map_location="cpu"))
+    return m
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--videos", type=int, default=50, help="Simulated videos per run")
+    ap.add_argument("--width", type=int, default=256, help="Stand-in conv width (checkpoint size)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        ckpt = os.path.join(d, "standin.pth")
+        torch.save(StandIn(width=args.width).state_dict(), ckpt)
+        mcfg = {"arch": "standin", "ckpt_path": ckpt, "num_classes": 2, "fake_index": 1}
+        factory = functools.partial(standin_factory, width=args.width)
+
+        # before: what score_video did per video
+        t0 = time.perf_counter()
+        for _ in range(args.videos):
+            m = factory(mcfg); m.set_temperature(1.0); m.eval()
+        before = (time.perf_counter() - t0) / args.videos
+
+        # after: process-level cache (first video pays the load)
+        deepfake_registry.clear()
+        t0 = time.perf_counter()
+        for _ in range(args.videos):
+            deepfake_registry.get_model(mcfg, 1.0, factory=factory)
+        after = (time.perf_counter() - t0) / args.videos
+
+    print(f"[bench] checkpoint {os.path.basename(ckpt)} width={args.width}, {args.videos} videos")
+    print(f"[bench] per-video model overhead: before={1000*before:.2f}ms  after={1000*after:.3f}ms  "
+          f"({before/max(after,1e-9):.0f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,51 @@
 import numpy as np
-import torch
 
-@torch.no_grad()
-def bootstrap_ci(fake_logits, B=500, alpha=0.05):
-    if fake_logits.numel() == 0:
+# Vectorized (block) bootstrap shared by deepfake_model_main and the texture runner.
+# NumPy only, so runner can use it without importing torch.
+
+def _as_numpy(x):
+    if hasattr(x, "detach"):  # torch tensor
+        x = x.detach().cpu().numpy()
+    return np.asarray(x, dtype=np.float64).ravel()
+
+def resample_index(n, B=500, block=None, seed=1337):
+    """
+    [B, n] index matrix for B bootstrap resamples of n observations.
+    block=None: iid resampling; block=L (or "auto" = ceil(n ** (1/3))): moving-block
+    bootstrap with blocks of L consecutive frames, for temporally correlated series.
+    """
+    rng = np.random.default_rng(seed)
+    if block == "auto":
+        block = int(np.ceil(n ** (1 / 3)))
+    if not block or block <= 1 or n <= block:
+        return rng.integers(0, n, size=(B, n))
+    k = -(-n // block)
+    starts = rng.integers(0, n - block + 1, size=(B, k))
+    return (starts[:, :, None] + np.arange(block)).reshape(B, k * block)[:, :n]
+
+def bootstrap_stat(x, stat="mean", B=500, block=None, seed=1337, q=None):
+    """B bootstrap replicates of a statistic ("mean" or "percentile" with q) in one batched op."""
+    x = _as_numpy(x)
+    s = x[resample_index(len(x), B=B, block=block, seed=seed)]
+    if stat == "mean":
+        return s.mean(axis=1)
+    if stat == "percentile":
+        return np.percentile(s, q, axis=1)
+    raise ValueError(f"unknown stat {stat!r}")
+
+def bootstrap_ci(fake_logits, B=500, alpha=0.05, block=None, seed=1337):
+    """CI of sigmoid(mean per-frame fake logit)."""
+    if len(_as_numpy(fake_logits)) == 0:
+        return (float('nan'), float('nan'))
+    m = bootstrap_stat(fake_logits, "mean", B=B, block=block, seed=seed)
+    samples = 1 / (1 + np.exp(-m))
+    lo, hi = np.quantile(samples, [alpha/2, 1-alpha/2])
+    return float(lo), float(hi)
+
+def percentile_ci(values, q, B=500, alpha=0.05, block="auto", seed=1337):
+    """CI of the q-th percentile of a (temporally correlated) per-frame series."""
+    if len(_as_numpy(values)) == 0:
         return (float('nan'), float('nan'))
-    fl = fake_logits.numpy()
-    samples = []
-    n = len(fl)
-    rng = np.random.default_rng(1337)
-    for _ in range(B):
-        idx = rng.integers(0, n, size=n)
-        m = fl[idx].mean()
-        samples.append(1/(1+np.exp(-m)))
+    samples = bootstrap_stat(values, "percentile", B=B, block=block, seed=seed, q=q)
     lo, hi = np.quantile(samples, [alpha/2, 1-alpha/2])
     return float(lo), float(hi)
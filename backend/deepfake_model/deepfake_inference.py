@@ -16,79 +16,86 @@ class CropDataset(Dataset):
         t = (t - self.mean) / self.std
         return t
 
-@torch.no_grad()
-def run_inference(model, crops, mean, std, batch_size=64, half=True, device="cuda", size=299):
+def _as_batch_array(crops):
+    """Crops (N×H×W×C array or list of H×W×C) -> N×H×W×3 array; gray/RGBA handled once for the stack."""
+    import numpy as np
+    arr = crops if isinstance(crops, np.ndarray) else np.stack([np.asarray(c) for c in crops])
+    if arr.ndim == 3:                 # N×H×W gray
+        arr = np.repeat(arr[..., None], 3, axis=3)
+    if arr.shape[3] == 4:             # RGBA → RGB
+        arr = arr[..., :3]
+    return arr
+
+@torch.inference_mode()
+def run_inference(model, crops, mean, std, batch_size=64, half=True, device="cuda", size=299,
+                  channels_last=False):
     """
-    Run the model on a list of face crops.
+    Run the model on a stack of face crops.
 
     Args:
         model: torch.nn.Module
-        crops: list of HxWxC numpy arrays (uint8 or float), RGB or BGR is fine
+        crops: N×H×W×C numpy array (as returned by FaceSampler) or a list of H×W×C arrays;
+               uint8 in [0,255] or float (a float stack with max <= 1 is taken as [0,1])
         mean, std: iterable of 3 floats (channel-wise), e.g. [0.5,0.5,0.5]
         batch_size: inference batch size
         half: if True, try FP16; will only be used when device starts with 'cuda'
         device: 'cuda' or 'cpu'
-        size: side length to resize crops to (e.g., 299 for Xception)
+        size: side length to resize crops to (e.g., 299 for Xception); skipped when crops already match
+        channels_last: use NHWC memory format for the model and the input buffer
+
+    Preprocessing runs on the whole batch and writes into one reusable, preallocated
+    input tensor: uint8 → device, permute + scale/shift in place, no per-crop tensors.
 
     Returns:
         torch.FloatTensor of logits on CPU with shape [N, num_classes]
     """
     import numpy as np
-    import torch
     import cv2
 
     # no crops → empty logits
-    if not crops:
+    if len(crops) == 0:
         return torch.empty((0, 2))
 
+    arr = _as_batch_array(crops)
+    n, h, w = arr.shape[:3]
+
     # only enable half precision on CUDA
     use_half = bool(half) and str(device).startswith("cuda")
+    dtype = torch.float16 if use_half else torch.float32
+    fmt = torch.channels_last if channels_last else torch.contiguous_format
 
     model = model.to(device).eval()
     if use_half:
         model.half()
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
 
-    # prepare normalization tensors
-    mean = np.asarray(mean, dtype=np.float32).reshape(3, 1, 1)
-    std = np.asarray(std, dtype=np.float32).reshape(3, 1, 1)
-
-    def preprocess(img):
-        # img: HxWxC (uint8/float), possible gray/RGBA
-        if img.ndim == 2:
-            img = np.repeat(img[..., None], 3, axis=2)
-        if img.shape[2] == 4:  # RGBA → RGB
-            img = img[:, :, :3]
-
-        img = img.astype(np.float32)
-        if img.max() > 1.0:
-            img /= 255.0
-
-        # resize with area interpolation for downscale quality
-        img = cv2.resize(img, (size, size), interpolation=cv2.INTER_AREA)
-
-        # HWC → CHW and normalize
-        img = np.transpose(img, (2, 0, 1))
-        img = (img - mean) / std
-        t = torch.from_numpy(img)  # float32 CHW
-        return t
+    # x = (v / peak - mean) / std  ==  v * a - b, per channel
+    peak = 1.0 if (arr.dtype.kind == "f" and float(arr.max()) <= 1.0) else 255.0
+    std_t = torch.tensor(std, dtype=torch.float32).view(1, 3, 1, 1)
+    a = (1.0 / (peak * std_t)).to(device, dtype)
+    b = (torch.tensor(mean, dtype=torch.float32).view(1, 3, 1, 1) / std_t).to(device, dtype)
 
-    tensors = [preprocess(c) for c in crops]
+    bs = min(int(batch_size), n)
+    buf = torch.empty((bs, 3, size, size), dtype=dtype, device=device).contiguous(memory_format=fmt)
+    resize_buf = np.empty((bs, size, size, 3), dtype=arr.dtype) if (h, w) != (size, size) else None
 
     all_logits = []
-    n = len(tensors)
-    i = 0
-    while i < n:
-        batch = tensors[i : i + batch_size]
-        x = torch.stack(batch, dim=0)  # [B,3,H,W]
-        if use_half:
-            x = x.half()
-        x = x.to(device, non_blocking=True)
-
-        with torch.no_grad():
-            logits = model(x)
-
-        all_logits.append(logits.detach().to("cpu"))
-        i += batch_size
+    for i in range(0, n, bs):
+        batch = arr[i : i + bs]
+        k = len(batch)
+        if resize_buf is not None:
+            # resize with area interpolation for downscale quality
+            for j in range(k):
+                resize_buf[j] = cv2.resize(batch[j], (size, size), interpolation=cv2.INTER_AREA)
+            batch = resize_buf[:k]
+        src = torch.from_numpy(np.ascontiguousarray(batch)).to(device, non_blocking=True)
+        x = buf[:k]
+        x.copy_(src.permute(0, 3, 1, 2))    # HWC → CHW (+ dtype cast) into the reused buffer
+        x.mul_(a).sub_(b)
+
+        logits = model(x)
+        all_logits.append(logits.float().to("cpu"))
 
     return torch.cat(all_logits, dim=0)
 
@@ -0,0 +1,189 @@
+# deepfake_manifest_runner.py
+# Resumable, parallel scoring of many videos (--dir / --manifest).
+# - Fresh output by default; with resume=True, skips paths already in the output JSONL
+#   with the same config hash (error records are retried)
+# - Worker processes decode + MTCNN-detect upcoming videos; the main process only runs the model
+# - Inference batches are filled across video boundaries, so they stay full
+# - Each result is appended with a single O_APPEND write (no torn or interleaved lines)
+# - A failed inference batch or summary writes error records for its videos; the run goes on
+
+import collections, hashlib, json, os
+import multiprocessing as mp
+import numpy as np
+import torch
+
+import deepfake_registry
+from deepfake_inference import run_inference
+from deepfake_model_main import get_device, load_components, summarize_logits
+
+def config_hash(cfg):
+    """Hash of everything that changes a video's score (not paths or batch sizes)."""
+    relevant = {
+        "model": cfg.get("model"),
+        "data": cfg.get("data"),
+        "calibration": cfg.get("calibration"),
+        "half": cfg.get("inference", {}).get("half"),
+    }
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def load_done(out_path, chash):
+    """Paths with a successful record for this config hash; a torn last line is ignored."""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if rec.get("config_hash") == chash and "error" not in rec:
+                done.add(rec.get("path"))
+    return done
+
+def append_jsonl(fd, obj):
+    os.write(fd, (json.dumps(obj) + "\n").encode())
+
+# ---------- sampling workers ----------
+
+_WORKER = {}
+
+def _init_worker(cfg):
+    torch.set_num_threads(1)  # many workers; keep each one single-threaded
+    _WORKER["cfg"] = cfg
+    _WORKER["sampler"] = deepfake_registry.get_sampler(cfg["data"], cfg["model"]["input_size"], "cpu")
+
+def _sample(path, cfg=None, sampler=None):
+    cfg = cfg or _WORKER["cfg"]
+    sampler = sampler or _WORKER["sampler"]
+    scfg = cfg["data"]
+    try:
+        crops, meta = sampler.sample(path, max_frames=scfg["max_frames"], chunk=scfg.get("chunk_size", 32))
+        return path, crops, meta, None
+    except Exception as e:
+        return path, None, None, str(e)
+
+def _sampled(items, cfg, workers, sampler=None):
+    """Yield (path, extra, crops, meta, error) with at most 2*workers videos decoded ahead."""
+    if workers <= 0:
+        for path, extra in items:
+            path, crops, meta, err = _sample(path, cfg, sampler)
+            yield path, extra, crops, meta, err
+        return
+    pool = mp.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(cfg,))
+    inflight = collections.deque()
+    try:
+        it = iter(items)
+        while True:
+            while len(inflight) < 2 * workers:
+                nxt = next(it, None)
+                if nxt is None: break
+                inflight.append((nxt[1], pool.apply_async(_sample, (nxt[0],))))
+            if not inflight: break
+            extra, res = inflight.popleft()
+            path, crops, meta, err = res.get()
+            yield path, extra, crops, meta, err
+    finally:
+        pool.terminate()
+        pool.join()
+
+# ---------- main loop ----------
+
+class _Video:
+    __slots__ = ("path", "extra", "meta", "n", "logits", "got")
+    def __init__(self, path, extra, meta, n):
+        self.path, self.extra, self.meta, self.n = path, extra, meta, n
+        self.logits, self.got = [], 0
+
+def run_many(items, cfg, out_path, workers=0, resume=False):
+    chash = config_hash(cfg)
+    done = load_done(out_path, chash) if resume else set()
+    skipped = 0
+    def todo():
+        nonlocal skipped
+        for path, extra in items:
+            if path in done:
+                skipped += 1; continue
+            yield path, extra
+
+    device = get_device()
+    mcfg, icfg = cfg["model"], cfg["inference"]
+    bs = int(icfg["batch_size"])
+    if workers <= 0:
+        model, sampler = load_components(cfg, device)
+    else:
+        model = deepfake_registry.get_model(mcfg, cfg["calibration"].get("temperature", 1.0))
+        sampler = None
+
+    stats = {"scored": 0, "skipped": 0, "errors": 0}
+    fd = os.open(out_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | (0 if resume else os.O_TRUNC), 0o644)
+    pending = collections.deque()   # (video, crops still waiting for inference)
+    pending_n = 0
+
+    def error(path, extra, err):
+        append_jsonl(fd, {"video": os.path.basename(path), "path": path, **extra,
+                          "error": err, "score": None, "config_hash": chash})
+        stats["errors"] += 1
+
+    def finish(v):
+        try:
+            rec = summarize_logits(v.path, torch.cat(v.logits) if v.logits else torch.empty((0, 2)),
+                                   v.meta, model, mcfg)
+        except Exception as e:
+            error(v.path, v.extra, str(e)); return
+        rec.update(v.extra); rec["config_hash"] = chash
+        append_jsonl(fd, rec); stats["scored"] += 1
+
+    def fail(owners, err):
+        """Error records for every video in a failed batch; drop their crops still pending."""
+        nonlocal pending_n
+        failed = set(map(id, owners))
+        for v in owners:
+            error(v.path, v.extra, err)
+        keep = [(v, arr) for v, arr in pending if id(v) not in failed]
+        pending_n -= sum(len(arr) for v, arr in pending if id(v) in failed)
+        pending.clear(); pending.extend(keep)
+
+    def infer(n):
+        """Run one batch of up to n crops taken from the front of the pending queue."""
+        nonlocal pending_n
+        parts, owners = [], []
+        while pending and sum(len(p) for p in parts) < n:
+            v, arr = pending.popleft()
+            take = min(len(arr), n - sum(len(p) for p in parts))
+            parts.append(arr[:take]); owners.append(v)
+            if take < len(arr):
+                pending.appendleft((v, arr[take:]))
+        batch = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        pending_n -= len(batch)
+        try:
+            logits = run_inference(
+                model, batch, mean=mcfg["mean"], std=mcfg["std"],
+                batch_size=n, half=icfg["half"], device=device, size=mcfg["input_size"],
+                channels_last=icfg.get("channels_last", False),
+            )
+        except Exception as e:
+            fail(owners, f"inference failed: {e}"); return
+        off = 0
+        for v, p in zip(owners, parts):
+            v.logits.append(logits[off:off + len(p)]); v.got += len(p); off += len(p)
+            if v.got == v.n:
+                finish(v)
+
+    try:
+        for path, extra, crops, meta, err in _sampled(todo(), cfg, workers, sampler):
+            if err is not None:
+                error(path, extra, err)
+                continue
+            v = _Video(path, extra, meta, len(crops))
+            if v.n == 0:
+                finish(v); continue
+            pending.append((v, crops)); pending_n += v.n
+            while pending_n >= bs:
+                infer(bs)
+        while pending_n > 0:
+            infer(min(bs, pending_n))
+    finally:
+        os.close(fd)
+    stats["skipped"] = skipped
+    return stats
@@ -1,8 +1,7 @@
 # deepfake_model_main.py  (only the key parts shown; replace your file if easier)
-import argparse, glob, json, os, torch, csv
+import argparse, glob, os, torch, csv
 from deepfake_env import set_seed
-from deepfake_timm import DeepfakeModel
-from deepfake_sampling import FaceSampler
+import deepfake_registry
 from deepfake_inference import run_inference, aggregate_logits
 from deepfake_bootstrap import bootstrap_ci
 
@@ -10,38 +9,45 @@ def load_cfg(path):
     import yaml
     with open(path) as f: return yaml.safe_load(f)
 
-def score_video(video_path, cfg):
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+def get_device():
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+def load_components(cfg, device=None):
+    """Model + FaceSampler for this config, from the process-level cache (loaded once)."""
+    device = device or get_device()
+    mcfg, scfg = cfg['model'], cfg['data']
+    model = deepfake_registry.get_model(mcfg, cfg['calibration'].get('temperature', 1.0))
+    sampler = deepfake_registry.get_sampler(scfg, mcfg['input_size'], device)
+    return model, sampler
+
+def score_video(video_path, cfg, model=None, sampler=None):
+    device = get_device()
 
     mcfg = cfg['model']
-    model = DeepfakeModel(
-        mcfg['arch'],
-        num_classes=mcfg.get('num_classes', 2),
-        ckpt_path=mcfg.get('ckpt_path', None),
-        fake_index=mcfg.get('fake_index', 1),
-    )
-    model.set_temperature(cfg['calibration'].get('temperature', 1.0))
+    if model is None or sampler is None:
+        m, s = load_components(cfg, device)
+        model, sampler = model or m, sampler or s
 
     # sample crops
     scfg = cfg['data']
-    sampler = FaceSampler(
-        fps=scfg['fps'],
-        input_size=mcfg['input_size'],
-        margin=scfg['face_margin'],
-        min_face=scfg['min_face'],
-        align_eyes=scfg['align_eyes'],
-        device=device
-    )
-    crops, meta = sampler.sample(video_path, max_frames=scfg['max_frames'])
-
-    # inference with config mean/std
+    # inference with config mean/std, chunk by chunk while the sampler thread
+    # decodes + detects the next chunk (peak memory: one chunk of frames)
     icfg = cfg['inference']
-    logits = run_inference(
-        model, crops,
-        mean=mcfg['mean'], std=mcfg['std'],
-        batch_size=icfg['batch_size'], half=icfg['half'], device=device
-    )
-
+    chunks, meta = [], []
+    for crops, m in sampler.stream(video_path, max_frames=scfg['max_frames'],
+                                   chunk=scfg.get('chunk_size', 32)):
+        chunks.append(run_inference(
+            model, crops,
+            mean=mcfg['mean'], std=mcfg['std'],
+            batch_size=icfg['batch_size'], half=icfg['half'], device=device,
+            size=mcfg['input_size'], channels_last=icfg.get('channels_last', False)
+        ))
+        meta.extend(m)
+    logits = torch.cat(chunks, dim=0) if chunks else torch.empty((0, 2))
+    return summarize_logits(video_path, logits, meta, model, mcfg)
+
+def summarize_logits(video_path, logits, meta, model, mcfg):
+    """Video-level record (score, CI, face stats) from per-frame logits."""
     if len(logits) == 0:
         return {"video": os.path.basename(video_path), "path": video_path, "score": None, "ci": [None, None], "frames": 0}
 
@@ -60,14 +66,15 @@ def score_video(video_path, cfg):
     else:
         fi = int(mcfg.get('fake_index', 1)); other = 1 - fi
         fake_log = logits[:, fi] - logits[:, other]
-    lo, hi = bootstrap_ci(fake_log, B=300)
+    # block bootstrap: consecutive sampled frames are temporally correlated
+    lo, hi = bootstrap_ci(fake_log, B=300, block="auto")
 
     return {
         "video": os.path.basename(video_path),
         "path": video_path,
         "score": float(p),
         "ci": [float(lo), float(hi)],
-        "frames": int(len(crops)),
+        "frames": int(len(meta)),
         "temp": float(model.temperature),
         "logit_mean": float(logit),
         "face_frames_pct": float(100*sum(m['face'] for m in meta)/max(1,len(meta))),
@@ -91,42 +98,31 @@ def main():
     ap.add_argument("--manifest")
     ap.add_argument("--config", default="config.yaml")
     ap.add_argument("--out")
+    ap.add_argument("--workers", type=int, default=0,
+                    help="Processes decoding + detecting faces ahead of inference (0 = in-process)")
+    ap.add_argument("--resume", action="store_true",
+                    help="Append to --out, skipping paths it already scored with this config (default: start fresh)")
     args = ap.parse_args()
 
+    from deepfake_manifest_runner import run_many
+
     cfg = load_cfg(args.config)
+    if cfg['inference'].get('num_threads'):
+        torch.set_num_threads(int(cfg['inference']['num_threads']))  # process-wide: once, at startup
     out_path = args.out or os.path.join(cfg["io"]["save_dir"], "scores.jsonl")
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-
-    def write(fp, obj):
-        fp.write(json.dumps(obj) + "\n"); fp.flush()
-
-    with open(out_path, "w") as fp:
-        if args.video:
-            try:
-                write(fp, score_video(args.video, cfg))
-            except Exception as e:
-                write(fp, {"video": os.path.basename(args.video), "path": args.video, "error": str(e), "score": None})
-        elif args.dir:
-            for p in iter_videos_from_dir(args.dir):
-                try:
-                    write(fp, score_video(p, cfg))
-                except Exception as e:
-                    write(fp, {"video": os.path.basename(p), "path": p, "error": str(e), "score": None})
-        elif args.manifest:
-            for p, lbl, split in iter_videos_from_manifest(args.manifest):
-                try:
-                    res = score_video(p, cfg)
-                    res.update({"label": lbl, "split": split})
-                except Exception as e:
-                    res = {"video": os.path.basename(p), "path": p, "label": lbl, "split": split, "error": str(e), "score": None}
-                write(fp, res)
-        else:
-            for p in iter_videos_from_dir(cfg["io"]["input_glob"].rsplit("/**",1)[0]):
-                try:
-                    write(fp, score_video(p, cfg))
-                except Exception as e:
-                    write(fp, {"video": os.path.basename(p), "path": p, "error": str(e), "score": None})
-    print(f"Wrote results to {out_path}")
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+
+    if args.video:
+        items = [(args.video, {})]
+    elif args.dir:
+        items = ((p, {}) for p in iter_videos_from_dir(args.dir))
+    elif args.manifest:
+        items = ((p, {"label": lbl, "split": split}) for p, lbl, split in iter_videos_from_manifest(args.manifest))
+    else:
+        items = ((p, {}) for p in iter_videos_from_dir(cfg["io"]["input_glob"].rsplit("/**",1)[0]))
+
+    stats = run_many(items, cfg, out_path, workers=args.workers, resume=args.resume)
+    print(f"Wrote results to {out_path} ({stats['scored']} scored, {stats['skipped']} already done, {stats['errors']} errors)")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,89 @@
+# deepfake_registry.py
+# Process-level cache of loaded models and face samplers.
+# - One DeepfakeModel per (arch, checkpoint, temperature, num_classes, fake_index)
+# - One FaceSampler per sampler config + device
+# - Reused across videos in --dir/--manifest runs; evict()/clear() drop entries explicitly
+
+import threading
+
+_LOCK = threading.Lock()
+_MODELS = {}
+_SAMPLERS = {}
+
+def model_key(mcfg, temperature=1.0):
+    return (
+        mcfg['arch'],
+        mcfg.get('ckpt_path', None),
+        float(temperature),
+        int(mcfg.get('num_classes', 2)),
+        int(mcfg.get('fake_index', 1)),
+    )
+
+def sampler_key(scfg, input_size, device):
+    return (
+        scfg['fps'], int(input_size), float(scfg['face_margin']),
+        int(scfg['min_face']), bool(scfg['align_eyes']), str(device),
+    )
+
+def _build_model(mcfg):
+    from deepfake_timm import DeepfakeModel
+    return DeepfakeModel(
+        mcfg['arch'],
+        num_classes=mcfg.get('num_classes', 2),
+        ckpt_path=mcfg.get('ckpt_path', None),
+        fake_index=mcfg.get('fake_index', 1),
+    )
+
+def get_model(mcfg, temperature=1.0, factory=None):
+    """Return the cached model for this config, building it (checkpoint load included) once.
+
+    factory(mcfg) -> nn.Module overrides construction (e.g. a stand-in module for benchmarks).
+    """
+    key = model_key(mcfg, temperature)
+    with _LOCK:
+        model = _MODELS.get(key)
+        if model is None:
+            model = (factory or _build_model)(mcfg)
+            model.set_temperature(temperature)
+            model.eval()
+            _MODELS[key] = model
+        return model
+
+def get_sampler(scfg, input_size, device='cpu', factory=None):
+    """Return the cached FaceSampler (MTCNN weights loaded once) for this config."""
+    key = sampler_key(scfg, input_size, device)
+    with _LOCK:
+        sampler = _SAMPLERS.get(key)
+        if sampler is None:
+            if factory is None:
+                from deepfake_sampling import FaceSampler
+                factory = FaceSampler
+            sampler = factory(
+                fps=scfg['fps'],
+                input_size=input_size,
+                margin=scfg['face_margin'],
+                min_face=scfg['min_face'],
+                align_eyes=scfg['align_eyes'],
+                device=device
+            )
+            _SAMPLERS[key] = sampler
+        return sampler
+
+def evict(mcfg=None, temperature=1.0, scfg=None, input_size=None, device='cpu'):
+    """Drop one cached model and/or sampler; returns how many entries were removed."""
+    n = 0
+    with _LOCK:
+        if mcfg is not None:
+            n += _MODELS.pop(model_key(mcfg, temperature), None) is not None
+        if scfg is not None:
+            n += _SAMPLERS.pop(sampler_key(scfg, input_size, device), None) is not None
+    return n
+
+def clear():
+    with _LOCK:
+        _MODELS.clear()
+        _SAMPLERS.clear()
+
+def stats():
+    with _LOCK:
+        return {"models": len(_MODELS), "samplers": len(_SAMPLERS)}
@@ -39,44 +39,104 @@ class FaceSampler:
         areas = [(b[2]-b[0])*(b[3]-b[1]) for b in boxes]
         return int(np.argmax(areas)) if len(areas) else None
 
-    def sample(self, video_path, max_frames=256):
-        # decode video with OpenCV (ok for baseline); replace with decord if preferred
+    def _crop_one(self, img, boxes, probs, landmarks):
+        """Face crop (or center-crop fallback) for one RGB frame given its detections."""
+        if boxes is not None and len(boxes) > 0:
+            keep = [i for i,(b,p) in enumerate(zip(boxes, probs)) if (p is None or p >= 0.90)]
+            if keep:
+                j = self._choose_face(boxes)
+                box = boxes[j]
+                if (box[2]-box[0]) >= self.min_face and (box[3]-box[1]) >= self.min_face:
+                    crop = self._crop_expand(img, box)
+                    if self.align_eyes and landmarks is not None and landmarks[j] is not None:
+                        left_eye, right_eye = landmarks[j][0], landmarks[j][1]
+                        crop = self._align(crop, (left_eye, right_eye))
+                    return cv2.resize(crop, (self.size, self.size), interpolation=cv2.INTER_LINEAR), True
+        # fallback: center crop when no face
+        h,w = img.shape[:2]
+        m = min(h,w); y0, x0 = (h-m)//2, (w-m)//2
+        return cv2.resize(img[y0:y0+m, x0:x0+m], (self.size, self.size), interpolation=cv2.INTER_LINEAR), False
+
+    def _detect_batch(self, frames):
+        """One MTCNN call for a chunk of equally sized frames; per-frame fallback otherwise."""
+        if len({f.shape for f in frames}) == 1:
+            return self.detector.detect(np.stack(frames), landmarks=True)
+        out = [self.detector.detect(f, landmarks=True) for f in frames]
+        return [o[0] for o in out], [o[1] for o in out], [o[2] for o in out]
+
+    def iter_chunks(self, video_path, max_frames=256, chunk=32):
+        """
+        Decode `chunk` sampled frames at a time, detect faces on the whole chunk in one
+        MTCNN call and yield (crops [n,S,S,3] uint8, meta). Peak memory is one chunk
+        of full frames instead of `max_frames`.
+        """
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened(): raise RuntimeError(f"Cannot open {video_path}")
-
         fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
         step = max(1, int(round(fps / self.target_fps)))
-        frames, idx = [], 0
+        idx = sampled = 0
+        try:
+            while sampled < max_frames:
+                frames, vidx = [], []
+                while len(frames) < chunk and sampled + len(frames) < max_frames:
+                    ret, frame = cap.read()
+                    if not ret: break
+                    if idx % step == 0:
+                        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)); vidx.append(idx)
+                    idx += 1
+                if not frames: break
+                boxes, probs, landmarks = self._detect_batch(frames)
+                crops, meta = [], []
+                for k, img in enumerate(frames):
+                    crop, face = self._crop_one(img, boxes[k], probs[k], landmarks[k] if landmarks is not None else None)
+                    crops.append(crop)
+                    meta.append({'frame_idx': sampled + k, 'video_frame': vidx[k], 'face': face})
+                sampled += len(frames)
+                yield np.stack(crops), meta
+                if len(frames) < chunk: break
+        finally:
+            cap.release()
+
+    def stream(self, video_path, max_frames=256, chunk=32, prefetch=2):
+        """
+        iter_chunks() run in a background thread, so decode + detection of the next
+        chunks overlap with whatever the caller does (model inference) on the current one.
+        """
+        import queue, threading
+        q, done = queue.Queue(maxsize=max(1, prefetch)), object()
+        stop = threading.Event()
+
+        def put(item):
+            # every put gives up once the consumer has left, so a full queue never strands the thread
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1); return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for item in self.iter_chunks(video_path, max_frames=max_frames, chunk=chunk):
+                    if not put(item): return
+                put(done)
+            except BaseException as e:
+                put(e)
 
-        while True:
-            ret, frame = cap.read()
-            if not ret: break
-            if idx % step == 0:
-                frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            idx += 1
-            if len(frames) >= max_frames: break
-        cap.release()
+        t = threading.Thread(target=produce, daemon=True)
+        t.start()
+        try:
+            while True:
+                item = q.get()
+                if item is done: break
+                if isinstance(item, BaseException): raise item
+                yield item
+        finally:
+            stop.set()
+            t.join(timeout=1.0)
 
+    def sample(self, video_path, max_frames=256, chunk=32):
         crops, meta = [], []
-        for i, img in enumerate(frames):
-            boxes, probs, landmarks = self.detector.detect(img, landmarks=True)
-            if boxes is not None and len(boxes) > 0:
-                keep = [i for i,(b,p) in enumerate(zip(boxes, probs)) if (p is None or p >= 0.90)]
-                if keep:
-                    j = self._choose_face(boxes)
-                    box = boxes[j]
-                    if (box[2]-box[0]) >= self.min_face and (box[3]-box[1]) >= self.min_face:
-                        crop = self._crop_expand(img, box)
-                        if self.align_eyes and landmarks is not None and landmarks[j] is not None:
-                            left_eye, right_eye = landmarks[j][0], landmarks[j][1]
-                            crop = self._align(crop, (left_eye, right_eye))
-                        crop = cv2.resize(crop, (self.size, self.size), interpolation=cv2.INTER_LINEAR)
-                        crops.append(crop)
-                        meta.append({'frame_idx': i, 'face': True})
-                        continue
-            # fallback: center crop when no face
-            h,w = img.shape[:2]
-            m = min(h,w); y0, x0 = (h-m)//2, (w-m)//2
-            crop = cv2.resize(img[y0:y0+m, x0:x0+m], (self.size, self.size), interpolation=cv2.INTER_LINEAR)
-            crops.append(crop); meta.append({'frame_idx': i, 'face': False})
-        return np.stack(crops) if crops else np.zeros((0, self.size, self.size, 3), dtype=np.uint8), meta
+        for c, m in self.iter_chunks(video_path, max_frames=max_frames, chunk=chunk):
+            crops.append(c); meta.extend(m)
+        return np.concatenate(crops) if crops else np.zeros((0, self.size, self.size, 3), dtype=np.uint8), meta
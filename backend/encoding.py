@@ -0,0 +1,113 @@
+# backend/encoding.py
+"""Compact encodings: columnar per-frame tables, LTTB timeline downsampling, and
+per-frame matrices in an uncompressed .npz that mmap_npz() maps without copying."""
+import json
+import os
+import struct
+import zipfile
+import numpy as np
+
+TIMELINE_FIELDS = ("frame_idx", "time_sec", "suspicion", "ema")
+
+def columnar(rows, fields=None, decimals=2):
+    """[{field: v}, ...] -> {field: [values]}, floats rounded in one vectorized pass per column."""
+    if not rows:
+        return {f: [] for f in (fields or ())}
+    fields = fields or list(rows[0].keys())
+    out = {}
+    for f in fields:
+        col = np.asarray([r.get(f, np.nan) for r in rows])
+        if col.dtype.kind == "f":
+            col = np.round(col, decimals)
+        out[f] = col.tolist()
+    return out
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of `n_out` points that keep the shape of y(x)."""
+    x = np.asarray(x, np.float64); y = np.asarray(y, np.float64)
+    N = len(x)
+    if n_out >= N or n_out < 3:
+        return np.arange(N)
+    every = (N - 2) / (n_out - 2)
+    idx = np.empty(n_out, np.int64)
+    idx[0], a = 0, 0
+    for i in range(n_out - 2):
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        nend = min(int(np.floor((i + 2) * every)) + 1, N)
+        avg_x, avg_y = x[end:nend].mean(), y[end:nend].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+    idx[-1] = N - 1
+    return idx
+
+def timeline(rows, points=500, decimals=3):
+    """Columnar suspicion/EMA timeline, downsampled with LTTB on suspicion."""
+    if not rows:
+        return columnar(rows, TIMELINE_FIELDS, decimals)
+    keep = lttb([r["frame_idx"] for r in rows], [r["suspicion"] for r in rows], points)
+    return columnar([rows[i] for i in keep], TIMELINE_FIELDS, decimals)
+
+# ---------- per-frame matrices (.npz, memory-mappable) ----------
+
+FRAME_FIELDS = (("frame_idx", np.int32), ("time_sec", np.float32), ("suspicion", np.float32),
+                ("ema", np.float32), ("reused", np.bool_), ("interpolated", np.bool_))
+
+class FrameColumns:
+    """Collects aggregated per-frame records (score_single_video's on_frame) into typed columns."""
+    def __init__(self, features):
+        self.features = list(features)
+        self.cols = {f: [] for f, _ in FRAME_FIELDS}
+        self.feat = []
+
+    def __call__(self, rec: dict):
+        for f, dt in FRAME_FIELDS:
+            self.cols[f].append(rec.get(f, False if dt is np.bool_ else np.nan))
+        self.feat.append([rec.get(k, np.nan) for k in self.features])  # NaN for interpolated frames
+
+    def __len__(self):
+        return len(self.feat)
+
+    def arrays(self) -> dict:
+        out = {f: np.asarray(self.cols[f], dt) for f, dt in FRAME_FIELDS}
+        out["features"] = np.asarray(self.feat, np.float32).reshape(-1, len(self.features))
+        out["feature_names"] = np.asarray(self.features, dtype="U")
+        return out
+
+def write_npz(path, arrays: dict, meta: dict = None):
+    """Uncompressed .npz (readable by np.load, mappable by mmap_npz), replaced atomically.
+
+    `meta` is stored as a JSON string in the 0-d member 'meta'.
+    """
+    arrays = dict(arrays)
+    if meta is not None:
+        arrays["meta"] = np.asarray(json.dumps(meta))
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, **arrays)  # ZIP_STORED: members are raw .npy bytes at fixed offsets
+    os.replace(tmp, path)
+
+def mmap_npz(path) -> dict:
+    """{name: read-only np.memmap} for every member of an uncompressed .npz; no data is read."""
+    from numpy.lib import format as fmt
+    out = {}
+    with zipfile.ZipFile(path) as z, open(path, "rb") as f:
+        for info in z.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: member {info.filename} is compressed; cannot map it")
+            f.seek(info.header_offset)
+            name_len, extra_len = struct.unpack("<HH", f.read(30)[26:30])  # local header, not the central one
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = fmt.read_magic(f)
+            read = fmt.read_array_header_1_0 if version == (1, 0) else fmt.read_array_header_2_0
+            shape, fortran, dtype = read(f)
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if dtype.hasobject:
+                raise ValueError(f"{path}: member {name} holds Python objects")
+            if int(np.prod(shape)) == 0:
+                out[name] = np.empty(shape, dtype)
+            else:
+                out[name] = np.memmap(path, dtype=dtype, mode="r", shape=shape,
+                                      order="F" if fortran else "C", offset=f.tell())
+    return out
@@ -0,0 +1,173 @@
+# backend/governor.py
+"""Host-wide admission control for /api/analyze.
+
+Every gunicorn worker on the host shares one lock directory:
+  * `slots` slot-N.lock files: holding one = running an analysis
+  * `slots + queue` ticket-N.lock files: holding one = admitted (running or waiting)
+No free ticket -> Busy (the API answers 429 with Retry-After). flock() locks are
+dropped by the kernel when a process dies, so a crashed worker never leaks a slot.
+A holder also keeps a shared lock on the matching `.held` file; status() counts
+holders by probing those, so polling never takes a lock a request could need.
+stats.json keeps an EMA of analysis wall time; Retry-After is that time x the
+number of waves ahead of a new request.
+
+Each analysis is pinned to `threads` OpenCV/BLAS threads, so `slots` analyses
+use about `slots * threads` cores instead of every worker fanning out to all.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+import fcntl
+import json
+import math
+import os
+import time
+
+THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+class Busy(Exception):
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.retry_after = int(retry_after)
+        self.reason = reason
+
+def pin_blas_threads(threads: int):
+    # only effective before NumPy/BLAS is first imported (api_server imports it lazily)
+    for k in THREAD_ENV:
+        os.environ.setdefault(k, str(threads))
+
+def pin_threads(threads: int):
+    import cv2
+    cv2.setNumThreads(threads)
+    import sys
+    if "torch" in sys.modules:  # cascade stage
+        sys.modules["torch"].set_num_threads(threads)
+
+class Governor:
+    def __init__(self, slots: int = None, queue: int = 8, threads: int = 1,
+                 lock_dir: str = "/tmp/novaguard-governor", max_wait: float = 120.0,
+                 default_seconds: float = 15.0):
+        self.threads = max(1, int(threads))
+        self.slots = max(1, int(slots or (os.cpu_count() or 1) // self.threads))
+        self.queue = max(0, int(queue))
+        self.max_wait = float(max_wait)
+        self.default_seconds = float(default_seconds)
+        self.dir = Path(lock_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        return cls(slots=int(env("ANALYSIS_SLOTS", "0")) or None,
+                   queue=int(env("ANALYSIS_QUEUE", "8")),
+                   threads=int(env("ANALYSIS_THREADS", "1")),
+                   lock_dir=env("GOVERNOR_DIR", "/tmp/novaguard-governor"),
+                   max_wait=float(env("ANALYSIS_MAX_WAIT_S", "120")))
+
+    # ---- lock files ----
+    def _try(self, name: str):
+        fd = os.open(self.dir / name, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+            return None
+
+    def _grab(self, prefix: str, n: int):
+        """(lock fd, held-marker fd) of the first free `prefix` file, or None."""
+        for i in range(n):
+            fd = self._try(f"{prefix}-{i}.lock")
+            if fd is not None:
+                mark = os.open(self.dir / f"{prefix}-{i}.held", os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(mark, fcntl.LOCK_SH)  # waits out a status() probe (microseconds)
+                return fd, mark
+        return None
+
+    def _held(self, prefix: str, n: int) -> int:
+        held = 0
+        for i in range(n):
+            fd = self._try(f"{prefix}-{i}.held")
+            if fd is None:
+                held += 1
+            else:
+                self._release(fd)
+        return held
+
+    @staticmethod
+    def _release(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def _drop(self, handle):
+        lock, mark = handle
+        self._release(mark)
+        self._release(lock)
+
+    # ---- throughput model ----
+    def _stats(self) -> dict:
+        try:
+            return json.loads((self.dir / "stats.json").read_text())
+        except (OSError, ValueError):
+            return {"seconds": self.default_seconds, "n": 0}
+
+    def _record(self, seconds: float, alpha: float = 0.2):
+        fd = os.open(self.dir / "stats.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            st = self._stats()
+            st["seconds"] = seconds if st["n"] == 0 else alpha * seconds + (1 - alpha) * st["seconds"]
+            st["n"] += 1
+            tmp = self.dir / f"stats.{os.getpid()}.tmp"
+            tmp.write_text(json.dumps(st))
+            os.replace(tmp, self.dir / "stats.json")
+        finally:
+            self._release(fd)
+
+    def status(self) -> dict:
+        admitted = self._held("ticket", self.slots + self.queue)
+        running = self._held("slot", self.slots)
+        return {"slots": self.slots, "running": running, "queued": max(0, admitted - running),
+                "queue_max": self.queue, "threads_per_analysis": self.threads,
+                "avg_seconds": self._stats()["seconds"]}
+
+    def retry_after(self, queued: int = None) -> int:
+        """Seconds until a slot should be free for a request arriving now."""
+        if queued is None:
+            queued = self.status()["queued"]
+        waves = (queued + 1) / self.slots
+        return max(1, math.ceil(self._stats()["seconds"] * waves))
+
+    @contextmanager
+    def admit(self):
+        """Hold a queue ticket for the request's lifetime; raises Busy when the queue is full."""
+        ticket = self._grab("ticket", self.slots + self.queue)
+        if ticket is None:
+            raise Busy(self.retry_after(self.queue), "analysis queue is full")
+        try:
+            yield
+        finally:
+            self._drop(ticket)
+
+    @contextmanager
+    def run(self, record: bool = True):
+        """Wait (up to max_wait) for an analysis slot and run the body with pinned thread counts.
+
+        record=False keeps open-ended work (live streams) out of the wall-time average.
+        """
+        deadline = time.monotonic() + self.max_wait
+        slot = self._grab("slot", self.slots)
+        while slot is None:
+            if time.monotonic() > deadline:
+                raise Busy(self.retry_after(), "timed out waiting for an analysis slot")
+            time.sleep(0.05)
+            slot = self._grab("slot", self.slots)
+        try:
+            pin_threads(self.threads)
+            t0 = time.perf_counter()
+            try:
+                yield
+            finally:
+                if record:
+                    self._record(time.perf_counter() - t0)
+        finally:
+            self._drop(slot)
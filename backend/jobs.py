@@ -0,0 +1,257 @@
+# backend/jobs.py
+"""Stored jobs: per-frame raw features of a scored video, re-scorable offline.
+
+score_single_video(save_job=True) writes two files per job into JOBS_DIR:
+  <id>.npz   frame_idx (int32, N) + features (float32, N x F, profile feature order)
+  <id>.json  how it was scored (profile, feature/artifact version, fps, stride,
+             tau, percentile, sampling) and the verdict it got
+One row per sampled frame; frames that reused the previous frame's features
+(dedup) repeat its row. Adaptive jobs store only the frames actually scored.
+Multi-face jobs (multiface.py) have one row per scored face plus a track_id
+array; they are re-aggregated per track, worst voting track decides.
+
+rescore() recomputes suspicion -> EMA -> video_score / decision from the stored
+features under new tau / percentile / threshold or another model bundle, with
+the same VideoAggregator the runner uses, so unchanged parameters reproduce the
+stored score. It does not decode anything: milliseconds per job. The cascade's
+deep stage works on pixels and is not re-run; rescored verdicts are texture-only.
+
+    python backend/jobs.py list
+    python backend/jobs.py prune --days 30
+    python backend/jobs.py rescore --all --threshold 0.55
+    python backend/jobs.py rescore --job <id> --tau 0.4 --bundle path/to/model_bundle.json
+"""
+from pathlib import Path
+import argparse
+import bisect
+import json
+import os
+import sys
+import time
+import uuid
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import profiles
+import registry
+import texture_model as tm
+from aggregator import VideoAggregator, ema_alpha
+
+JOBS_DIR = Path(os.environ.get("JOBS_DIR", BACKEND_DIR / "out" / "jobs"))
+
+class JobError(ValueError):
+    pass
+
+def new_id() -> str:
+    return str(uuid.uuid4())
+
+def _check_id(job_id: str):
+    # ids become file names: no separators, no NULs, no dot-files
+    if (not isinstance(job_id, str) or not job_id or job_id.startswith(".")
+            or any(c in job_id for c in "/\\\0")):
+        raise JobError(f"bad job id: {job_id!r}")
+
+def save(job_id: str, record: dict, frame_idx, features, jobs_dir: Path = None, track_id=None) -> Path:
+    """Write the feature arrays, then the record (atomically); a job without its .json is not listed."""
+    _check_id(job_id)
+    d = Path(jobs_dir or JOBS_DIR)
+    d.mkdir(parents=True, exist_ok=True)
+    frame_idx = np.asarray(frame_idx, np.int32)
+    feats = np.asarray(features, np.float32).reshape(len(frame_idx), len(record["features"]))
+    order = np.argsort(frame_idx, kind="stable")  # adaptive sampling scores out of frame order
+    tmp = d / f".{job_id}.{os.getpid()}.npz"
+    arrays = {"frame_idx": frame_idx[order], "features": feats[order]}
+    if track_id is not None:
+        arrays["track_id"] = np.asarray(track_id, np.int32)[order]
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, d / f"{job_id}.npz")
+    rec = dict(record, job_id=job_id, created=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    tmp = d / f".{job_id}.{os.getpid()}.json"
+    tmp.write_text(json.dumps(rec, indent=2))
+    os.replace(tmp, d / f"{job_id}.json")
+    return d / f"{job_id}.json"
+
+def load(job_id: str, jobs_dir: Path = None) -> dict:
+    """Record + arrays ('frame_idx', 'features', and 'track_id' for multi-face jobs) of one job."""
+    _check_id(job_id)
+    d = Path(jobs_dir or JOBS_DIR)
+    try:
+        rec = json.loads((d / f"{job_id}.json").read_text())
+        with np.load(d / f"{job_id}.npz") as z:
+            rec["frame_idx"], rec["features"] = z["frame_idx"], z["features"]
+            if "track_id" in z.files:
+                rec["track_id"] = z["track_id"]
+    except (OSError, ValueError, KeyError) as e:
+        raise JobError(f"unknown or unreadable job {job_id}: {e}")
+    return rec
+
+def list_ids(jobs_dir: Path = None, after: str = None, limit: int = None) -> list:
+    """Stored job ids in sorted order; `after` / `limit` page through them."""
+    d = Path(jobs_dir or JOBS_DIR)
+    if not d.is_dir():
+        return []
+    ids = sorted(p.stem for p in d.glob("*.json") if not p.name.startswith("."))
+    if after is not None:
+        ids = ids[bisect.bisect_right(ids, after):]
+    return ids if limit is None else ids[:limit]
+
+def prune(max_age_s: float, jobs_dir: Path = None) -> int:
+    """Delete jobs whose record is older than `max_age_s` seconds; returns how many."""
+    d = Path(jobs_dir or JOBS_DIR)
+    cutoff, n = time.time() - max_age_s, 0
+    for jid in list_ids(d):
+        rec = d / f"{jid}.json"
+        try:
+            if rec.stat().st_mtime >= cutoff:
+                continue
+            rec.unlink()   # record first: a job without its .json is no longer listed
+            (d / f"{jid}.npz").unlink(missing_ok=True)
+            n += 1
+        except FileNotFoundError:
+            continue
+    return n
+
+def rescore(job_id: str, tau: float = None, percentile: float = None, threshold: float = None,
+            bundle: dict = None, jobs_dir: Path = None) -> dict:
+    """Re-aggregate one stored job; None keeps the job's own tau / percentile and the bundle's threshold.
+
+    `bundle` is a served bundle (registry.bundle() / registry.load_bundle());
+    default: the one in service for the job's profile now.
+    """
+    t0 = time.perf_counter()
+    job = load(job_id, jobs_dir)
+    name = job["profile"]
+    if job["feature_version"] != profiles.feature_version(name):
+        raise JobError(f"job {job_id} stored features v{job['feature_version']}, "
+                       f"code computes v{profiles.feature_version(name)}; rescan the video")
+    bundle = bundle or registry.bundle(name)
+    if bundle["feature_version"] is not None and bundle["feature_version"] != job["feature_version"]:
+        raise JobError(f"bundle {bundle['version']} was fitted on features v{bundle['feature_version']}, "
+                       f"job {job_id} has v{job['feature_version']}")
+    tau = job["tau"] if tau is None else float(tau)
+    percentile = job["percentile"] if percentile is None else float(percentile)
+    threshold = bundle["thresh_video"] if threshold is None else float(threshold)
+    every, fps = job["every"], job["fps"]
+    alpha = ema_alpha(every, fps, tau)
+
+    idx, susp = job["frame_idx"], tm.suspicions(job["features"], bundle)
+    if job["sampling"] == "adaptive" and len(idx):
+        # same dense series the runner aggregated: finite scored frames + linear interpolation on
+        # the stride grid; flat-crop (NaN) frames are neither keys nor interpolated
+        ok = np.isfinite(susp)
+        keys = idx[ok]
+        grid = np.arange(0, int(keys[-1]) + 1 if len(keys) else 0, every)
+        grid = grid[~np.isin(grid, idx[~ok])]
+        idx, susp = grid, np.interp(grid, keys, susp[ok]) if len(keys) else np.zeros(0)
+
+    def aggregate(rows):
+        agg = VideoAggregator(alpha, percentile=percentile, threshold=threshold,
+                              reservoir=job.get("per_frame_limit", 2000), top_k=0)
+        for i in rows:
+            agg.update(susp[i], {"frame_idx": int(idx[i])})
+        return agg
+
+    worst_track = None
+    if "track_id" in job:
+        # multi-face: one aggregator per track, the worst track lasting min_track_frames decides
+        tids = job["track_id"]
+        aggs = {int(t): aggregate(np.flatnonzero(tids == t)) for t in np.unique(tids)}
+        voting = {t: a for t, a in aggs.items() if a.n and a.n >= job["min_track_frames"]}
+        if not voting:
+            raise JobError(f"job {job_id} has no track of {job['min_track_frames']} frames")
+        worst_track = max(voting, key=lambda t: voting[t].video_score())
+        agg = voting[worst_track]
+        decision = any(a.decision() for a in voting.values())
+    else:
+        agg = aggregate(range(len(idx)))
+        decision = agg.decision()
+    if agg.n == 0:
+        raise JobError(f"job {job_id} has no frames")
+
+    prev = job["result"]
+    out = {
+        "job_id": job_id,
+        "video": job["video"],
+        "profile": name,
+        "artifact_version": bundle["version"],
+        "tau": tau,
+        "ema_alpha": alpha,
+        "percentile": percentile,
+        "threshold_used": threshold,
+        "video_score": agg.video_score(),
+        "decision": decision,
+        "k_required": agg.k_required(),
+        "k_hits": agg.hits,
+        "frames": agg.n,
+        "previous": prev,
+        "changed": decision != prev["decision"],
+        "seconds": time.perf_counter() - t0,
+    }
+    if worst_track is not None:
+        out["worst_track"] = worst_track
+    return out
+
+def rescore_many(job_ids=None, jobs_dir: Path = None, **kw) -> list:
+    """rescore() over `job_ids` (default: every stored job); failures come back as error records."""
+    out = []
+    for jid in (job_ids if job_ids is not None else list_ids(jobs_dir)):
+        try:
+            out.append(rescore(jid, jobs_dir=jobs_dir, **kw))
+        except JobError as e:
+            out.append({"job_id": jid, "error": str(e)})
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="List stored jobs or re-score them from their saved features.")
+    ap.add_argument("--jobs-dir", default=str(JOBS_DIR))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="Stored jobs and the verdict each got")
+    pr = sub.add_parser("prune", help="Delete stored jobs older than --days")
+    pr.add_argument("--days", type=float, required=True)
+    rs = sub.add_parser("rescore", help="Recompute video_score/decision under new parameters")
+    who = rs.add_mutually_exclusive_group(required=True)
+    who.add_argument("--job", action="append", help="Job id (repeatable)")
+    who.add_argument("--all", action="store_true", help="Every stored job")
+    rs.add_argument("--tau", type=float, default=None, help="EMA time constant (default: the job's)")
+    rs.add_argument("--percentile", type=float, default=None, help="Default: the job's")
+    rs.add_argument("--threshold", type=float, default=None, help="Video threshold (default: the bundle's)")
+    rs.add_argument("--bundle", default=None, help="model_bundle.json to score with (default: the served one)")
+    args = ap.parse_args()
+    jobs_dir = Path(args.jobs_dir)
+
+    if args.cmd == "list":
+        for jid in list_ids(jobs_dir):
+            rec = json.loads((jobs_dir / f"{jid}.json").read_text())
+            r = rec["result"]
+            print(f"{jid}  {rec['created']}  {rec['profile']:<9} {Path(rec['video']).name}  "
+                  f"score={r['video_score']:.3f} decision={r['decision']}")
+        return
+
+    if args.cmd == "prune":
+        print(f"[done] {prune(args.days * 86400.0, jobs_dir)} jobs deleted", file=sys.stderr)
+        return
+
+    bundle = None
+    results = []
+    t0 = time.perf_counter()
+    for jid in (args.job or list_ids(jobs_dir)):
+        try:
+            if args.bundle:
+                prof = json.loads((jobs_dir / f"{jid}.json").read_text())["profile"]
+                bundle = registry.load_bundle(args.bundle, prof)
+            res = rescore(jid, tau=args.tau, percentile=args.percentile, threshold=args.threshold,
+                          bundle=bundle, jobs_dir=jobs_dir)
+        except (OSError, ValueError) as e:  # JobError, BundleError, unreadable record
+            res = {"job_id": jid, "error": str(e)}
+        results.append(res)
+        print(json.dumps(res))
+    changed = sum(1 for r in results if r.get("changed"))
+    print(f"[done] {len(results)} jobs in {time.perf_counter() - t0:.3f}s; {changed} decisions changed",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# backend/live.py
+"""Live stream scoring with bounded latency.
+
+A reader thread pulls frames from the source as fast as it delivers them (a
+file can be played back at real-time speed as a stand-in for a camera) into a
+one-slot mailbox: a new frame overwrites one the scorer hasn't taken yet
+(latest-frame-wins), so the scorer always works on the freshest frame and a
+slow scorer drops frames instead of falling behind. The scorer runs the usual
+face crop + texture frame_score + EMA (alpha from the actual time between
+scored frames) and, every `cadence` seconds, emits a verdict over the last
+`window` seconds with end-to-end latency (frame read -> score done) and drop
+rate. When scoring alone no longer fits `max_latency_ms`, face detection drops
+to a downscaled frame (budget.SCALES), and comes back once there is room.
+
+    python backend/live.py 0                          # webcam 0
+    python backend/live.py rtsp://cam/stream --cadence 0.5
+    python backend/live.py uploads/clip.mp4 --duration 20  # file at real-time speed
+"""
+from collections import deque
+from pathlib import Path
+import argparse
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+import cv2
+
+BACKEND_DIR = Path(__file__).resolve().parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import budget
+import profiles
+import registry
+import texture_model as tm
+from aggregator import ema_alpha
+from runner import crop_face, detect_face
+
+class LatestFrame:
+    """One-slot mailbox; put() over an untaken frame drops it."""
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.read = 0
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, frame, ts: float):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = (frame, ts)
+            self.read += 1
+            self._cond.notify()
+
+    def take(self, timeout: float):
+        """(frame, read timestamp), or None on timeout / once closed and drained."""
+        with self._cond:
+            if self._item is None and not self.closed:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+def open_source(source):
+    """cv2.VideoCapture for a webcam index ('0'), URL or file path, plus whether it's a file."""
+    if isinstance(source, int) or str(source).isdigit():
+        return cv2.VideoCapture(int(source)), False
+    src = str(source)
+    if "://" in src:
+        return cv2.VideoCapture(src, cv2.CAP_FFMPEG), False
+    from runner import open_video
+    return open_video(Path(src)), True
+
+def _read_loop(cap, box: LatestFrame, stop: threading.Event, pace_fps: float = None):
+    """Push every decoded frame into the mailbox; with `pace_fps`, no faster than real time."""
+    t0, n = time.monotonic(), 0
+    try:
+        while not stop.is_set():
+            if pace_fps:
+                wait = t0 + n / pace_fps - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            ok, frame = cap.read()
+            if not ok:
+                break
+            box.put(frame, time.monotonic())
+            n += 1
+    finally:
+        cap.release()
+        box.close()
+
+def window_verdict(win, threshold: float, percentile: float) -> dict:
+    """Verdict over the (read ts, suspicion, ema, latency) records of one window."""
+    if not win:
+        return {"frames_in_window": 0, "score": None, "decision": False, "k_hits": 0, "k_required": 3}
+    ema = np.array([w[2] for w in win])
+    score = float(np.percentile(ema, percentile))
+    hits, k = int((ema >= threshold).sum()), max(3, len(win) // 20)
+    return {"frames_in_window": len(win), "score": score, "decision": bool(score >= threshold and hits >= k),
+            "k_hits": hits, "k_required": k}
+
+def _latency_ms(win) -> dict:
+    if not win:
+        return None
+    lat = 1000.0 * np.array([w[3] for w in win])
+    return {"p50": float(np.percentile(lat, 50)), "p95": float(np.percentile(lat, 95)), "max": float(lat.max())}
+
+def stream_verdicts(source, profile=None, tau: float = 0.6, percentile: float = 95.0,
+                    window: float = 5.0, cadence: float = 1.0, max_latency_ms: float = 250.0,
+                    realtime: bool = True, duration: float = None, stop: threading.Event = None):
+    """Generator of a verdict dict every `cadence` seconds until the source ends, `duration` passes or
+    `stop` is set; the last one carries final=True. Closing the generator stops the reader.
+
+    The source is opened and the bundle resolved right away (ValueError if the source can't be
+    opened, FileNotFoundError if the profile isn't calibrated), before the first verdict is asked for.
+    """
+    cap, is_file = open_source(source)
+    if not cap.isOpened():
+        raise ValueError(f"cannot open live source: {source}")
+    try:
+        prof = profiles.get(profile)
+        art = registry.bundle(prof["name"])  # pinned for the session
+    except BaseException:
+        cap.release()  # the reader that would release it never starts
+        raise
+    return _verdicts(cap, is_file, prof, art, tau, percentile, window, cadence, max_latency_ms,
+                     realtime, duration, stop)
+
+def _verdicts(cap, is_file, prof, art, tau, percentile, window, cadence, max_latency_ms, realtime, duration, stop):
+    thresh = art["thresh_video"]
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    stop = stop or threading.Event()
+    box = LatestFrame()
+    reader = threading.Thread(target=_read_loop, args=(cap, box, stop, fps if (is_file and realtime) else None),
+                              daemon=True)
+
+    budget_s = max_latency_ms / 1000.0
+    scales, si = budget.SCALES, 0
+    win = deque()               # (read ts, suspicion, ema, latency) inside the window
+    ema, last_ts, score_ema = None, None, None
+    scored = stale = nonfinite = 0
+    t_start = time.monotonic()
+    next_emit = t_start + cadence
+    reader.start()
+
+    def verdict(final=False):
+        now = time.monotonic()
+        while win and win[0][0] < now - window:
+            win.popleft()
+        out = window_verdict(win, thresh, percentile)
+        out.update({
+            "t": round(now - t_start, 3), "window_s": window, "threshold": thresh, "ema": ema,
+            "frames_read": box.read, "frames_scored": scored, "frames_nonfinite": nonfinite, "frames_dropped": box.dropped + stale,
+            "drop_rate": (box.dropped + stale) / max(1, box.read),
+            "latency_ms": _latency_ms(win), "max_latency_ms": max_latency_ms,
+            "detect_scale": scales[si], "profile": prof["name"], "artifact_version": art["version"],
+        })
+        if final:
+            out["final"] = True
+        return out
+
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            if duration is not None and now - t_start >= duration:
+                break
+            if now >= next_emit:
+                yield verdict()
+                next_emit += cadence * max(1, int((now - next_emit) / cadence) + 1)
+            item = box.take(timeout=max(0.0, min(next_emit - now, 0.1)))
+            if item is None:
+                if box.closed:
+                    break
+                continue
+            frame, ts = item
+            if (score_ema is not None and score_ema < budget_s
+                    and time.monotonic() - ts + score_ema > budget_s):
+                stale += 1  # would finish past the bound: skip it, the next one is fresher
+                continue
+            t0 = time.monotonic()
+            face = crop_face(frame, detect_face(frame, scales[si]), target=prof["face_size"])
+            s = tm.frame_score(face, prof["name"], art)["suspicion"]
+            done = time.monotonic()
+            if np.isfinite(s):
+                a = ema_alpha(ts - last_ts, 1.0, tau) if last_ts is not None else 1.0
+                ema = s if ema is None else a * s + (1 - a) * ema
+                last_ts = ts
+                win.append((ts, s, ema, done - ts))
+                scored += 1
+            else:
+                nonfinite += 1  # flat crop (black / faded frame): no texture to judge
+
+            took = done - t0
+            score_ema = took if score_ema is None else 0.3 * took + 0.7 * score_ema
+            if score_ema > budget.SAFETY * budget_s and si + 1 < len(scales):
+                si += 1; score_ema = None
+            elif si > 0 and score_ema < 0.4 * budget_s:
+                si -= 1; score_ema = None
+        yield verdict(final=True)
+    finally:
+        stop.set()
+        reader.join(timeout=2)
+
+def main():
+    ap = argparse.ArgumentParser(description="Score a live source; print a sliding-window verdict as JSON lines.")
+    ap.add_argument("source", help="Webcam index, stream URL (rtsp/http) or video file")
+    ap.add_argument("--profile", choices=sorted(profiles.PROFILES), default=profiles.DEFAULT_PROFILE)
+    ap.add_argument("--tau", type=float, default=0.6, help="EMA time constant (seconds)")
+    ap.add_argument("--percentile", type=float, default=95.0, help="Percentile of the EMA over the window")
+    ap.add_argument("--window", type=float, default=5.0, help="Verdict window (seconds)")
+    ap.add_argument("--cadence", type=float, default=1.0, help="Seconds between verdicts")
+    ap.add_argument("--max-latency-ms", type=float, default=250.0,
+                    help="End-to-end bound: stale frames are dropped, detection downscaled")
+    ap.add_argument("--no-realtime", action="store_true",
+                    help="Read a file as fast as it decodes instead of at its frame rate")
+    ap.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    args = ap.parse_args()
+    try:
+        for v in stream_verdicts(args.source, profile=args.profile, tau=args.tau, percentile=args.percentile,
+                                 window=args.window, cadence=args.cadence, max_latency_ms=args.max_latency_ms,
+                                 realtime=not args.no_realtime, duration=args.duration):
+            print(json.dumps(v), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
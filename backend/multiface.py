@@ -0,0 +1,226 @@
+# backend/multiface.py
+"""Multi-face scoring: every detected face, under a stable track id.
+
+runner.score_single_video follows the largest face only. Here each sampled
+frame's Haar boxes (largest first, up to `max_faces`) are matched to the
+previous frame's tracks by IoU (greedy, best overlap first); unmatched boxes
+start new tracks and tracks unseen for ~`max_gap_s` are retired. Crops from
+consecutive frames are pooled and scored `batch` at a time through
+texture_model.score_batch, so decoding and detection happen once per frame and
+the texture features run once per batch rather than once per face.
+
+Each track gets its own EMA + percentile + k-hits aggregator (same as a single
+face video). Tracks shorter than `min_track_frames` (detector flicker) are
+reported but don't vote; the video verdict is the worst remaining track. With
+`save_job`, every face's raw features are stored with its track id (jobs.py),
+and jobs.rescore re-aggregates them per track the same way.
+"""
+from pathlib import Path
+from typing import Optional
+import time
+
+import numpy as np
+
+import budget
+import profiles
+import registry
+import texture_model as tm
+from aggregator import VideoAggregator, ema_alpha
+
+def iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter) if inter else 0.0
+
+def shift(a, b) -> float:
+    """Centre distance in units of the larger box side."""
+    ca = (a[0] + a[2] / 2.0, a[1] + a[3] / 2.0)
+    cb = (b[0] + b[2] / 2.0, b[1] + b[3] / 2.0)
+    return float(np.hypot(ca[0] - cb[0], ca[1] - cb[1])) / max(a[2], a[3], b[2], b[3])
+
+class FaceTracker:
+    """Greedy tracker; ids are ints in order of first appearance and never reused.
+
+    A box continues a track if they overlap by `min_iou`, or, for a face that
+    moved fast between sampled frames, if its centre moved at most `max_shift`
+    box sides and its size changed less than 2x. Best overlap is matched first.
+    """
+    def __init__(self, min_iou: float = 0.3, max_missing: int = 5, max_shift: float = 0.75):
+        self.min_iou = float(min_iou)
+        self.max_missing = int(max_missing)
+        self.max_shift = float(max_shift)
+        self.tracks = {}   # id -> {"box", "missing"}
+        self._next = 0
+
+    def _candidate(self, a, b):
+        ov, d = iou(a, b), shift(a, b)
+        if ov >= self.min_iou or (d <= self.max_shift and 0.5 <= (b[2] * b[3]) / float(a[2] * a[3]) <= 2.0):
+            return ov, -d
+        return None
+
+    def update(self, boxes) -> list:
+        """Track id for each box of the current frame (same order)."""
+        pairs = []
+        for tid, t in self.tracks.items():
+            for i, b in enumerate(boxes):
+                c = self._candidate(t["box"], b)
+                if c is not None:
+                    pairs.append((c, tid, i))
+        pairs.sort(reverse=True)
+        ids, used = [None] * len(boxes), set()
+        for _, tid, i in pairs:
+            if tid in used or ids[i] is not None:
+                continue
+            ids[i] = tid
+            used.add(tid)
+        for i, b in enumerate(boxes):
+            if ids[i] is None:
+                ids[i] = self._next
+                self._next += 1
+            self.tracks[ids[i]] = {"box": tuple(int(v) for v in b), "missing": 0}
+        for tid in list(self.tracks):
+            if tid not in ids:
+                self.tracks[tid]["missing"] += 1
+                if self.tracks[tid]["missing"] > self.max_missing:
+                    del self.tracks[tid]
+        return ids
+
+def score_video_faces(
+    video_path: Path,
+    every: Optional[int] = None,
+    tau: float = 0.6,
+    percentile: float = 95.0,
+    profile: Optional[str] = None,
+    max_faces: int = 8,
+    batch: int = 32,
+    min_iou: float = 0.3,
+    max_gap_s: float = 1.0,
+    min_track_frames: int = 5,
+    per_frame_limit: int = 2000,
+    save_job: bool = False,
+    job_id: Optional[str] = None,
+    jobs_dir: Optional[Path] = None,
+):
+    """Per-track verdicts plus the video-level max; the response shape follows score_single_video.
+
+    When no track lasts `min_track_frames`, returns an error record like score_single_video does.
+    """
+    from runner import crop_face, detect_faces, open_video
+    t_start = time.perf_counter()
+    prof = profiles.get(profile)
+    every = every or prof["every"]
+    cap = open_video(video_path)
+    if not cap.isOpened():
+        raise SystemExit(f"[error] cannot open video: {video_path}")
+    info = budget.info_from_cap(cap)
+    fps = info["fps"]
+    alpha = ema_alpha(every, fps, tau)
+    art = registry.bundle(prof["name"])
+    THRESH = art["thresh_video"]
+    tracker = FaceTracker(min_iou, max_missing=max(1, round(max_gap_s * fps / every)))
+    aggs, spans = {}, {}      # track id -> VideoAggregator, [first, last frame]
+    pending = []              # (frame_idx, track id, box, crop), frame order
+    idx = sampled = no_face = faces_scored = 0
+    batches = 0
+    rows = [] if save_job else None   # (frame_idx, track id, raw features) per scored face
+
+    def flush():
+        nonlocal faces_scored, batches
+        if not pending:
+            return
+        out = tm.score_batch([p[3] for p in pending], prof["name"], art)
+        for (fi, tid, box, _), s, f in zip(pending, out["suspicion"], out["features"]):
+            if rows is not None:
+                rows.append((fi, tid, f))
+            if tid not in aggs:
+                aggs[tid] = VideoAggregator(alpha, percentile=percentile, threshold=THRESH,
+                                            reservoir=per_frame_limit)
+                spans[tid] = [fi, fi]
+            spans[tid][1] = fi
+            detail = {k: float(v) for k, v in zip(prof["features"], f)}
+            detail.update(frame_idx=fi, time_sec=round(fi / float(fps), 3), track_id=tid, box=list(box))
+            aggs[tid].update(s, detail)
+        faces_scored += len(pending)
+        batches += 1
+        pending.clear()
+
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if idx % every == 0:
+            sampled += 1
+            boxes = detect_faces(frame)[:max_faces]
+            if not boxes:
+                no_face += 1
+            for tid, box in zip(tracker.update(boxes), boxes):
+                pending.append((idx, tid, box, crop_face(frame, box, target=prof["face_size"])))
+            if len(pending) >= batch:
+                flush()
+        idx += 1
+    flush()
+    cap.release()
+
+    tracks = []
+    for tid in sorted(aggs):
+        agg = aggs[tid]
+        tracks.append({
+            "track_id": tid,
+            "first_frame": spans[tid][0],
+            "last_frame": spans[tid][1],
+            "frames": agg.n,
+            "video_score": agg.video_score(),
+            "decision": agg.decision(),
+            "k_hits": agg.hits,
+            "k_required": agg.k_required(),
+            "votes": agg.n >= min_track_frames,
+        })
+    voting = [t for t in tracks if t["votes"] and t["frames"]]
+    if not voting:
+        return {
+            "video": str(video_path),
+            "error": f"No face track lasted {min_track_frames} scored frames "
+                     f"({sampled} frames sampled, {no_face} without a face).",
+        }
+    worst = max(voting, key=lambda t: t["video_score"])
+    res = {
+        "video": str(video_path),
+        "mode": "multi_face",
+        "frames_scored": sampled,
+        "frames_without_faces": no_face,
+        "faces_scored": faces_scored,
+        "batches": batches,
+        "fps": float(fps),
+        "profile": prof["name"],
+        "artifact_version": art["version"],
+        "every": int(every),
+        "ema_alpha": alpha,
+        "aggregator": f"EMA+p{int(percentile)} per track, max over tracks",
+        "threshold_used": float(THRESH),
+        "video_score": worst["video_score"],
+        "decision": any(t["decision"] for t in voting),
+        "worst_track": worst["track_id"],
+        "tracks": tracks,
+        "k_required": worst["k_required"],
+        "k_hits": worst["k_hits"],
+        "per_frame": aggs[worst["track_id"]].per_frame(),
+        "stages": {"texture": {"seconds": time.perf_counter() - t_start, "frames": sampled}},
+        "decided_by": "texture",
+    }
+    if rows is not None:
+        import jobs
+        res["job_id"] = job_id or jobs.new_id()
+        jobs.save(res["job_id"], {
+            "video": str(video_path), "profile": prof["name"], "features": list(prof["features"]),
+            "feature_version": profiles.feature_version(prof["name"]),
+            "artifact_version": art["version"], "fps": float(fps), "every": int(every), "tau": float(tau),
+            "percentile": float(percentile), "per_frame_limit": per_frame_limit,
+            "sampling": "dense", "mode": "multi_face", "min_track_frames": int(min_track_frames),
+            "partial": False,
+            "result": {k: res[k] for k in ("artifact_version", "threshold_used", "video_score",
+                                           "decision", "decided_by", "k_hits", "k_required", "worst_track")},
+        }, [r[0] for r in rows], [r[2] for r in rows], jobs_dir=jobs_dir, track_id=[r[1] for r in rows])
+    return res
@@ -0,0 +1,80 @@
+# backend/profiles.py
+"""Named speed/quality profiles for the texture pipeline.
+
+Each profile changes the face size, Laplacian kernel set, preprocessing, feature
+subset and default sampling stride, so each one carries its own scaler / weights /
+threshold artifacts. `balanced` is the original pipeline and keeps using
+backend/scaler_values_cache.npz + backend/weights.py; the others live under
+backend/artifacts/<profile>/ and are produced with:
+
+    python backend/scaler_values.py --fit --profile fast
+    python backend/build_dataset.py --profile fast
+    python backend/tune_loss.py --profile fast
+
+Both publish the pair as one versioned model_bundle.json (see artifacts.py).
+"""
+from pathlib import Path
+import hashlib
+import json
+
+BACKEND_DIR = Path(__file__).resolve().parent
+ARTIFACTS_DIR = BACKEND_DIR / "artifacts"
+
+# bump whenever texture_model's feature math changes: bundles fitted on the old
+# definitions are then refused instead of silently mis-scoring
+FEATURE_DEFS_VERSION = 1
+
+FEATURES = ("sharp_var", "high_ratio", "edge_glitch", "block_energy", "chroma_mismatch")
+
+DEFAULT_PROFILE = "balanced"
+PROFILES = {
+    "fast": dict(
+        face_size=128, laplacian_ks=(3,), gauss_blur_k=0,
+        features=("sharp_var", "high_ratio", "edge_glitch", "block_energy"),
+        every=6,
+    ),
+    "balanced": dict(
+        face_size=256, laplacian_ks=(3, 5), gauss_blur_k=3,
+        features=FEATURES,
+        every=3,
+    ),
+    "accurate": dict(
+        face_size=320, laplacian_ks=(3, 5, 7), gauss_blur_k=3,
+        features=FEATURES,
+        every=1,
+    ),
+}
+
+def get(name=None) -> dict:
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"unknown profile {name!r}; choose one of {', '.join(PROFILES)}")
+    return dict(PROFILES[name], name=name)
+
+def feature_version(name=None) -> str:
+    """Identifies the feature definitions a scaler/weights pair was fitted on."""
+    prof = get(name)
+    spec = {k: prof[k] for k in ("face_size", "laplacian_ks", "gauss_blur_k", "features")}
+    digest = hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:10]
+    return f"v{FEATURE_DEFS_VERSION}-{digest}"
+
+def artifact_paths(name=None) -> dict:
+    """Scaler cache, weights module, dataset and model bundle for a profile."""
+    name = name or DEFAULT_PROFILE
+    get(name)
+    root = BACKEND_DIR if name == DEFAULT_PROFILE else ARTIFACTS_DIR / name
+    return {
+        "scaler": root / "scaler_values_cache.npz",
+        "weights": root / "weights.py",
+        "dataset": root / "dataset.csv",
+        "bundle": root / "model_bundle.json",
+    }
+
+def missing_artifacts(name=None) -> list:
+    """Artifacts a profile needs before it can score (empty list when calibrated)."""
+    if (name or DEFAULT_PROFILE) == DEFAULT_PROFILE:
+        return []  # original pipeline falls back to identity scaler / simple weights
+    paths = artifact_paths(name)
+    if paths["bundle"].exists():
+        return []
+    return [str(paths[k]) for k in ("scaler", "weights") if not paths[k].exists()]
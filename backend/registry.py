@@ -0,0 +1,175 @@
+# backend/registry.py
+"""Lazily-built, process-wide shared resources for the texture pipeline.
+
+Nothing heavy (cv2, NumPy, the scaler cache) is touched at import time, so
+lightweight routes such as /api/health never pay for OpenCV. Each resource is
+built once on first use and shared by every module that asks for it.
+
+Scaler, weights and thresholds come from the profile's model_bundle.json
+(artifacts.py) and are hot-swapped by refresh(); before a bundle is published
+the legacy scaler_values_cache.npz + weights.py are served instead.
+"""
+from functools import lru_cache
+from pathlib import Path
+import os
+import sys
+import threading
+
+BACKEND_DIR = Path(__file__).resolve().parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+@lru_cache(maxsize=None)
+def haar():
+    import cv2
+    return cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+def _require(profile):
+    import profiles
+    missing = profiles.missing_artifacts(profile)
+    if missing:
+        raise FileNotFoundError(f"profile {profile!r} is not calibrated; missing {', '.join(missing)}")
+    return profiles.artifact_paths(profile)
+
+@lru_cache(maxsize=None)
+def _weights_module(profile=None):
+    import profiles
+    if (profile or profiles.DEFAULT_PROFILE) == profiles.DEFAULT_PROFILE:
+        try:
+            import weights
+            return weights
+        except Exception:
+            return None
+    import importlib.util
+    path = _require(profile)["weights"]
+    spec = importlib.util.spec_from_file_location(f"weights_{profile}", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+# ---------- model bundles (scaler + W/B + thresholds), hot-swappable ----------
+
+_BUNDLES = {}        # profile -> served bundle; replaced whole, never mutated
+_BUNDLE_LOCK = threading.Lock()
+_LAST_REFRESH = [0.0]
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def _serve(profile, b, stamp):
+    import numpy as np
+    from scaler_values import FixedScaler
+    return {
+        "profile": profile,
+        "version": b["version"],
+        "feature_version": b["feature_version"],
+        "scaler": FixedScaler(b["scaler"]["mean"], b["scaler"]["scale"]),
+        "W": np.asarray(b["W"], dtype=np.float32).reshape(-1),
+        "B": float(b["B"]),
+        "thresh": float(b["thresh"]),
+        "thresh_video": float(b["thresh_video"]),
+        "stamp": stamp,
+    }
+
+def _legacy(profile):
+    """Bundle-shaped view of scaler_values_cache.npz + weights.py (before any bundle is published)."""
+    import hashlib
+    import numpy as np
+    from scaler_values import _load_from_cache
+    sc = _load_from_cache(_require(profile)["scaler"])
+    mod = _weights_module(profile)
+    if mod is not None and hasattr(mod, "W") and hasattr(mod, "B"):
+        W, B = mod.W, mod.B
+    else:
+        W = np.array([0.4, 0.4, 0.2, 0.0, 0.0], dtype=np.float32)  # if only 3 features in cache, scaler will raise until you refit
+        B = 0.0
+    thr = float(getattr(mod, "THRESH_VIDEO", getattr(mod, "THRESH", 0.5)))
+    thr_frame = float(getattr(mod, "THRESH", 0.5))
+    W = np.asarray(W, dtype=np.float32).reshape(-1)
+    h = hashlib.sha256(b"".join(np.asarray(a, np.float32).tobytes() for a in (sc.mean, sc.scale, W, [B, thr])))
+    return {"profile": profile, "version": f"legacy-{h.hexdigest()[:8]}", "feature_version": None,
+            "scaler": sc, "W": W, "B": float(B), "thresh": thr_frame, "thresh_video": thr, "stamp": None}
+
+def _build(profile):
+    import profiles
+    path = profiles.artifact_paths(profile)["bundle"]
+    stamp = _stamp(path)
+    if stamp is None:
+        return _legacy(profile)
+    import artifacts
+    return _serve(profile, artifacts.load(path, profile), stamp)
+
+def load_bundle(path, profile=None):
+    """A bundle file served like bundle() returns it, without putting it into service."""
+    import artifacts
+    import profiles
+    name = profile or profiles.DEFAULT_PROFILE
+    return _serve(name, artifacts.load(path, name), _stamp(path))
+
+def bundle(profile=None):
+    """The model bundle currently served for a profile.
+
+    Callers that score a whole video take it once and use it for every frame,
+    so a reload in between never mixes two versions inside one result.
+    """
+    import profiles
+    name = profile or profiles.DEFAULT_PROFILE
+    cur = _BUNDLES.get(name)
+    if cur is None:
+        with _BUNDLE_LOCK:
+            cur = _BUNDLES.get(name)
+            if cur is None:
+                cur = _BUNDLES[name] = _build(name)
+    return cur
+
+def refresh(min_interval: float = 0.0) -> list:
+    """Swap in bundles whose file changed since they were loaded; returns the new versions.
+
+    Only profiles already in use are checked (one stat() each). A bundle that
+    fails verification is logged and the current one stays in service.
+    """
+    import time
+    now = time.monotonic()
+    if now - _LAST_REFRESH[0] < min_interval:
+        return []
+    _LAST_REFRESH[0] = now
+    import profiles
+    swapped = []
+    for name, cur in list(_BUNDLES.items()):
+        stamp = _stamp(profiles.artifact_paths(name)["bundle"])
+        if stamp is None or stamp == cur["stamp"]:
+            continue
+        try:
+            new = _build(name)
+        except Exception as e:
+            print(f"[registry] keeping {cur['version']} for {name}: {e}")
+            with _BUNDLE_LOCK:
+                _BUNDLES[name] = dict(cur, stamp=stamp)  # don't retry the same bad file
+            continue
+        with _BUNDLE_LOCK:
+            _BUNDLES[name] = new
+        print(f"[registry] {name}: {cur['version']} -> {new['version']}")
+        swapped.append(new["version"])
+    return swapped
+
+def scaler(profile=None):
+    return bundle(profile)["scaler"]
+
+def weights(profile=None):
+    """(W, B) of the served bundle."""
+    b = bundle(profile)
+    return b["W"], b["B"]
+
+def video_threshold(profile=None):
+    return bundle(profile)["thresh_video"]
+
+def clear():
+    """Drop every cached resource; the next use rebuilds it."""
+    for fn in (haar, _weights_module):
+        fn.cache_clear()
+    with _BUNDLE_LOCK:
+        _BUNDLES.clear()
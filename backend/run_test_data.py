@@ -1,157 +1,174 @@
 # backend/run_test_data.py
 from pathlib import Path
-import argparse, json, csv
-import numpy as np
+import argparse, json, csv, os, sys, time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import cv2
-import texture_model as tm
 
-try:
-    from weights import THRESH_VIDEO as THRESH_PREF
-except Exception:
-    try:
-        from weights import THRESH as THRESH_PREF
-    except Exception:
-        THRESH_PREF = 0.5
-
-SUFFIXES = {'.mp4', '.mov', '.mkv', '.avi', '.webm', '.m4v'}
-HAAR = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-
-def open_video(path: Path):
-    for api in (cv2.CAP_FFMPEG, cv2.CAP_AVFOUNDATION, cv2.CAP_ANY):
-        cap = cv2.VideoCapture(str(path), api)
-        if cap.isOpened(): return cap
-    return cv2.VideoCapture(str(path))
-
-def get_face_crop(frame, target=256, pad_frac=0.12):
-    g = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = HAAR.detectMultiScale(g, 1.1, 5, minSize=(80, 80))
-    if len(faces) == 0:
-        return cv2.resize(frame, (target, target), cv2.INTER_AREA)
-    x, y, w, h = max(faces, key=lambda f: f[2]*f[3])
-    pad = int(pad_frac * max(w, h))
-    H, W = frame.shape[:2]
-    x1 = max(x - pad, 0); y1 = max(y - pad, 0)
-    x2 = min(x + w + pad, W); y2 = min(y + h + pad, H)
-    return cv2.resize(frame[y1:y2, x1:x2], (target, target), cv2.INTER_AREA)
-
-def ema_series(values, alpha):
-    out, prev = [], None
-    for v in values:
-        prev = v if prev is None else alpha * v + (1 - alpha) * prev
-        out.append(float(prev))
-    return out
-
-def score_video(video_path: Path, every: int, target_tau: float, perc: float,
-                heatmap_dir: Path | None, save_first_n_heatmaps: int = 20):
-    cap = open_video(video_path)
-    if not cap.isOpened():
-        print(f"[warn] cannot open: {video_path.name}")
-        return None
-
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    # dynamic alpha from target time constant (seconds)
-    alpha = float(min(0.6, max(0.15, 1.0 - np.exp(- (every / max(1.0, fps)) / target_tau ))))
-
-    idx = 0
-    susp = []
-    if heatmap_dir:
-        heatmap_dir.mkdir(parents=True, exist_ok=True)
-    saved_hm = 0
-
-    while True:
-        ok, frame = cap.read()
-        if not ok: break
-        if idx % every:
-            idx += 1; continue
-        face = get_face_crop(frame, target=256)
-        d = tm.frame_score(face)
-        susp.append(float(d["suspicion"]))
-        if heatmap_dir and saved_hm < save_first_n_heatmaps:
-            out_path = heatmap_dir / f"{video_path.stem}_heat_{idx:06d}.jpg"
-            cv2.imwrite(str(out_path), d["overlay"]); saved_hm += 1
-        idx += 1
+BACKEND_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import profiles
+from encoding import FrameColumns, write_npz
+from runner import SUFFIXES, open_video, score_single_video
+
+CSV_FIELDS = ["video", "frames_scored", "fps", "alpha", "percentile",
+              "video_score", "threshold_used", "k_required", "k_hits", "decision", "seconds", "frames_file", "error"]
 
+def probe_frames(vp: Path) -> int:
+    """Container frame count (0 if unknown); used only to order the work."""
+    cap = open_video(vp)
+    n = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0) if cap.isOpened() else 0
     cap.release()
-    if not susp:
-        return {"video": str(video_path), "frames_scored": 0, "video_score": None, "decision": None}
-
-    ema = ema_series(susp, alpha)
-    video_score = float(np.percentile(ema, perc))
-
-    thr = THRESH_PREF
-    # guard: require at least K smoothed frames across threshold
-    k_required = max(3, len(ema) // 20)  # ~5% of sampled frames, min 3
-    decision = (video_score >= thr) and (sum(s >= thr for s in ema) >= k_required)
-
-    return {
-        "video": str(video_path),
-        "frames_scored": len(susp),
-        "fps": float(fps),
-        "alpha": alpha,
-        "percentile": perc,
-        "video_score": video_score,
-        "threshold_used": float(thr),
-        "k_required": int(k_required),
-        "k_hits": int(sum(s >= thr for s in ema)),
-        "decision": bool(decision)
-    }
-
-def score_folder(data_dir: Path, every: int, target_tau: float, perc: float,
-                 out_csv: Path | None, out_json: Path | None, heatmaps: Path | None):
+    return n
+
+def schedule(vids, frames):
+    """Longest-first (LPT) order; unknown lengths go first since they may be the longest."""
+    return sorted(vids, key=lambda vp: (frames[vp] > 0, -frames[vp], str(vp)))
+
+def _init_worker(threads: int):
+    # one OpenCV thread per process by default: N processes x all cores would oversubscribe
+    cv2.setNumThreads(threads)
+
+def score_video(video_path: Path, every=None, target_tau: float = 0.6, perc: float = 95.0,
+                heatmap_dir: Path = None, save_first_n_heatmaps: int = 20, profile=None,
+                dedup_threshold: float = 0.0, frames_path: Path = None):
+    """runner.score_single_video without per-frame detail; errors come back as a record.
+
+    With `frames_path`, every frame's features/suspicion/EMA are written there
+    (encoding.write_npz, mmap-able) by this worker, and the record points to it.
+    """
+    t0 = time.perf_counter()
+    cols = FrameColumns(profiles.get(profile)["features"]) if frames_path else None
+    try:
+        res = score_single_video(video_path, every=every, tau=target_tau, percentile=perc,
+                                 heatmap_root=heatmap_dir, save_first_n_heatmaps=save_first_n_heatmaps,
+                                 profile=profile, dedup_threshold=dedup_threshold, on_frame=cols)
+    except (Exception, SystemExit) as e:
+        res = {"video": str(video_path), "error": str(e)}
+    res.pop("per_frame", None)
+    if cols is not None and "error" not in res:
+        frames_path.parent.mkdir(parents=True, exist_ok=True)
+        write_npz(frames_path, cols.arrays(), meta=res)
+        res["frames_file"] = str(frames_path)
+    res["alpha"] = res.pop("ema_alpha", None)
+    res["percentile"] = perc
+    res["seconds"] = round(time.perf_counter() - t0, 3)
+    return res
+
+def score_folder(data_dir: Path, every=None, target_tau: float = 0.6, perc: float = 95.0,
+                 out_csv: Path = None, out_jsonl: Path = None, out_json: Path = None, heatmaps: Path = None,
+                 workers: int = None, cv_threads: int = 1, profile=None, dedup_threshold: float = 0.0,
+                 frames_dir: Path = None):
+    """Score every video under data_dir; summaries stream to CSV/JSONL as videos finish.
+
+    With `frames_dir`, each video's per-frame matrices also go to
+    frames_dir/<relative path, suffix kept>.npz (see score_video). `out_json` (deprecated,
+    kept for existing consumers) gets all summaries as one array at the end.
+    """
     vids = [p for p in data_dir.rglob('*') if p.suffix.lower() in SUFFIXES]
     if not vids:
-        print(f"[error] no videos under {data_dir}"); return
-    print(f"[info] found {len(vids)} videos under {data_dir}")
-
-    writer = None; csv_file = None
+        print(f"[error] no videos under {data_dir}"); return []
+    workers = workers or os.cpu_count() or 1
+    frames = {vp: probe_frames(vp) for vp in vids}
+    vids = schedule(vids, frames)
+    print(f"[info] found {len(vids)} videos under {data_dir} ({sum(frames.values())} frames); "
+          f"{workers} workers x {cv_threads} OpenCV threads")
+
+    writer = csv_file = jsonl_file = None
     if out_csv:
         out_csv.parent.mkdir(parents=True, exist_ok=True)
         csv_file = out_csv.open("w", newline="")
-        writer = csv.DictWriter(csv_file, fieldnames=[
-            "video","frames_scored","fps","alpha","percentile",
-            "video_score","threshold_used","k_required","k_hits","decision"
-        ])
+        writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS, extrasaction="ignore")
         writer.writeheader()
-
-    all_results = []
-    try:
-        for vp in vids:
-            print(f"[info] scoring {vp.name} …")
-            res = score_video(vp, every=every, target_tau=target_tau, perc=perc, heatmap_dir=heatmaps)
-            if res is None: 
-                print(f"[warn] skipped {vp.name}"); continue
-            all_results.append(res)
-            print(f"  frames={res['frames_scored']} score={res['video_score']:.3f} "
+    if out_jsonl:
+        out_jsonl.parent.mkdir(parents=True, exist_ok=True)
+        jsonl_file = out_jsonl.open("w")
+
+    def emit(res):
+        # completion order; flushed per row so partial runs are usable
+        if "error" in res:
+            print(f"[warn] {Path(res['video']).name}: {res['error']}")
+        else:
+            print(f"  {Path(res['video']).name}: frames={res['frames_scored']} score={res['video_score']:.3f} "
                   f"thr={res['threshold_used']:.3f} hits={res['k_hits']}/{res['k_required']} "
-                  f"→ decision={res['decision']}")
-            if writer: writer.writerow(res)
+                  f"→ decision={res['decision']} ({res['seconds']:.1f}s)")
+        if writer:
+            writer.writerow(res); csv_file.flush()
+        if jsonl_file:
+            jsonl_file.write(json.dumps(res) + "\n"); jsonl_file.flush()
+
+    kw = dict(every=every, target_tau=target_tau, perc=perc, heatmap_dir=heatmaps,
+              profile=profile, dedup_threshold=dedup_threshold)
+    def frames_for(vp):
+        if not frames_dir:
+            return None
+        # mirror the tree and keep the suffix: a/b.mp4 -> a/b.mp4.npz, so neither
+        # a__b.mp4 nor a/b.mov can land on the same file
+        rel = vp.relative_to(data_dir)
+        return frames_dir / rel.parent / (rel.name + ".npz")
+
+    results, t0 = [], time.perf_counter()
+    try:
+        if workers <= 1:
+            _init_worker(cv_threads)
+            for vp in vids:
+                results.append(score_video(vp, frames_path=frames_for(vp), **kw)); emit(results[-1])
+        else:
+            # spawn: forking after the parent has used OpenCV's thread pool can deadlock
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(cv_threads,)) as ex:
+                futs = [ex.submit(score_video, vp, frames_path=frames_for(vp), **kw)
+                        for vp in vids]  # queued longest-first
+                for fut in as_completed(futs):
+                    results.append(fut.result()); emit(results[-1])
     finally:
         if csv_file: csv_file.close()
+        if jsonl_file: jsonl_file.close()
 
     if out_json:
         out_json.parent.mkdir(parents=True, exist_ok=True)
         with out_json.open("w") as f:
-            json.dump(all_results, f, indent=2)
-        print(f"[info] wrote JSON -> {out_json.resolve()}")
-    print("[done]")
+            json.dump(sorted(results, key=lambda r: r["video"]), f, indent=2)
+        print(f"[info] wrote JSON -> {out_json.resolve()} (deprecated: read --out-jsonl instead)")
+
+    wall = time.perf_counter() - t0
+    work = sum(r["seconds"] for r in results)
+    print(f"[done] {len(results)} videos in {wall:.1f}s wall, {work:.1f}s work "
+          f"({work / max(wall, 1e-9):.2f}x, ideal {min(workers, len(vids))}x)")
+    return results
 
 def main():
-    ap = argparse.ArgumentParser(description="Video-level scoring with EMA+pXX.")
-    base = Path(__file__).resolve().parent
-    ap.add_argument("--data-dir", default=str(base / "test_data"))
-    ap.add_argument("--every", type=int, default=3, help="Sample every Nth frame.")
+    ap = argparse.ArgumentParser(description="Video-level scoring with EMA+pXX over a folder, in parallel.")
+    ap.add_argument("--data-dir", default=str(BACKEND_DIR / "test_data"))
+    ap.add_argument("--every", type=int, default=None, help="Sample every Nth frame (default: the profile's).")
+    ap.add_argument("--profile", choices=sorted(profiles.PROFILES), default=profiles.DEFAULT_PROFILE)
     ap.add_argument("--tau", type=float, default=0.6, help="EMA time constant (seconds) for smoothing.")
     ap.add_argument("--percentile", type=float, default=95.0, help="Percentile over EMA series.")
-    ap.add_argument("--out-csv", default=str(base / "out" / "videos.csv"))
-    ap.add_argument("--out-json", default=str(base / "out" / "videos.json"))
-    ap.add_argument("--heatmaps", default=str(base / "out" / "heatmaps"))
+    ap.add_argument("--dedup-threshold", type=float, default=0.0,
+                    help="Reuse the last frame's features when the thumbnail changed less than this (0 = off, the default; e.g. 1.0)")
+    ap.add_argument("--workers", type=int, default=None, help="Scoring processes (default: CPU count)")
+    ap.add_argument("--cv-threads", type=int, default=1, help="cv2.setNumThreads per worker")
+    ap.add_argument("--out-csv", default=str(BACKEND_DIR / "out" / "videos.csv"))
+    ap.add_argument("--out-jsonl", default=str(BACKEND_DIR / "out" / "videos.jsonl"))
+    ap.add_argument("--out-json", default=str(BACKEND_DIR / "out" / "videos.json"),
+                    help="Deprecated: one JSON array written at the end; use --out-jsonl. '' disables")
+    ap.add_argument("--heatmaps", default=str(BACKEND_DIR / "out" / "heatmaps"))
+    ap.add_argument("--format", choices=("jsonl", "npz"), default="jsonl",
+                    help="jsonl: per-video summaries only; npz: plus per-frame matrices per video in --out-frames")
+    ap.add_argument("--out-frames", default=str(BACKEND_DIR / "out" / "frames"))
     args = ap.parse_args()
 
     score_folder(
         data_dir=Path(args.data_dir),
         every=args.every, target_tau=args.tau, perc=args.percentile,
-        out_csv=Path(args.out_csv), out_json=Path(args.out_json),
-        heatmaps=Path(args.heatmaps)
+        out_csv=Path(args.out_csv) if args.out_csv else None,
+        out_jsonl=Path(args.out_jsonl) if args.out_jsonl else None,
+        out_json=Path(args.out_json) if args.out_json else None,
+        heatmaps=Path(args.heatmaps) if args.heatmaps else None,
+        workers=args.workers, cv_threads=args.cv_threads,
+        profile=args.profile, dedup_threshold=args.dedup_threshold,
+        frames_dir=Path(args.out_frames) if args.format == "npz" else None,
     )
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Callable
 import argparse, json, time, sys
 import numpy as np
 import cv2
@@ -8,32 +8,47 @@ import cv2
 BACKEND_DIR = Path(__file__).resolve().parent
 sys.path.insert(0, str(BACKEND_DIR))
 
+import registry  # shared Haar cascade / scaler / weights, built on first use
 import texture_model as tm  # must expose frame_score(face_bgr)
-
-# Prefer video-level threshold; fall back to frame-level; else 0.5
-try:
-    from weights import THRESH_VIDEO as THRESH
-except Exception:
-    try:
-        from weights import THRESH
-    except Exception:
-        THRESH = 0.5
+import profiles
+from aggregator import VideoAggregator, ema_alpha
+import budget
+from deepfake_model.deepfake_bootstrap import percentile_ci  # NumPy-only, shared with deepfake_model_main
 
 SUFFIXES = {".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v"}
 
-HAAR = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-def get_face_crop(frame_bgr, target: int = 256, pad_frac: float = 0.12):
+def detect_faces(frame_bgr, scale: float = 1.0):
+    """Every Haar face box (x, y, w, h) in full-frame coordinates, largest first.
+
+    scale < 1 runs the detector on a downscaled copy (cost ~ area); crops are
+    still taken from the full-resolution frame.
+    """
     g = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
-    faces = HAAR.detectMultiScale(g, 1.1, 5, minSize=(80, 80))
-    if len(faces) == 0:
+    if scale < 1.0:
+        g = cv2.resize(g, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    min_face = max(20, int(80 * scale))
+    faces = registry.haar().detectMultiScale(g, 1.1, 5, minSize=(min_face, min_face))
+    boxes = sorted((tuple(int(v) for v in f) for f in faces), key=lambda f: f[2] * f[3], reverse=True)
+    return boxes if scale >= 1.0 else [tuple(int(round(v / scale)) for v in b) for b in boxes]
+
+def detect_face(frame_bgr, scale: float = 1.0):
+    """Largest Haar face box (x, y, w, h) in full-frame coordinates, or None."""
+    boxes = detect_faces(frame_bgr, scale)
+    return boxes[0] if boxes else None
+
+def crop_face(frame_bgr, box, target: int = 256, pad_frac: float = 0.12):
+    if box is None:
         return cv2.resize(frame_bgr, (target, target), cv2.INTER_AREA)
-    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    x, y, w, h = box
     H, W = frame_bgr.shape[:2]
     pad = int(pad_frac * max(w, h))
     x1, y1 = max(x - pad, 0), max(y - pad, 0)
     x2, y2 = min(x + w + pad, W), min(y + h + pad, H)
     return cv2.resize(frame_bgr[y1:y2, x1:x2], (target, target), cv2.INTER_AREA)
 
+def get_face_crop(frame_bgr, target: int = 256, pad_frac: float = 0.12):
+    return crop_face(frame_bgr, detect_face(frame_bgr), target, pad_frac)
+
 def open_video(path: Path):
     for api in (cv2.CAP_FFMPEG, cv2.CAP_AVFOUNDATION, cv2.CAP_ANY):
         cap = cv2.VideoCapture(str(path), api)
@@ -48,20 +63,146 @@ def ema_series(values: List[float], alpha: float) -> List[float]:
         out.append(float(prev))
     return out
 
+def frame_thumb(frame_bgr, size: int = 32):
+    """Tiny grayscale thumbnail used as a cheap change detector."""
+    g = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(g, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+def read_frame_at(cap, pos: int, target: int, max_grab: int = 12):
+    """Read frame `target` given the decoder sits at `pos`; grab forward when close, else seek.
+
+    Returns (frame or None, new position).
+    """
+    if not (0 <= target - pos <= max_grab):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+        pos = target
+    while pos < target:
+        if not cap.grab():
+            return None, pos
+        pos += 1
+    ok, frame = cap.read()
+    return (frame if ok else None), pos + 1
+
+def adaptive_sample(cap, total: int, every: int, score_at: Callable[[object, int], float],
+                    threshold: float, coarse: int = 48, delta: float = 0.08, band: float = 0.1,
+                    should_stop: Optional[Callable[[], bool]] = None):
+    """Coarse-to-fine sampling on the dense grid range(0, total, every).
+
+    Scores ~`coarse` evenly spaced grid frames, then bisects every gap whose end
+    points are near/above `threshold` (within `band`) or differ by >= `delta`,
+    until those gaps reach the dense stride. Each round is read in frame order.
+    `should_stop`, checked before every frame, ends sampling early (budget).
+    Returns {frame_idx: suspicion} for the frames actually scored.
+    """
+    grid = np.arange(0, total, every)
+    if len(grid) == 0:
+        return {}
+    pick = np.unique(np.linspace(0, len(grid) - 1, min(coarse, len(grid))).round().astype(int))
+    scored, pos = {}, 0
+
+    def run(gis):
+        nonlocal pos
+        for gi in sorted(gis):
+            if should_stop is not None and should_stop():
+                return False
+            frame, pos = read_frame_at(cap, pos, int(grid[gi]))
+            if frame is not None:
+                scored[gi] = score_at(frame, int(grid[gi]))
+        return True
+
+    if not run(pick):
+        return {int(grid[gi]): s for gi, s in scored.items()}
+    while True:
+        keys = sorted(scored)
+        todo = [(a + b) // 2 for a, b in zip(keys, keys[1:])
+                if b - a > 1 and (max(scored[a], scored[b]) >= threshold - band
+                                  or abs(scored[a] - scored[b]) >= delta)]
+        todo = [g for g in todo if g not in scored]
+        if not todo or not run(todo):
+            break
+    return {int(grid[gi]): s for gi, s in scored.items()}
+
 def score_single_video(
     video_path: Path,
-    every: int = 3,
+    every: Optional[int] = None,
     tau: float = 0.6,
     percentile: float = 95.0,
     heatmap_root: Optional[Path] = None,
     save_first_n_heatmaps: int = 50,
+    per_frame_limit: int = 2000,
+    progress: Optional[Callable[[dict], None]] = None,
+    progress_every: int = 25,
+    on_frame: Optional[Callable[[dict], None]] = None,
+    profile: Optional[str] = None,
+    adaptive: bool = False,
+    coarse_frames: int = 48,
+    refine_delta: float = 0.08,
+    refine_band: float = 0.1,
+    dedup_threshold: float = 0.0,
+    deadline_ms: Optional[float] = None,
+    max_frames: Optional[int] = None,
+    cascade: bool = False,
+    cascade_band: float = 0.1,
+    cascade_crops: int = 16,
+    save_job: bool = False,
+    job_id: Optional[str] = None,
+    jobs_dir: Optional[Path] = None,
 ):
+    """Score one video with constant memory.
+
+    per_frame keeps at most `per_frame_limit` frames (uniform reservoir) plus the
+    50 most suspicious; see aggregator.py for the video_score tolerance once a
+    video exceeds that. `progress`, if given, receives a running snapshot every
+    `progress_every` scored frames; `on_frame`, if given, receives every
+    aggregated per-frame record (suspicion + ema) in frame order, whatever
+    `per_frame_limit` keeps. `profile` picks the speed/quality profile
+    (face size, kernels, features, default stride) and its calibrated artifacts.
+
+    With `adaptive`, only a coarse set of frames plus refinements around
+    suspicious or fast-changing segments is scored (see adaptive_sample); the
+    dense every-`every` suspicion series is linearly interpolated between scored
+    frames and aggregated exactly like dense sampling. Needs a seekable input;
+    falls back to dense sampling when the frame count is unknown.
+
+    A frame whose 32x32 grayscale thumbnail differs from the last fully scored
+    frame by less than `dedup_threshold` gray levels (mean abs diff) reuses that
+    frame's features/suspicion and is marked `reused` in per_frame; 0 (the
+    default) disables it, so verdicts match scoring every frame unless callers opt in.
+
+    `deadline_ms` / `max_frames` set a budget: the stride (and, if needed, a
+    downscale before face detection) is planned from the probed video and the
+    live throughput model in budget.py; sampling (dense or adaptive) stops early
+    with partial=True and the covered fraction in `coverage` if time or frames
+    run out. Only fully scored frames (not dedup reuses) feed the model.
+
+    With `cascade`, the `cascade_crops` most suspicious face crops are kept and,
+    if video_score is within `cascade_band` of the threshold, scored by the deep
+    model (cascade.py), whose verdict then decides. `decided_by` and `stages`
+    report which stage decided and what each one cost.
+
+    With `save_job`, every scored frame's raw feature vector is kept (float32,
+    one row per sampled frame) and saved with the job record (jobs.py), so the
+    video can later be re-aggregated or re-scored without decoding it again.
+    """
+    t_start = time.perf_counter()
+    prof = profiles.get(profile)
+    every = every or prof["every"]
     cap = open_video(video_path)
     if not cap.isOpened():
         raise SystemExit(f"[error] cannot open video: {video_path}")
 
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    alpha = float(min(0.6, max(0.15, 1.0 - np.exp(- (every / max(1.0, fps)) / tau ))))
+    info = budget.info_from_cap(cap)
+    fps, total = info["fps"], info["frames"]
+    scale, planned = 1.0, None
+    if deadline_ms or max_frames:
+        planned = budget.plan(info, every, deadline_ms=deadline_ms, max_frames=max_frames)
+        every, scale = planned["every"], planned["scale"]
+    deadline_s = deadline_ms / 1000.0 if deadline_ms else None
+    frame_cost = budget.MODEL.frame_cost(info["mpx"], scale)
+    alpha = ema_alpha(every, fps, tau)
+    art = registry.bundle(prof["name"])  # pinned for the whole video, even if a reload lands meanwhile
+    THRESH = art["thresh_video"]
+    agg = VideoAggregator(alpha, percentile=percentile, threshold=THRESH, reservoir=per_frame_limit)
 
     heatmap_dir = None
     if heatmap_root:
@@ -69,19 +210,34 @@ def score_single_video(
         heatmap_dir = heatmap_root / f"{video_path.stem}_{ts}"
         heatmap_dir.mkdir(parents=True, exist_ok=True)
 
-    susp_list, per_frame = [], []
     saved_hm, idx = 0, 0
+    last_thumb, last_df, reused = None, None, 0
+    fresh, score_s = 0, 0.0   # fully scored frames and their time, for budget.MODEL
+    feat_rows = [] if save_job else None   # (frame_idx, raw features) per sampled frame
+    top = None
+    if cascade:
+        import cascade as cas
+        spec = cas.crop_spec()
+        top = cas.TopCrops(cascade_crops)
 
-    while True:
-        ok, frame = cap.read()
-        if not ok:
-            break
-        if idx % every:
-            idx += 1
-            continue
+    def score_frame(frame, idx):
+        nonlocal saved_hm, last_thumb, last_df, reused, fresh, score_s
+        if dedup_threshold > 0:
+            thumb = frame_thumb(frame)
+            if last_thumb is not None and float(np.abs(thumb - last_thumb).mean()) < dedup_threshold:
+                reused += 1
+                if feat_rows is not None:
+                    feat_rows.append((idx, feat_rows[-1][1]))
+                return dict(last_df, frame_idx=idx, time_sec=round(idx / float(fps), 3), reused=True)
+            last_thumb = thumb
 
-        face = get_face_crop(frame, target=256)
-        d = tm.frame_score(face)  # dict with metrics + 'overlay'
+        t0 = time.perf_counter()
+        box = detect_face(frame, scale)
+        face = crop_face(frame, box, target=prof["face_size"])
+        d = tm.frame_score(face, prof["name"], art)  # dict with metrics + 'overlay'
+        if top is not None and box is not None and top.wants(d["suspicion"], idx):
+            deep = crop_face(frame, box, target=spec["input_size"], pad_frac=spec["face_margin"])
+            top.push(d["suspicion"], idx, cv2.cvtColor(deep, cv2.COLOR_BGR2RGB))
 
         if heatmap_dir is not None and saved_hm < save_first_n_heatmaps:
             out_im = heatmap_dir / f"{video_path.stem}_heat_{idx:06d}.jpg"
@@ -91,44 +247,207 @@ def score_single_video(
         df = {k: float(v) for k, v in d.items() if k != "overlay"}
         df["frame_idx"] = idx
         df["time_sec"] = round(idx / float(fps), 3)
-        per_frame.append(df)
+        df["reused"] = False
+        last_df = df
+        fresh += 1
+        score_s += time.perf_counter() - t0
+        if feat_rows is not None:
+            feat_rows.append((idx, [df[k] for k in prof["features"]]))
+        return df
+
+    sampled, partial = None, False
+
+    def over_budget(n):
+        return bool((max_frames and n >= max_frames) or
+                    (deadline_s is not None and time.perf_counter() - t_start + frame_cost > deadline_s))
 
-        susp_list.append(float(d["suspicion"]))
-        idx += 1
+    if adaptive and total > 0:
+        details = {}
+        def score_at(frame, idx):
+            details[idx] = score_frame(frame, idx)
+            return details[idx]["suspicion"]
+
+        def should_stop():
+            nonlocal partial
+            partial = partial or over_budget(len(details))
+            return partial
+        susp = adaptive_sample(cap, total, every, score_at, THRESH,
+                               coarse=coarse_frames, delta=refine_delta, band=refine_band,
+                               should_stop=should_stop)
+        if partial and susp:
+            idx = max(susp) + 1   # the interpolated series ends at the last scored frame
+        # flat crops (NaN) are skipped as in dense mode: no key, no interpolated value at their frame
+        flat = {k for k, v in susp.items() if not np.isfinite(v)}
+        agg.nonfinite += len(flat)
+        keys = np.array(sorted(set(susp) - flat))
+        if len(keys):
+            grid = np.arange(0, keys[-1] + 1, every)
+            dense = np.interp(grid, keys, [susp[k] for k in keys])
+            for g, s_ in zip(grid, dense):
+                g = int(g)
+                if g in flat:
+                    continue
+                agg.update(s_, details.get(g) or {"frame_idx": g, "time_sec": round(g / float(fps), 3),
+                                                  "interpolated": True})
+                if on_frame is not None:
+                    on_frame(agg.last)
+        sampled = len(keys)
+        budget.MODEL.observe(info["mpx"], 0, 0.0, fresh, score_s, scale)  # seeks: no decode rate
+    else:
+        decode_s = 0.0
+        while True:
+            t0 = time.perf_counter()
+            ok, frame = cap.read()
+            decode_s += time.perf_counter() - t0
+            if not ok:
+                break
+            if idx % every:
+                idx += 1
+                continue
+            if over_budget(agg.n + agg.nonfinite):
+                partial = True
+                break
+
+            df = score_frame(frame, idx)
+            if agg.update(df["suspicion"], df) is not None:
+                if on_frame is not None:
+                    on_frame(agg.last)
+                if progress is not None and agg.n % progress_every == 0:
+                    snap = agg.snapshot()
+                    snap["fraction"] = min(1.0, (idx + 1) / total) if total else None
+                    progress(snap)
+            idx += 1
+        budget.MODEL.observe(info["mpx"], idx, decode_s, fresh, score_s, scale)
 
     cap.release()
 
-    if not susp_list:
+    if agg.n == 0:
         return {
             "video": str(video_path),
-            "error": "No frames processed (empty/corrupt input or stride too large)."
+            "error": ("No scorable frames (every face crop was flat, e.g. black or faded frames)."
+                      if agg.nonfinite else "No frames processed (empty/corrupt input or stride too large).")
         }
 
-    ema = ema_series(susp_list, alpha=alpha)
-    video_score = float(np.percentile(ema, percentile))
-    k_required = max(3, len(ema) // 20)
-    decision = (video_score >= THRESH) and (sum(s >= THRESH for s in ema) >= k_required)
+    video_score = agg.video_score()
+    decision = agg.decision()
+    # block bootstrap over the (temporally correlated) EMA series: CI of video_score
+    ci_lo, ci_hi = percentile_ci(agg.ema_values(), percentile, B=300, alpha=0.05, block="auto")
+
+    per_frame = agg.per_frame()
+    if sampled is not None:
+        per_frame = [r for r in per_frame if not r.get("interpolated")]
+
+    stages = {"texture": {"seconds": time.perf_counter() - t_start,
+                          "frames": agg.n if sampled is None else sampled}}
+    decided_by = "texture"
+    if top is not None and cas.uncertain(video_score, THRESH, cascade_band):
+        stages["deep"] = cas.run_deep_stage(top)
+        if "error" not in stages["deep"]:
+            decision = stages["deep"]["decision"]
+            decided_by = "deep"
 
-    return {
+    res = {
         "video": str(video_path),
-        "frames_scored": len(susp_list),
+        "frames_scored": agg.n if sampled is None else sampled,
+        "sampling": "dense" if sampled is None else "adaptive",
+        "frames_interpolated": 0 if sampled is None else agg.n - sampled,
+        "frames_reused": reused,
+        "frames_nonfinite": agg.nonfinite,
+        "reuse_rate": reused / max(1, agg.n if sampled is None else sampled),
         "fps": float(fps),
+        "profile": prof["name"],
+        "artifact_version": art["version"],
+        "every": int(every),
         "ema_alpha": alpha,
         "aggregator": f"EMA+p{int(percentile)}",
         "threshold_used": float(THRESH),
         "video_score": video_score,
+        "ci": [ci_lo, ci_hi],
+        "ci_level": 0.95,
         "decision": bool(decision),
+        "decided_by": decided_by,
+        "stages": stages,
+        "k_required": agg.k_required(),
+        "k_hits": agg.hits,
         "per_frame": per_frame,
+        "per_frame_complete": agg.complete,
+        "partial": partial,
+        "coverage": (min(1.0, idx / total) if partial and total else (None if partial else 1.0)),
+        "budget": None if planned is None else dict(planned, deadline_ms=deadline_ms, max_frames=max_frames,
+                                                     elapsed_ms=1000.0 * (time.perf_counter() - t_start)),
         "heatmaps_dir": str(heatmap_dir) if heatmap_dir else None
     }
+    if feat_rows is not None:
+        import jobs
+        res["job_id"] = job_id or jobs.new_id()
+        jobs.save(res["job_id"], {
+            "video": str(video_path), "profile": prof["name"], "features": list(prof["features"]),
+            "feature_version": profiles.feature_version(prof["name"]),
+            "artifact_version": art["version"], "fps": float(fps), "every": int(every), "tau": float(tau),
+            "percentile": float(percentile), "per_frame_limit": per_frame_limit,
+            "sampling": res["sampling"], "partial": partial,
+            "result": {k: res[k] for k in ("artifact_version", "threshold_used", "video_score",
+                                           "decision", "decided_by", "k_hits", "k_required")},
+        }, [i for i, _ in feat_rows], [f for _, f in feat_rows], jobs_dir=jobs_dir)
+    return res
+
+def score_options(video_path: Path, opts: dict, job_id: Optional[str] = None,
+                  heatmap_root: Optional[Path] = None, save_job: bool = False):
+    """One analysis as the API requests it (api_server._options dict); shared with spool workers."""
+    if opts.get("faces") == "all":  # dense only: api_server._options refuses the other combinations
+        from multiface import score_video_faces
+        return score_video_faces(video_path, profile=opts["profile"], tau=0.6, percentile=95.0,
+                                 save_job=save_job, job_id=job_id)
+    return score_single_video(
+        video_path=video_path,
+        profile=opts["profile"],
+        adaptive=(opts["sampling"] == "adaptive"),
+        deadline_ms=opts["deadline_ms"],
+        max_frames=opts["max_frames"],
+        cascade=opts["cascade"],
+        cascade_band=opts["cascade_band"],
+        tau=0.6,
+        percentile=95.0,
+        heatmap_root=heatmap_root,
+        save_first_n_heatmaps=50,
+        save_job=save_job,
+        job_id=job_id,
+    )
 
 def main():
     ap = argparse.ArgumentParser(description="Score a single uploaded video and save heatmaps.")
     ap.add_argument("video_path", help="Path to the uploaded video. If not found, tries backend/uploads/<name>.")
-    ap.add_argument("--every", type=int, default=3)
+    ap.add_argument("--every", type=int, default=None, help="Frame stride (default: the profile's)")
+    ap.add_argument("--profile", choices=sorted(profiles.PROFILES), default=profiles.DEFAULT_PROFILE)
+    ap.add_argument("--adaptive", action="store_true",
+                    help="Coarse-to-fine sampling: refine only around suspicious/changing segments")
+    ap.add_argument("--coarse-frames", type=int, default=48)
+    ap.add_argument("--dedup-threshold", type=float, default=0.0,
+                    help="Reuse the last frame's features when the thumbnail changed less than this (0 = off, the default; e.g. 1.0)")
+    ap.add_argument("--deadline-ms", type=float, default=None,
+                    help="Latency budget: plan stride/downscale to fit, stop early (partial) if needed")
+    ap.add_argument("--max-frames", type=int, default=None, help="Score at most this many frames")
+    ap.add_argument("--cascade", action="store_true",
+                    help="Escalate videos whose score is near the threshold to the deep model")
+    ap.add_argument("--cascade-band", type=float, default=0.1,
+                    help="Uncertainty band around THRESH_VIDEO that triggers the deep model")
+    ap.add_argument("--cascade-crops", type=int, default=16,
+                    help="Most suspicious face crops handed to the deep model")
     ap.add_argument("--tau", type=float, default=0.6)
     ap.add_argument("--percentile", type=float, default=95.0)
     ap.add_argument("--heatmap-root", default=str(BACKEND_DIR / "out" / "heatmaps"))
+    ap.add_argument("--per-frame-limit", type=int, default=2000,
+                    help="Max per-frame records kept (reservoir); memory stays bounded")
+    ap.add_argument("--multi-face", action="store_true",
+                    help="Score every detected face under a track id (multiface.py) instead of the largest")
+    ap.add_argument("--max-faces", type=int, default=8, help="Faces per frame with --multi-face")
+    ap.add_argument("--save-job", action="store_true",
+                    help="Store per-frame features under out/jobs for later re-scoring (jobs.py)")
+    ap.add_argument("--format", choices=("json", "jsonl", "npz"), default="json",
+                    help="json: one document at the end; jsonl: a line per frame as it is scored, then the "
+                         "summary line; npz: per-frame matrices to --out (mmap-able), summary on stdout")
+    ap.add_argument("--out", default=None,
+                    help="jsonl: append to this file instead of stdout; npz: default out/frames/<video file name>.npz")
     args = ap.parse_args()
 
     in_path = Path(args.video_path)
@@ -143,14 +462,58 @@ def main():
         print(f"[warn] unexpected extension {in_path.suffix}; attempting anyway…")
 
     heat_root = Path(args.heatmap_root)
-    result = score_single_video(
-        video_path=in_path,
-        every=args.every,
-        tau=args.tau,
-        percentile=args.percentile,
-        heatmap_root=heat_root,
-        save_first_n_heatmaps=50
-    )
+    sink, on_frame = None, None
+    if args.format == "jsonl":
+        sink = open(args.out, "a") if args.out else sys.stdout
+        def on_frame(rec):
+            # flushed per frame: a crash mid-video keeps everything scored so far
+            sink.write(json.dumps(dict(rec, type="frame")) + "\n"); sink.flush()
+    elif args.format == "npz":
+        from encoding import FrameColumns
+        on_frame = FrameColumns(profiles.get(args.profile)["features"])
+
+    if args.multi_face:
+        if args.format == "npz":
+            raise SystemExit("[error] --format npz holds one face track per video; use json/jsonl with --multi-face")
+        from multiface import score_video_faces
+        result = score_video_faces(in_path, every=args.every, tau=args.tau, percentile=args.percentile,
+                                   profile=args.profile, max_faces=args.max_faces,
+                                   per_frame_limit=args.per_frame_limit)
+        on_frame = None
+    else:
+        result = score_single_video(
+            video_path=in_path,
+            every=args.every,
+            tau=args.tau,
+            percentile=args.percentile,
+            heatmap_root=heat_root,
+            save_first_n_heatmaps=50,
+            per_frame_limit=args.per_frame_limit,
+            profile=args.profile,
+            adaptive=args.adaptive,
+            coarse_frames=args.coarse_frames,
+            dedup_threshold=args.dedup_threshold,
+            deadline_ms=args.deadline_ms,
+            max_frames=args.max_frames,
+            cascade=args.cascade,
+            cascade_band=args.cascade_band,
+            cascade_crops=args.cascade_crops,
+            save_job=args.save_job,
+            on_frame=on_frame,
+        )
+    if on_frame is not None:
+        result.pop("per_frame", None)  # every frame is in the stream / the matrices already
+    if args.format == "jsonl":
+        sink.write(json.dumps(dict(result, type="video")) + "\n"); sink.flush()
+        if sink is not sys.stdout:
+            sink.close()
+        return
+    if args.format == "npz" and "error" not in result:
+        from encoding import write_npz
+        out = Path(args.out) if args.out else BACKEND_DIR / "out" / "frames" / f"{in_path.name}.npz"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        write_npz(out, on_frame.arrays(), meta=result)
+        result["frames_file"] = str(out)
     print(json.dumps(result, indent=2))
 
 if __name__ == "__main__":
@@ -3,6 +3,8 @@ from pathlib import Path
 import argparse
 import numpy as np
 import cv2
+import registry
+import profiles
 
 CACHE_PATH = Path(__file__).resolve().parent / "scaler_values_cache.npz"
 
@@ -90,16 +92,20 @@ def chroma_luma_mismatch(bgr):
     return float(1.0 - 0.5 * (cu + cv))
 
 # --- simple face crop (fallback to whole frame) ---
-HAAR = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
 def face_crop(bgr, target=256):
     g = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-    faces = HAAR.detectMultiScale(g, 1.1, 5, minSize=(80, 80))
+    faces = registry.haar().detectMultiScale(g, 1.1, 5, minSize=(80, 80))
     if len(faces) == 0:
         return cv2.resize(bgr, (target, target), cv2.INTER_AREA)
     x, y, w, h = max(faces, key=lambda f: f[2]*f[3])
     return cv2.resize(bgr[y:y+h, x:x+w], (target, target), cv2.INTER_AREA)
 
-def feature_vector(face_bgr):
+def feature_vector(face_bgr, profile=None):
+    if (profile or profiles.DEFAULT_PROFILE) != profiles.DEFAULT_PROFILE:
+        # other profiles use texture_model's parameterised extractor directly
+        import texture_model
+        metrics, _ = texture_model.extract_features(face_bgr, profile)
+        return np.array(list(metrics.values()), dtype=np.float32)
     gray = preprocess_gray(face_bgr)
     m1 = compute_sharpness(gray)
     m2 = compute_high_ratio(gray)
@@ -128,64 +134,156 @@ def _load_from_cache(path: Path = CACHE_PATH) -> FixedScaler:
     d = np.load(path)
     return FixedScaler(d["mean"], d["scale"])
 
-# Export on import
-scaler = _load_from_cache()
+# `scaler` is resolved lazily through the shared registry (no cache load at import)
+def __getattr__(name):
+    if name == "scaler":
+        return registry.scaler()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# --- streaming mean/variance (Welford per sample, Chan et al. for merging) ---
+class RunningStats:
+    """Constant-memory mean/variance accumulator; mergeable across workers."""
+    def __init__(self, dim=5):
+        self.n    = 0
+        self.mean = np.zeros(dim, np.float64)
+        self.m2   = np.zeros(dim, np.float64)
+
+    def update(self, x):
+        x = np.asarray(x, dtype=np.float64).ravel()
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.m2 = other.n, other.mean.copy(), other.m2.copy()
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.n / n)
+        self.m2 = self.m2 + other.m2 + delta * delta * (self.n * other.n / n)
+        self.n = n
+        return self
+
+    @property
+    def std(self):
+        # population std, same as X.std(0) on the stacked samples
+        return np.sqrt(self.m2 / max(1, self.n))
+
+    @classmethod
+    def from_cache(cls, path: Path = CACHE_PATH, count=None):
+        d = np.load(path)
+        n = int(d["count"]) if "count" in d.files else count
+        if not n:
+            raise SystemExit(f"{path} has no sample count; pass --prior-count to update it")
+        rs = cls(d["mean"].shape[0])
+        rs.n = int(n)
+        rs.mean = d["mean"].astype(np.float64)
+        rs.m2 = d["scale"].astype(np.float64) ** 2 * rs.n
+        return rs
 
 # --- CLI: fit scaler on REAL videos and save cache ---
-def _fit_from_folder(real_dir: Path, every=5, max_frames=400):
-    suf = {".mp4",".mov",".mkv",".avi",".webm",".m4v"}
-    vids = [p for p in real_dir.rglob("*") if p.suffix.lower() in suf]
+SUFFIXES = {".mp4",".mov",".mkv",".avi",".webm",".m4v"}
+
+def _video_stats(vp: Path, every=5, max_frames=400, profile=None) -> RunningStats:
+    prof = profiles.get(profile)
+    rs = RunningStats(len(prof["features"]))
+    cap = cv2.VideoCapture(str(vp))
+    if not cap.isOpened():
+        print(f"[warn] skip {vp.name}"); return rs
+    idx = 0
+    while True:
+        ok, f = cap.read()
+        if not ok: break
+        if idx % every:
+            idx += 1; continue
+        rs.update(feature_vector(face_crop(f, target=prof["face_size"]), prof["name"]))
+        idx += 1
+        if rs.n >= max_frames: break
+    cap.release()
+    return rs
+
+def _fit_from_folder(real_dir: Path, every=5, max_frames=400, workers=1,
+                     update=False, prior_count=None, cache_path: Path = None, profile=None,
+                     assume_new=False):
+    """Fit (or, with `update`, extend) the scaler cache; videos are keyed by their path under real_dir.
+
+    A cache written before videos were recorded can't tell which videos it already
+    holds: updating it needs `assume_new` (every video under real_dir is new to it).
+    """
+    cache_path = Path(cache_path or profiles.artifact_paths(profile)["scaler"])
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    vids = sorted(p for p in real_dir.rglob("*") if p.suffix.lower() in SUFFIXES)
+    key = lambda p: p.relative_to(real_dir).as_posix()
+    total, seen = RunningStats(len(profiles.get(profile)["features"])), set()
+    if update:
+        total = RunningStats.from_cache(cache_path, count=prior_count)
+        d = np.load(cache_path)
+        if "videos" in d.files:
+            seen = set(d["videos"].tolist())
+            if "video_key" not in d.files:  # older caches recorded bare file names
+                print("[warn] cache lists videos by file name; same-named files in subfolders count as seen")
+                vids = [p for p in vids if p.name not in seen]
+                seen = {key(p) for p in real_dir.rglob("*") if p.name in seen}
+            else:
+                vids = [p for p in vids if key(p) not in seen]
+        elif not assume_new:
+            raise SystemExit(f"{cache_path} does not record which videos it holds; updating it would count "
+                             f"{real_dir} twice. Refit with --fit, or pass --assume-new if none of them is in it")
+        print(f"[info] updating cache (n={total.n}) with {len(vids)} new videos")
     if not vids:
-        raise SystemExit(f"No videos in {real_dir}")
-    X = []
-    for vp in vids:
-        cap = cv2.VideoCapture(str(vp))
-        if not cap.isOpened():
-            print(f"[warn] skip {vp.name}"); continue
-        idx = saved = 0
-        while True:
-            ok, f = cap.read()
-            if not ok: break
-            if idx % every:
-                idx += 1; continue
-            face = face_crop(f)
-            X.append(feature_vector(face))
-            saved += 1; idx += 1
-            if saved >= max_frames: break
-        cap.release()
-    X = np.array(X, np.float32)
-    if len(X) < 20:
-        raise SystemExit(f"Too few samples: {len(X)}")
-    mean, std = X.mean(0), X.std(0)
-    np.savez_compressed(CACHE_PATH, mean=mean.astype(np.float32), scale=std.astype(np.float32))
-    print(f"[ok] wrote {CACHE_PATH}")
+        raise SystemExit(f"No {'new ' if update else ''}videos in {real_dir}")
+
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            n = len(vids)
+            parts = ex.map(_video_stats, vids, [every] * n, [max_frames] * n, [profile] * n)
+            for vp, rs in zip(vids, parts):
+                total.merge(rs); seen.add(key(vp))
+    else:
+        for vp in vids:
+            total.merge(_video_stats(vp, every=every, max_frames=max_frames, profile=profile)); seen.add(key(vp))
+
+    if total.n < 20:
+        raise SystemExit(f"Too few samples: {total.n}")
+    mean, std = total.mean.astype(np.float32), total.std.astype(np.float32)
+    np.savez_compressed(cache_path, mean=mean, scale=std, count=np.int64(total.n),
+                        videos=np.array(sorted(seen)), video_key=np.str_("relpath"))
+    print(f"[ok] wrote {cache_path}  (n={total.n})")
+    print("[info] serving is unchanged until tune_loss.py publishes weights fitted on this scaler")
     print("[mean]", mean)
     print("[std ]", std)
 
 if __name__ == "__main__":
-    import argparse
     ap = argparse.ArgumentParser()
     ap.add_argument("--real-dir", default=str(Path(__file__).resolve().parent / "real_data"))
     ap.add_argument("--every", type=int, default=5)
     ap.add_argument("--max-frames", type=int, default=400)
+    ap.add_argument("--workers", type=int, default=1, help="Fit videos in parallel processes")
+    ap.add_argument("--update", action="store_true",
+                    help="Fold videos not yet in the cache into the existing stats")
+    ap.add_argument("--assume-new", action="store_true",
+                    help="With --update on a cache that doesn't list its videos: treat every video as new")
+    ap.add_argument("--prior-count", type=int, default=None,
+                    help="Sample count behind a legacy cache that does not store one")
+    ap.add_argument("--profile", choices=sorted(profiles.PROFILES), default=profiles.DEFAULT_PROFILE,
+                    help="Feature profile; non-default profiles write to artifacts/<profile>/")
     ap.add_argument("--print-stats", dest="print_stats", action="store_true")
     ap.add_argument("--fit", action="store_true", help="Fit scaler cache from real videos")
     args = ap.parse_args()
 
-    if args.fit:
-        _fit_from_folder(Path(args.real_dir), every=args.every, max_frames=args.max_frames)
-
-    if args.print_stats:
-        s = _load_from_cache()
-        print("cache:", CACHE_PATH)
-        print("mean =", s.mean)
-        print("std  =", s.scale)
-
+    if args.fit or args.update:
+        _fit_from_folder(Path(args.real_dir), every=args.every, max_frames=args.max_frames,
+                         workers=args.workers, update=args.update, prior_count=args.prior_count,
+                         profile=args.profile, assume_new=args.assume_new)
 
-    if args.fit:
-        _fit_from_folder(Path(args.real_dir), every=args.every, max_frames=args.max_frames)
     if args.print_stats:
-        s = _load_from_cache()
-        print("cache:", CACHE_PATH)
+        cache = profiles.artifact_paths(args.profile)["scaler"]
+        s = _load_from_cache(cache)
+        print("cache:", cache)
         print("mean =", s.mean)
         print("std  =", s.scale)
@@ -0,0 +1,358 @@
+# backend/spool.py
+"""File-system job spool shared by the API and any number of analysis workers.
+
+Layout under SPOOL_DIR (local disk, or a shared mount for several hosts):
+  pending/<seq>_<id>.json   waiting, claimed oldest first
+  leased/<seq>_<id>.json    being worked on; its mtime is the heartbeat
+  done/<id>.json            result;  failed/<id>.json  gave up after max_attempts
+  workers/<worker>.json     liveness of each worker (mtime), for Retry-After
+A worker claims a job by rename(pending -> leased), which exactly one process
+wins, then stamps its lease token in it. A heartbeat thread touches the leased
+file every visibility/3 s while the analysis runs. Any worker polling the spool
+moves leases whose heartbeat is older than `visibility` back to pending (or to
+failed once attempts reach max_attempts), so a killed worker or a dead host only
+delays its job. Everything is rename / replace, no lock server; temp files
+carry a uuid, so hosts and containers with colliding pids never share one.
+
+api_server (ANALYSIS_MODE=spool) only enqueues and reads results; capacity is
+added by starting workers anywhere that sees the spool and the upload folder:
+
+    python backend/spool.py worker --processes 4
+    python backend/spool.py status
+"""
+from pathlib import Path
+import argparse
+import json
+import math
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+
+BACKEND_DIR = Path(__file__).resolve().parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from governor import Busy
+
+STATES = ("pending", "leased", "done", "failed")
+
+class LeaseLost(Exception):
+    """The lease expired and the job went back to the queue (or to another worker)."""
+
+class Spool:
+    def __init__(self, root, visibility: float = 60.0, max_attempts: int = 3, max_pending: int = 1000):
+        self.root = Path(root)
+        self.visibility = float(visibility)
+        self.max_attempts = int(max_attempts)
+        self.max_pending = int(max_pending)
+        for d in STATES + ("workers", "tmp"):
+            (self.root / d).mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        return cls(env("SPOOL_DIR", str(BACKEND_DIR / "out" / "spool")),
+                   visibility=float(env("SPOOL_VISIBILITY_S", "60")),
+                   max_attempts=int(env("SPOOL_MAX_ATTEMPTS", "3")),
+                   max_pending=int(env("SPOOL_MAX_PENDING", "1000")))
+
+    # ---- files ----
+    def _write(self, path: Path, rec: dict):
+        tmp = self.root / "tmp" / f"{path.name}.{uuid.uuid4().hex}"
+        tmp.write_text(json.dumps(rec))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(path: Path):
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _find(self, job_id: str):
+        """(state, path) of a job, or (None, None)."""
+        for state in ("done", "failed"):
+            p = self.root / state / f"{job_id}.json"
+            if p.exists():
+                return state, p
+        for state in ("leased", "pending"):
+            for p in (self.root / state).glob(f"*_{job_id}.json"):
+                return state, p
+        return None, None
+
+    # ---- producer side ----
+    def admit(self):
+        """Busy (-> 429) when the backlog is already max_pending deep."""
+        pending = len(os.listdir(self.root / "pending"))
+        if pending >= self.max_pending:
+            raise Busy(self.retry_after(pending), "analysis backlog is full")
+
+    def enqueue(self, payload: dict, job_id: str = None) -> str:
+        job_id = job_id or str(uuid.uuid4())
+        rec = {"id": job_id, "payload": payload, "enqueued": time.time(), "attempts": 0, "errors": []}
+        self._write(self.root / "pending" / f"{time.time_ns():020d}_{job_id}.json", rec)
+        return job_id
+
+    def status(self, job_id: str):
+        """The job record plus its 'state', or None if unknown."""
+        state, path = self._find(job_id)
+        if state is None:
+            return None
+        rec = self._read(path)
+        if rec is None:  # moved between find and read: look again
+            return self.status(job_id)
+        rec["state"] = state
+        if state == "pending":
+            rec["position"] = sorted(os.listdir(self.root / "pending")).index(path.name) \
+                if path.exists() else 0
+        return rec
+
+    def wait(self, job_id: str, timeout: float, poll: float = 0.2):
+        """Status once the job is done/failed, or the latest status after `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        while True:
+            rec = self.status(job_id)
+            if rec is None or rec["state"] in ("done", "failed") or time.monotonic() >= deadline:
+                return rec
+            time.sleep(poll)
+
+    def stats(self) -> dict:
+        now = time.time()
+        alive = sum(1 for p in (self.root / "workers").iterdir()
+                    if now - p.stat().st_mtime < self.visibility)
+        out = {s: len(os.listdir(self.root / s)) for s in STATES}
+        out.update(workers_alive=alive, avg_seconds=self._avg())
+        return out
+
+    def retry_after(self, pending: int = None) -> int:
+        st = self.stats()
+        pending = st["pending"] if pending is None else pending
+        return max(1, math.ceil(self._avg() * (pending + 1) / max(1, st["workers_alive"])))
+
+    def _avg(self) -> float:
+        rec = self._read(self.root / "stats.json")
+        return rec["seconds"] if rec else 15.0
+
+    def _observe(self, seconds: float, alpha: float = 0.2):
+        rec = self._read(self.root / "stats.json")  # last writer wins; a smoothed hint only
+        s = seconds if rec is None else alpha * seconds + (1 - alpha) * rec["seconds"]
+        self._write(self.root / "stats.json", {"seconds": s})
+
+    # ---- worker side ----
+    def beat_worker(self, worker: str, info: dict = None):
+        self._write(self.root / "workers" / f"{worker}.json", dict(info or {}, at=time.time()))
+
+    def reap(self) -> int:
+        """Requeue (or fail) leases whose heartbeat is older than the visibility timeout."""
+        n, now = 0, time.time()
+        for p in (self.root / "leased").iterdir():
+            try:
+                if now - p.stat().st_mtime < self.visibility:
+                    continue
+                claimed = self.root / "tmp" / f"reap.{uuid.uuid4().hex}.{p.name}"
+                os.rename(p, claimed)  # one reaper wins; the old holder's heartbeat now fails
+            except FileNotFoundError:
+                continue  # another worker reaped or finished it first
+            rec = self._read(claimed)
+            if rec is None:
+                claimed.unlink(missing_ok=True)
+                continue
+            rec["errors"].append(f"lease of {rec.get('lease', {}).get('worker')} expired")
+            rec.pop("lease", None)
+            if rec["attempts"] >= self.max_attempts:
+                self._write(self.root / "failed" / f"{rec['id']}.json", rec)
+                claimed.unlink()
+            else:
+                self._write(claimed, rec)
+                os.rename(claimed, self.root / "pending" / p.name)  # same name: keeps its place in line
+            n += 1
+        return n
+
+    def lease(self, worker: str):
+        """Claim the oldest pending job: its record with a 'lease' stamped in, or None."""
+        for name in sorted(os.listdir(self.root / "pending")):
+            src, dst = self.root / "pending" / name, self.root / "leased" / name
+            try:
+                os.rename(src, dst)   # the claim: exactly one rename wins
+            except FileNotFoundError:
+                continue
+            os.utime(dst)             # rename keeps the enqueue mtime; start the heartbeat clock now
+            rec = self._read(dst)
+            if rec is None:
+                continue
+            rec["attempts"] += 1
+            rec["lease"] = {"worker": worker, "token": uuid.uuid4().hex, "at": time.time()}
+            self._write(dst, rec)
+            rec["_path"] = str(dst)
+            return rec
+        return None
+
+    def _held(self, job: dict) -> bool:
+        cur = self._read(Path(job["_path"]))
+        return cur is not None and cur.get("lease", {}).get("token") == job["lease"]["token"]
+
+    def heartbeat(self, job: dict):
+        if not self._held(job):
+            raise LeaseLost(job["id"])
+        try:
+            os.utime(job["_path"])
+        except FileNotFoundError:  # reaped between the check and the touch
+            raise LeaseLost(job["id"])
+
+    def complete(self, job: dict, result: dict, seconds: float = None):
+        rec = {k: v for k, v in job.items() if k != "_path"}
+        rec.update(result=result, finished=time.time(), seconds=seconds)
+        self._write(self.root / "done" / f"{job['id']}.json", rec)  # idempotent: same job, same result
+        if self._held(job):
+            Path(job["_path"]).unlink(missing_ok=True)
+        if seconds is not None:
+            self._observe(seconds)
+
+    def fail(self, job: dict, error: str):
+        """Retry later (back to pending) or, after max_attempts, park it in failed/."""
+        if not self._held(job):
+            return
+        path = Path(job["_path"])
+        rec = {k: v for k, v in job.items() if k not in ("_path", "lease")}
+        rec["errors"] = rec["errors"] + [error]
+        if rec["attempts"] >= self.max_attempts:
+            self._write(self.root / "failed" / f"{job['id']}.json", rec)
+            path.unlink(missing_ok=True)
+        else:
+            self._write(path, rec)
+            os.rename(path, self.root / "pending" / path.name)
+
+def analyze(payload: dict, job_id: str) -> dict:
+    """Default handler: the same analysis /api/analyze runs inline."""
+    from runner import score_options
+    heatmaps = Path(os.environ.get("HEATMAP_DIR", BACKEND_DIR / "out" / "heatmaps"))
+    return score_options(Path(payload["video"]), payload["options"], job_id=job_id,
+                         heatmap_root=heatmaps, save_job=payload.get("save_job", False))
+
+def work_loop(spool: Spool, worker: str, handler=analyze, stop: threading.Event = None,
+              poll: float = 0.5, max_jobs: int = None):
+    """Lease -> run with heartbeats -> complete/fail, until `stop` is set (or `max_jobs` ran).
+
+    Spool I/O errors (e.g. a flaky shared mount) are logged and the loop goes on;
+    a job whose complete/fail didn't land is retried once its lease expires.
+    """
+    stop = stop or threading.Event()
+    info = {"host": socket.gethostname(), "pid": os.getpid()}
+    done = 0
+    while not stop.is_set() and (max_jobs is None or done < max_jobs):
+        try:
+            ran = _work_once(spool, worker, info, handler)
+        except OSError as e:
+            print(f"[spool] {worker}: {e!r}", file=sys.stderr)
+            ran = False
+        if ran:
+            done += 1
+        else:
+            stop.wait(poll)
+
+def _work_once(spool: Spool, worker: str, info: dict, handler) -> bool:
+    """One poll: reap, lease, run; False if there was nothing to do."""
+    spool.beat_worker(worker, info)
+    spool.reap()
+    job = spool.lease(worker)
+    if job is None:
+        return False
+    beating = threading.Event()
+
+    def beat():
+        while not beating.wait(spool.visibility / 3.0):
+            try:
+                spool.heartbeat(job)
+                spool.beat_worker(worker, info)
+            except LeaseLost:
+                print(f"[spool] {worker}: lost the lease on {job['id']}", file=sys.stderr)
+                return
+            except OSError as e:
+                print(f"[spool] {worker}: heartbeat failed: {e!r}", file=sys.stderr)
+
+    hb = threading.Thread(target=beat, daemon=True)
+    hb.start()
+    t0 = time.perf_counter()
+    try:
+        res = handler(job["payload"], job["id"])
+        error = res.get("error") if isinstance(res, dict) else None
+    except (Exception, SystemExit) as e:
+        res, error = None, repr(e)
+    finally:
+        beating.set()
+        hb.join()
+    if error is None:
+        spool.complete(job, res, time.perf_counter() - t0)
+    else:
+        spool.fail(job, error)
+    return True
+
+def _process_main(root: str, visibility: float, max_attempts: int, threads: int, name: str):
+    from governor import pin_blas_threads, pin_threads
+    pin_blas_threads(threads)
+    pin_threads(threads)
+    spool = Spool(root, visibility=visibility, max_attempts=max_attempts)
+    try:
+        work_loop(spool, name)
+    except KeyboardInterrupt:
+        pass
+
+def main():
+    ap = argparse.ArgumentParser(description="Analysis job spool: run workers or inspect the queue.")
+    ap.add_argument("--spool-dir", default=os.environ.get("SPOOL_DIR", str(BACKEND_DIR / "out" / "spool")))
+    ap.add_argument("--visibility", type=float, default=float(os.environ.get("SPOOL_VISIBILITY_S", "60")),
+                    help="Seconds without a heartbeat before a lease is given to another worker")
+    ap.add_argument("--max-attempts", type=int, default=int(os.environ.get("SPOOL_MAX_ATTEMPTS", "3")))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("worker", help="Run analysis worker processes on this host")
+    w.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    w.add_argument("--threads", type=int, default=1, help="OpenCV/BLAS threads per process")
+    st = sub.add_parser("status", help="Queue counts, or one job's record")
+    st.add_argument("job_id", nargs="?")
+    args = ap.parse_args()
+
+    if args.cmd == "status":
+        spool = Spool(args.spool_dir, visibility=args.visibility, max_attempts=args.max_attempts)
+        print(json.dumps(spool.status(args.job_id) if args.job_id else spool.stats(), indent=2))
+        return
+
+    import multiprocessing as mp
+    ctx = mp.get_context("spawn")
+    host = socket.gethostname()
+
+    def spawn(i):
+        p = ctx.Process(target=_process_main, name=f"{host}-{i}",
+                        args=(args.spool_dir, args.visibility, args.max_attempts, args.threads,
+                              f"{host}-{os.getpid()}-{i}"))
+        p.start()
+        return p
+
+    procs = [spawn(i) for i in range(args.processes)]
+    started = [time.monotonic()] * len(procs)
+    print(f"[spool] {len(procs)} workers on {args.spool_dir}", file=sys.stderr)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while True:
+            # keep capacity: replace any worker that died (its job is retried after its lease expires),
+            # at most once per 5 s per slot so a worker that can't start doesn't spin
+            for i, p in enumerate(procs):
+                if not p.is_alive() and time.monotonic() - started[i] >= 5.0:
+                    print(f"[spool] worker {p.name} exited ({p.exitcode}); restarting", file=sys.stderr)
+                    procs[i], started[i] = spawn(i), time.monotonic()
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        # a job cut short here is not lost: its lease expires and another worker retries it
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.join(timeout=10)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# backend/tests/test_cascade.py
+"""TopCrops keeps the k most suspicious crops; flat-crop NaNs never displace a real one."""
+from pathlib import Path
+import sys
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from cascade import TopCrops
+
+def _feed(top, suspicions):
+    for i, s in enumerate(suspicions):
+        if top.wants(s, i):
+            top.push(s, i, f"crop-{i}")
+
+def test_keeps_top_k_in_frame_order():
+    top = TopCrops(3)
+    _feed(top, [0.1, 0.9, 0.3, 0.8, 0.2, 0.7])
+    assert top.crops() == ([1, 3, 5], ["crop-1", "crop-3", "crop-5"])
+
+def test_nonfinite_suspicions_are_skipped():
+    top = TopCrops(2)
+    _feed(top, [float("nan"), 0.2, float("nan"), 0.95, float("inf"), 0.5, float("nan")])
+    assert not top.wants(float("nan"), 9)
+    top.push(float("nan"), 10, "late")
+    assert top.crops() == ([3, 5], ["crop-3", "crop-5"])
+
+def test_zero_k_keeps_nothing():
+    top = TopCrops(0)
+    _feed(top, [0.9])
+    assert len(top) == 0
@@ -0,0 +1,64 @@
+# backend/tests/test_governor.py
+"""Admission control: tickets/slots on a temp GOVERNOR_DIR, and the API's 429 + Retry-After."""
+from contextlib import ExitStack
+from pathlib import Path
+import io
+import sys
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import governor
+
+@pytest.fixture
+def gov(tmp_path, monkeypatch):
+    monkeypatch.setenv("GOVERNOR_DIR", str(tmp_path / "governor"))
+    monkeypatch.setenv("ANALYSIS_SLOTS", "1")
+    monkeypatch.setenv("ANALYSIS_QUEUE", "1")
+    monkeypatch.setenv("ANALYSIS_MAX_WAIT_S", "0.2")
+    return governor.Governor.from_env()
+
+def test_admit_busy_when_slots_and_queue_are_full(gov):
+    with ExitStack() as held:
+        held.enter_context(gov.admit())
+        held.enter_context(gov.admit())
+        assert gov.status()["queued"] == 2
+        with pytest.raises(governor.Busy) as e:
+            with gov.admit():
+                pass
+        assert e.value.retry_after >= 1 and "queue is full" in e.value.reason
+    assert gov.status()["queued"] == 0
+    with gov.admit():  # tickets are released on exit
+        pass
+
+def test_run_times_out_when_slot_is_taken(gov):
+    with gov.admit(), gov.run():
+        assert gov.status()["running"] == 1
+        with gov.admit():
+            with pytest.raises(governor.Busy) as e:
+                with gov.run():
+                    pass
+    assert "timed out" in e.value.reason
+    assert gov.status()["running"] == 0
+
+def test_retry_after_scales_with_average_and_queue(gov):
+    gov._record(10.0)
+    assert gov.retry_after(0) == 10
+    assert gov.retry_after(1) == 20
+
+def test_analyze_answers_429_with_retry_after(gov, monkeypatch):
+    import api_server
+    monkeypatch.setattr(api_server, "GOVERNOR", gov)
+    monkeypatch.setattr(api_server, "SPOOL", None)
+    client = api_server.app.test_client()
+    with gov.admit(), gov.admit():
+        r = client.post("/api/analyze", data={"video": (io.BytesIO(b"\0" * 64), "a.mp4")},
+                        content_type="multipart/form-data")
+    assert r.status_code == 429
+    body = r.get_json()
+    assert int(r.headers["Retry-After"]) == body["retry_after"] >= 1
+    assert "queue is full" in body["error"]
+    assert not list(api_server.UPLOAD_FOLDER.glob("*_a.mp4"))  # refused before the upload was saved
@@ -0,0 +1,73 @@
+# backend/tests/test_jobs.py
+"""Stored jobs: save -> rescore parity, id validation, and the feature_version guards."""
+from pathlib import Path
+import json
+import sys
+
+import numpy as np
+import cv2
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import jobs
+import registry
+from runner import score_single_video
+
+def _clip(path: Path, frames: int = 120) -> Path:
+    """Noise frames with flat (black) stretches, so adaptive runs hit NaN keys too."""
+    w = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 30.0, (320, 240))
+    rng = np.random.default_rng(0)
+    for i in range(frames):
+        flat = (i // 20) % 3 == 1
+        w.write(np.zeros((240, 320, 3), np.uint8) if flat else rng.integers(0, 256, (240, 320, 3), np.uint8))
+    w.release()
+    return path
+
+@pytest.fixture(scope="module")
+def stored(tmp_path_factory):
+    d = tmp_path_factory.mktemp("jobs")
+    clip = _clip(d / "mixed.mp4")
+    res = {mode: score_single_video(clip, every=2, adaptive=(mode == "adaptive"), coarse_frames=10,
+                                    save_job=True, job_id=f"job-{mode}", jobs_dir=d)
+           for mode in ("dense", "adaptive")}
+    return d, res
+
+@pytest.mark.parametrize("mode", ["dense", "adaptive"])
+def test_rescore_reproduces_video_score(stored, mode):
+    d, res = stored
+    assert "error" not in res[mode] and res[mode]["job_id"] == f"job-{mode}"
+    out = jobs.rescore(f"job-{mode}", jobs_dir=d)
+    assert out["video_score"] == pytest.approx(res[mode]["video_score"], rel=1e-6)
+    assert out["decision"] == res[mode]["decision"] and not out["changed"]
+    assert out["k_hits"] == res[mode]["k_hits"]
+    assert out["frames"] == res[mode]["frames_scored"] + res[mode]["frames_interpolated"]
+
+@pytest.mark.parametrize("bad", ["../escape", "a/b", "..\\b", ".hidden", "", "a\0b", None, 7, ["x"]])
+def test_check_id_rejects_path_like_ids(tmp_path, bad):
+    with pytest.raises(jobs.JobError):
+        jobs._check_id(bad)
+    with pytest.raises(jobs.JobError):
+        jobs.load(bad, jobs_dir=tmp_path)
+
+def test_save_refuses_traversal(tmp_path):
+    rec = {"features": ["a", "b"]}
+    with pytest.raises(jobs.JobError):
+        jobs.save("../outside", rec, [0], [[1.0, 2.0]], jobs_dir=tmp_path / "jobs")
+    assert not list(tmp_path.rglob("*.json")) and not list(tmp_path.rglob("*.npz"))
+
+def test_feature_version_mismatch_is_refused(stored, tmp_path):
+    d, _ = stored
+    for name in ("job-dense.json", "job-dense.npz"):
+        (tmp_path / name).write_bytes((d / name).read_bytes())
+    rec = json.loads((tmp_path / "job-dense.json").read_text())
+    bundle = registry.bundle(rec["profile"])
+    with pytest.raises(jobs.JobError, match="was fitted on features"):
+        jobs.rescore("job-dense", jobs_dir=tmp_path, bundle=dict(bundle, feature_version="stale"))
+    rec["feature_version"] = "stale"
+    (tmp_path / "job-dense.json").write_text(json.dumps(rec))
+    with pytest.raises(jobs.JobError, match="rescan the video"):
+        jobs.rescore("job-dense", jobs_dir=tmp_path)
+    assert jobs.rescore_many(["job-dense"], jobs_dir=tmp_path)[0]["error"].startswith("job job-dense")
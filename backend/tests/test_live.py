@@ -0,0 +1,74 @@
+# backend/tests/test_live.py
+"""Live streams: uncalibrated profiles fail before the SSE response starts and leak no capture."""
+from pathlib import Path
+import json
+import sys
+
+import numpy as np
+import cv2
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import governor
+import live
+import profiles
+
+UNCALIBRATED = [p for p in profiles.PROFILES if profiles.missing_artifacts(p)]
+
+class _Capture:
+    """Records release(); reports itself open so stream_verdicts gets past the open check."""
+    def __init__(self):
+        self.released = False
+    def isOpened(self):
+        return True
+    def release(self):
+        self.released = True
+
+@pytest.fixture
+def clip(tmp_path):
+    path = tmp_path / "live.mp4"
+    w = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 30.0, (160, 120))
+    rng = np.random.default_rng(0)
+    for _ in range(30):
+        w.write(rng.integers(0, 256, (120, 160, 3), np.uint8))
+    w.release()
+    return path
+
+@pytest.fixture
+def client(tmp_path, clip, monkeypatch):
+    import api_server
+    gov = governor.Governor(slots=1, queue=1, lock_dir=str(tmp_path / "gov"))
+    monkeypatch.setattr(api_server, "GOVERNOR", gov)
+    monkeypatch.setattr(api_server, "LIVE_SOURCES", {"cam": str(clip)})
+    return api_server.app.test_client(), gov
+
+@pytest.mark.parametrize("profile", UNCALIBRATED)
+def test_stream_verdicts_releases_capture_when_bundle_is_missing(monkeypatch, profile):
+    cap = _Capture()
+    monkeypatch.setattr(live, "open_source", lambda source: (cap, True))
+    with pytest.raises(FileNotFoundError):
+        live.stream_verdicts("cam.mp4", profile=profile)
+    assert cap.released
+
+@pytest.mark.parametrize("profile", UNCALIBRATED)
+def test_live_stream_uncalibrated_is_503_before_opening(client, monkeypatch, profile):
+    c, gov = client
+    opened = []
+    monkeypatch.setattr(live, "open_source", lambda source: opened.append(source))
+    r = c.get(f"/api/live/cam?profile={profile}")
+    assert r.status_code == 503 and r.mimetype == "application/json"
+    assert r.get_json()["missing"] == profiles.missing_artifacts(profile)
+    assert opened == [] and gov.status()["queued"] == 0
+
+def test_live_stream_emits_verdicts(client):
+    c, gov = client
+    r = c.get("/api/live/cam?duration=5&cadence=0.2&window=1")
+    assert r.status_code == 200 and r.mimetype == "text/event-stream"
+    events = [json.loads(line[len("data: "):]) for line in r.get_data(as_text=True).splitlines()
+              if line.startswith("data: ")]
+    assert events and events[-1].get("final")
+    assert events[-1]["profile"] == profiles.DEFAULT_PROFILE
+    assert gov.status()["running"] == 0 and gov.status()["queued"] == 0
@@ -0,0 +1,83 @@
+# backend/tests/test_scaler_stats.py
+"""RunningStats (Welford updates + Chan merge) and scaler_values --update bookkeeping."""
+from pathlib import Path
+import sys
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import profiles
+import scaler_values as sv
+
+def _stats(rows) -> "sv.RunningStats":
+    rs = sv.RunningStats(rows.shape[1])
+    for x in rows:
+        rs.update(x)
+    return rs
+
+def test_merged_chunks_match_numpy():
+    rng = np.random.default_rng(0)
+    X = rng.normal(loc=[0.0, 5.0, -3.0, 100.0, 1e-3], scale=[1.0, 0.1, 10.0, 50.0, 1e-4], size=(1000, 5))
+    cuts = np.sort(rng.choice(np.arange(1, len(X)), size=12, replace=False))
+    total = sv.RunningStats(5)
+    total.merge(sv.RunningStats(5))  # empty chunks are no-ops
+    for chunk in np.split(X, cuts):
+        total.merge(_stats(chunk))
+    assert total.n == len(X)
+    np.testing.assert_allclose(total.mean, X.mean(0), rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(total.std, X.std(0), rtol=1e-10)
+
+def test_from_cache_round_trip(tmp_path):
+    X = np.random.default_rng(1).normal(size=(200, 5))
+    rs = _stats(X)
+    path = tmp_path / "scaler.npz"
+    np.savez(path, mean=rs.mean, scale=rs.std, count=np.int64(rs.n))
+    back = sv.RunningStats.from_cache(path)
+    back.merge(_stats(X[:50]))
+    np.testing.assert_allclose(back.mean, np.concatenate([X, X[:50]]).mean(0))
+    np.testing.assert_allclose(back.std, np.concatenate([X, X[:50]]).std(0))
+
+@pytest.fixture
+def real_dir(tmp_path, monkeypatch):
+    """Two 'videos' in nested folders; their features come from fixed arrays, not decoding."""
+    d = tmp_path / "real"
+    (d / "a").mkdir(parents=True)
+    (d / "b").mkdir()
+    dim = len(profiles.get(None)["features"])
+    rng = np.random.default_rng(2)
+    rows = {"a/clip.mp4": rng.normal(size=(30, dim)), "b/clip.mp4": rng.normal(2.0, 3.0, size=(40, dim))}
+    for rel in rows:
+        (d / rel).write_bytes(b"")
+    monkeypatch.setattr(sv, "_video_stats", lambda vp, **kw: _stats(rows[vp.relative_to(d).as_posix()]))
+    return d, rows
+
+def test_update_adds_only_new_videos(tmp_path, real_dir):
+    d, rows = real_dir
+    cache = tmp_path / "scaler.npz"
+    (d / "b" / "clip.mp4").rename(tmp_path / "held_back.mp4")
+    sv._fit_from_folder(d, cache_path=cache)
+    (tmp_path / "held_back.mp4").rename(d / "b" / "clip.mp4")
+    sv._fit_from_folder(d, cache_path=cache, update=True)
+    c = np.load(cache)
+    X = np.concatenate([rows["a/clip.mp4"], rows["b/clip.mp4"]])
+    assert int(c["count"]) == len(X)
+    assert sorted(c["videos"].tolist()) == ["a/clip.mp4", "b/clip.mp4"]  # same name, both kept
+    np.testing.assert_allclose(c["mean"], X.mean(0), rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(c["scale"], X.std(0), rtol=1e-5)
+    with pytest.raises(SystemExit, match="No new videos"):
+        sv._fit_from_folder(d, cache_path=cache, update=True)
+
+def test_blind_update_is_refused(tmp_path, real_dir):
+    d, rows = real_dir
+    cache = tmp_path / "legacy.npz"
+    X = rows["a/clip.mp4"]
+    np.savez(cache, mean=X.mean(0), scale=X.std(0), count=np.int64(len(X)))  # no 'videos'
+    with pytest.raises(SystemExit, match="does not record which videos"):
+        sv._fit_from_folder(d, cache_path=cache, update=True)
+    assert int(np.load(cache)["count"]) == len(X)  # untouched
+    sv._fit_from_folder(d, cache_path=cache, update=True, assume_new=True)
+    assert int(np.load(cache)["count"]) == len(X) + 30 + 40
@@ -0,0 +1,49 @@
+# backend/tests/test_score_images.py
+"""POST /api/score/images: stacks and images score lazily; bad profiles answer JSON, not a 500 page."""
+from pathlib import Path
+import io
+import sys
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import governor
+import profiles
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import api_server
+    monkeypatch.setattr(api_server, "UPLOAD_FOLDER", tmp_path)
+    monkeypatch.setattr(api_server, "GOVERNOR", governor.Governor(slots=1, queue=1, lock_dir=str(tmp_path / "gov")))
+    return api_server.app.test_client()
+
+def _npy(arr) -> io.BytesIO:
+    buf = io.BytesIO()
+    np.save(buf, arr)
+    buf.seek(0)
+    return buf
+
+def test_stack_and_images(client, tmp_path):
+    stack = np.random.default_rng(0).integers(0, 256, (3, 64, 64, 3), np.uint8)
+    r = client.post("/api/score/images", content_type="multipart/form-data",
+                    data={"stack": (_npy(stack), "crops.npy"), "images": [(io.BytesIO(b"nope"), "bad.png")]})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["n"] == 3 and body["columns"]["id"] == [0, 1, 2]
+    assert body["errors"] == [{"index": 3, "id": "bad.png", "error": "bad.png: not a decodable image"}]
+    assert list(tmp_path.glob("*.npy")) == []  # the spooled stack is unlinked once mapped
+
+@pytest.mark.parametrize("profile", [p for p in profiles.PROFILES if profiles.missing_artifacts(p)])
+def test_uncalibrated_profile_is_json_503(client, profile):
+    r = client.post("/api/score/images", content_type="multipart/form-data",
+                    data={"profile": profile, "images": [(io.BytesIO(b"x"), "a.png")]})
+    assert r.status_code == 503
+    assert r.get_json()["missing"] == profiles.missing_artifacts(profile)
+
+def test_unknown_profile_is_400(client):
+    r = client.post("/api/score/images", data={"profile": "nope"})
+    assert r.status_code == 400 and "profile must be one of" in r.get_json()["error"]
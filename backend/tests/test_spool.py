@@ -0,0 +1,102 @@
+# backend/tests/test_spool.py
+"""Spool lease / heartbeat / reap / fail protocol, single process, on a temp SPOOL_DIR."""
+from pathlib import Path
+import os
+import sys
+import time
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from governor import Busy
+from spool import LeaseLost, Spool, work_loop
+
+def _expire(job: dict, spool: Spool):
+    """Backdate the lease's heartbeat past the visibility timeout, as if its worker died."""
+    old = time.time() - spool.visibility - 1
+    os.utime(job["_path"], (old, old))
+
+def test_enqueue_lease_complete(tmp_path):
+    spool = Spool(tmp_path)
+    job_id = spool.enqueue({"video": "a.mp4"})
+    assert spool.status(job_id)["state"] == "pending"
+    job = spool.lease("w1")
+    assert job["id"] == job_id and job["attempts"] == 1 and job["lease"]["worker"] == "w1"
+    assert spool.status(job_id)["state"] == "leased"
+    assert spool.lease("w2") is None
+    spool.complete(job, {"video_score": 0.5}, seconds=1.0)
+    rec = spool.status(job_id)
+    assert rec["state"] == "done" and rec["result"] == {"video_score": 0.5}
+    assert spool.stats()["leased"] == 0 and spool.stats()["pending"] == 0
+
+def test_abandoned_lease_is_reaped_and_requeued(tmp_path):
+    spool = Spool(tmp_path, visibility=30, max_attempts=3)
+    job_id = spool.enqueue({})
+    job = spool.lease("dead")
+    assert spool.reap() == 0  # heartbeat is fresh
+    _expire(job, spool)
+    assert spool.reap() == 1
+    rec = spool.status(job_id)
+    assert rec["state"] == "pending" and rec["attempts"] == 1
+    assert rec["errors"] == ["lease of dead expired"] and "lease" not in rec
+    again = spool.lease("w2")
+    assert again["id"] == job_id and again["attempts"] == 2
+
+def test_reap_fails_job_after_max_attempts(tmp_path):
+    spool = Spool(tmp_path, visibility=30, max_attempts=1)
+    job_id = spool.enqueue({})
+    _expire(spool.lease("dead"), spool)
+    spool.reap()
+    assert spool.status(job_id)["state"] == "failed"
+
+def test_failing_handler_lands_in_failed(tmp_path):
+    spool = Spool(tmp_path, max_attempts=2)
+    job_id = spool.enqueue({"video": "x.mp4"})
+    calls = []
+
+    def handler(payload, jid):
+        calls.append(jid)
+        raise RuntimeError("boom")
+
+    work_loop(spool, "w1", handler=handler, poll=0.01, max_jobs=2)
+    rec = spool.status(job_id)
+    assert calls == [job_id, job_id]
+    assert rec["state"] == "failed" and rec["attempts"] == 2
+    assert rec["errors"] == ["RuntimeError('boom')"] * 2
+
+def test_error_result_is_retried_like_an_exception(tmp_path):
+    spool = Spool(tmp_path, max_attempts=3)
+    job_id = spool.enqueue({})
+    results = iter([{"error": "no frames"}, {"video_score": 0.1}])
+    work_loop(spool, "w1", handler=lambda p, j: next(results), poll=0.01, max_jobs=2)
+    rec = spool.status(job_id)
+    assert rec["state"] == "done" and rec["attempts"] == 2 and rec["errors"] == ["no frames"]
+
+def test_heartbeat_after_reap_raises_lease_lost(tmp_path):
+    spool = Spool(tmp_path, visibility=30)
+    spool.enqueue({})
+    job = spool.lease("slow")
+    spool.heartbeat(job)
+    _expire(job, spool)
+    spool.reap()
+    with pytest.raises(LeaseLost):
+        spool.heartbeat(job)  # requeued
+    other = spool.lease("w2")
+    with pytest.raises(LeaseLost):
+        spool.heartbeat(job)  # leased again, under another token
+    spool.heartbeat(other)
+    spool.fail(job, "late")   # a stale holder can neither fail nor steal it
+    assert spool.status(other["id"])["state"] == "leased"
+
+def test_admit_raises_busy_at_max_pending(tmp_path):
+    spool = Spool(tmp_path, max_pending=2)
+    spool.admit()
+    spool.enqueue({})
+    spool.admit()
+    spool.enqueue({})
+    with pytest.raises(Busy) as e:
+        spool.admit()
+    assert e.value.retry_after >= 1
@@ -0,0 +1,63 @@
+# backend/tests/test_uniform_frames.py
+"""Flat (black / faded) face crops give a NaN suspicion; aggregation must skip it, not crash."""
+from pathlib import Path
+import sys
+
+import numpy as np
+import cv2
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import profiles
+import texture_model as tm
+from aggregator import VideoAggregator
+
+def _uniform_clip(path: Path, frames: int = 60, size=(320, 240), value: int = 0) -> Path:
+    w = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 30.0, size)
+    frame = np.full((size[1], size[0], 3), value, np.uint8)
+    for _ in range(frames):
+        w.write(frame)
+    w.release()
+    return path
+
+def test_uniform_crop_is_not_finite():
+    size = profiles.get(None)["face_size"]
+    s = tm.frame_score(np.zeros((size, size, 3), np.uint8))["suspicion"]
+    assert not np.isfinite(s)
+
+def test_aggregator_skips_nonfinite():
+    agg = VideoAggregator(0.3, threshold=0.5)
+    assert agg.update(float("nan"), {"frame_idx": 0}) is None
+    for i, s in enumerate([0.2, 0.4, float("inf"), 0.6], start=1):
+        agg.update(s, {"frame_idx": i})
+    assert agg.n == 3 and agg.nonfinite == 2
+    assert np.isfinite(agg.video_score())
+    assert [r["frame_idx"] for r in agg.per_frame()] == [1, 2, 4]
+
+def test_uniform_video_returns_error(tmp_path):
+    from runner import score_single_video
+    clip = _uniform_clip(tmp_path / "black.mp4")
+    for adaptive in (False, True):
+        res = score_single_video(clip, adaptive=adaptive)
+        assert "error" in res
+
+def test_adaptive_counts_match_dense_on_mixed_clip(tmp_path):
+    from runner import score_single_video
+    path = tmp_path / "mixed.mp4"
+    w = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 30.0, (320, 240))
+    rng = np.random.default_rng(0)
+    for i in range(150):
+        flat = (i // 15) % 2 == 0
+        w.write(np.zeros((240, 320, 3), np.uint8) if flat else rng.integers(0, 256, (240, 320, 3), np.uint8))
+    w.release()
+    dense = score_single_video(path, every=3)
+    adapt = score_single_video(path, every=3, adaptive=True, coarse_frames=12)
+    for res in (dense, adapt):
+        assert "error" not in res and res["frames_nonfinite"] > 0
+        assert np.isfinite(res["video_score"])
+        assert res["frames_interpolated"] >= 0
+        assert all(np.isfinite(r["suspicion"]) for r in res["per_frame"])
+    assert adapt["frames_scored"] <= dense["frames_scored"]
+    assert adapt["frames_scored"] + adapt["frames_interpolated"] <= dense["frames_scored"] + dense["frames_nonfinite"]
@@ -0,0 +1,120 @@
+# backend/tests/test_uploads.py
+"""Chunked uploads through the API: Content-Range, resume, overlap/out-of-order, sha256, early analysis."""
+from pathlib import Path
+import hashlib
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import governor
+import uploads
+
+FAST_START = next(BACKEND_DIR.glob("uploads/*_hack.mp4"), None)
+
+def _fake_score(video_path, opts, job_id=None):
+    """Stands in for the analysis: reads the whole input (file or FIFO) and reports what it saw."""
+    h, n = hashlib.sha256(), 0
+    with open(video_path, "rb") as f:
+        for b in iter(lambda: f.read(1 << 16), b""):
+            h.update(b); n += len(b)
+    return {"video_score": 0.1, "decision": False, "frames_scored": 1, "per_frame": [],
+            "bytes_read": n, "read_sha256": h.hexdigest()}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import api_server
+    monkeypatch.setattr(api_server, "UPLOAD_FOLDER", tmp_path)
+    monkeypatch.setattr(api_server, "SPOOL", None)
+    monkeypatch.setattr(api_server, "GOVERNOR", governor.Governor(slots=1, queue=2, lock_dir=str(tmp_path / "gov")))
+    monkeypatch.setattr(api_server, "EARLY_WAIT_S", 20.0)
+    monkeypatch.setattr(api_server, "_score", _fake_score)
+    return api_server.app.test_client()
+
+def _create(client, name="clip.avi", size=None):
+    r = client.post("/api/uploads", json={"filename": name, "size": size})
+    assert r.status_code == 201
+    return r.get_json()["upload_id"]
+
+def _put(client, upload_id, data: bytes, start: int, total="*"):
+    rng = f"bytes {start}-{start + len(data) - 1}/{total}"
+    return client.put(f"/api/uploads/{upload_id}", data=data, headers={"Content-Range": rng})
+
+def test_parse_content_range():
+    assert uploads.parse_content_range("bytes 0-9/100", 10) == (0, 100)
+    assert uploads.parse_content_range("bytes 10-19/*", 10) == (10, None)
+    assert uploads.parse_content_range(None, 5) == (0, None)
+    for bad, length in (("bytes 0-9", 10), ("items 0-9/10", 10), ("bytes 9-0/10", 10), ("bytes 0-9/10", 4)):
+        with pytest.raises(uploads.UploadError):
+            uploads.parse_content_range(bad, length)
+
+def test_bad_content_range_is_400(client):
+    uid = _create(client)
+    r = client.put(f"/api/uploads/{uid}", data=b"abcd", headers={"Content-Range": "bytes 0-9/10"})
+    assert r.status_code == 400 and "does not match" in r.get_json()["error"]
+
+def test_resume_from_offset(client):
+    data = os.urandom(3000)
+    uid = _create(client, size=len(data))
+    assert _put(client, uid, data[:1000], 0, len(data)).get_json()["offset"] == 1000
+    uploads._HASHERS.clear()  # next chunk lands in a "different process": prefix is rehashed
+    offset = client.get(f"/api/uploads/{uid}").get_json()["offset"]
+    assert offset == 1000
+    st = _put(client, uid, data[offset:], offset, len(data)).get_json()
+    assert st["offset"] == len(data) and st["complete"]
+    r = client.post(f"/api/uploads/{uid}/finalize", json={"sha256": hashlib.sha256(data).hexdigest()})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["upload"]["sha256"] == hashlib.sha256(data).hexdigest()
+    assert body["read_sha256"] == body["upload"]["sha256"] and not body["upload"]["early_analysis"]
+
+def test_overlapping_and_out_of_order_chunks(client):
+    data = os.urandom(4000)
+    uid = _create(client)
+    _put(client, uid, data[:1500], 0)
+    r = _put(client, uid, data[2000:3000], 2000)   # gap: past the received offset
+    assert r.status_code == 409 and r.get_json()["offset"] == 1500
+    st = _put(client, uid, data[1000:2500], 1000).get_json()  # overlap: resent bytes skipped
+    assert st["offset"] == 2500
+    st = _put(client, uid, data[2500:], 2500, len(data)).get_json()
+    assert st["complete"]
+    import api_server
+    assert Path(uploads.load(api_server.UPLOAD_FOLDER, uid)["path"]).read_bytes() == data
+    r = client.post(f"/api/uploads/{uid}/finalize", json={})
+    assert r.get_json()["upload"]["sha256"] == hashlib.sha256(data).hexdigest()
+
+def test_total_size_cannot_change(client):
+    uid = _create(client, size=100)
+    r = _put(client, uid, b"x" * 10, 0, 200)
+    assert r.status_code == 409 and "total size" in r.get_json()["error"]
+
+def test_finalize_incomplete_and_sha_mismatch(client):
+    data = os.urandom(2048)
+    uid = _create(client, size=len(data))
+    _put(client, uid, data[:1024], 0, len(data))
+    r = client.post(f"/api/uploads/{uid}/finalize", json={})
+    assert r.status_code == 409 and r.get_json()["offset"] == 1024
+    _put(client, uid, data[1024:], 1024, len(data))
+    r = client.post(f"/api/uploads/{uid}/finalize", json={"sha256": "0" * 64})
+    assert r.status_code == 422
+    assert r.get_json()["sha256"] == hashlib.sha256(data).hexdigest()
+
+@pytest.mark.skipif(FAST_START is None, reason="no fast-start sample video")
+def test_early_analysis_reads_the_whole_upload_through_the_fifo(client):
+    data = FAST_START.read_bytes()
+    assert uploads.fast_start(str(FAST_START), len(data))
+    uid = _create(client, name="clip.mp4", size=len(data))
+    half = len(data) // 2
+    st = _put(client, uid, data[:half], 0, len(data)).get_json()
+    assert st["early_analysis"]["status"] == "running" and st["early_analysis"]["started_at_offset"] == half
+    _put(client, uid, data[half:], half, len(data))
+    r = client.post(f"/api/uploads/{uid}/finalize", json={})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["upload"]["early_analysis"] and body["upload"]["started_at_offset"] == half
+    assert body["bytes_read"] == len(data)
+    assert body["read_sha256"] == hashlib.sha256(data).hexdigest()
@@ -1,13 +1,7 @@
 # backend/texture_model.py
 import cv2, numpy as np
-from scaler_values import scaler  # loads mean/std from cache
-
-# Try to use learned weights; fall back to simple ones
-try:
-    from weights import W, B
-except Exception:
-    W = np.array([0.4, 0.4, 0.2, 0.0, 0.0], dtype=np.float32)  # if only 3 features in cache, scaler will raise until you refit
-    B = 0.0
+import registry  # shared scaler (REAL-only mean/std) and learned W, B; built on first use
+import profiles
 
 # -------- Tunables (quick knobs) --------
 FACE_SIZE      = 256
@@ -21,19 +15,18 @@ CLAHE_TILE     = (8, 8)
 GAUSS_BLUR_K   = 3      # set to 0 to disable
 
 # -------- Helpers (must match dataset/scaler feature defs) --------
-def preprocess_gray(face_bgr):
+def preprocess_gray(face_bgr, blur_k=GAUSS_BLUR_K):
     yuv = cv2.cvtColor(face_bgr, cv2.COLOR_BGR2YUV)
     Y = yuv[:, :, 0]
     clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP, tileGridSize=CLAHE_TILE)
     Y = clahe.apply(Y)
-    if GAUSS_BLUR_K and GAUSS_BLUR_K >= 3:
-        Y = cv2.GaussianBlur(Y, (GAUSS_BLUR_K, GAUSS_BLUR_K), 0)
+    if blur_k and blur_k >= 3:
+        Y = cv2.GaussianBlur(Y, (blur_k, blur_k), 0)
     return Y
 
-def compute_sharpness(gray):
-    vars_ = [cv2.Laplacian(gray, cv2.CV_32F, ksize=k).var() for k in LAPLACIAN_KS]
-    lap_for_heat = cv2.Laplacian(gray, cv2.CV_32F, ksize=LAPLACIAN_KS[0])
-    return float(np.mean(vars_)), lap_for_heat
+def compute_sharpness(gray, ks=LAPLACIAN_KS):
+    laps = [cv2.Laplacian(gray, cv2.CV_32F, ksize=k) for k in ks]
+    return float(np.mean([l.var() for l in laps])), laps[0]
 
 def compute_high_ratio(gray):
     H, W = gray.shape
@@ -102,23 +95,35 @@ def heatmap_from_laplacian(face_bgr, lap):
     return cv2.addWeighted(face_bgr, 0.65, hm, 0.35, 0)
 
 # -------- Public API --------
-def frame_score(face_bgr):
-    gray = preprocess_gray(face_bgr)
-
-    sharp_var, lap = compute_sharpness(gray)
-    high_ratio = compute_high_ratio(gray)
-
-    H, W = gray.shape
-    y0 = int(H * ROI_LOWER_FRAC)
-    edge_glitch = edge_glitch_score(gray[y0:H, :])
-
-    blk = block_boundary_energy(gray)
-    clm = chroma_luma_mismatch(face_bgr)
-
-    feats = np.array([sharp_var, high_ratio, edge_glitch, blk, clm], dtype=np.float32)
-    z = scaler.transform([feats])[0]  # z-score with REAL-only stats
-
-    Wv = np.asarray(W, dtype=np.float32).reshape(-1)
+def extract_features(face_bgr, profile=None):
+    """Raw feature dict for the profile's feature subset, plus the Laplacian used for the heatmap."""
+    prof = profiles.get(profile)
+    gray = preprocess_gray(face_bgr, blur_k=prof["gauss_blur_k"])
+    wanted = prof["features"]
+
+    sharp_var, lap = compute_sharpness(gray, ks=prof["laplacian_ks"])
+    out = {"sharp_var": sharp_var}
+    if "high_ratio" in wanted:
+        out["high_ratio"] = compute_high_ratio(gray)
+    if "edge_glitch" in wanted:
+        H, W = gray.shape
+        y0 = int(H * ROI_LOWER_FRAC)
+        out["edge_glitch"] = edge_glitch_score(gray[y0:H, :])
+    if "block_energy" in wanted:
+        out["block_energy"] = block_boundary_energy(gray)
+    if "chroma_mismatch" in wanted:
+        out["chroma_mismatch"] = chroma_luma_mismatch(face_bgr)
+    return {k: float(out[k]) for k in wanted}, lap
+
+def frame_score(face_bgr, profile=None, bundle=None):
+    """Texture metrics + suspicion; `bundle` pins the model bundle (default: the one served now)."""
+    metrics, lap = extract_features(face_bgr, profile)
+    bundle = bundle or registry.bundle(profile)
+
+    feats = np.array(list(metrics.values()), dtype=np.float32)
+    z = bundle["scaler"].transform([feats])[0]  # z-score with REAL-only stats
+
+    Wv, B = bundle["W"], bundle["B"]
     Zv = np.asarray(z, dtype=np.float32).reshape(-1)
     if Wv.shape[0] != Zv.shape[0]:
         if Wv.shape[0] < Zv.shape[0]:
@@ -130,11 +135,94 @@ def frame_score(face_bgr):
     overlay = heatmap_from_laplacian(face_bgr, lap)
 
     return dict(
-        sharp_var=float(sharp_var),
-        high_ratio=float(high_ratio),
-        edge_glitch=float(edge_glitch),
-        block_energy=float(blk),
-        chroma_mismatch=float(clm),
+        metrics,
         suspicion=float(suspicion),
         overlay=overlay,
     )
+
+# -------- Batched API (many crops, one pass) --------
+def _high_ratio_batch(G):
+    N, H, W = G.shape
+    win = np.outer(np.hanning(H), np.hanning(W)).astype(np.float32)
+    F = np.fft.fftshift(np.fft.fft2(G * win, axes=(-2, -1)), axes=(-2, -1))
+    mag = (np.abs(F) ** 2).astype(np.float32)
+    cy, cx = H // 2, W // 2
+    r0 = max(2, min(H, W) // FFT_DIVISOR)
+    Y, X = np.ogrid[:H, :W]
+    mask_hi = (Y - cy) ** 2 + (X - cx) ** 2 >= (r0 * r0)
+    hi = mag[:, mask_hi].sum(axis=1, dtype=np.float64)
+    tot = mag.reshape(N, -1).sum(axis=1, dtype=np.float64) + 1e-8
+    return hi / tot
+
+def _edge_glitch_batch(rois):
+    N, H, W = rois.shape
+    win = EDGE_TILE
+    if H < win or W < win:
+        return np.zeros(N)
+    G = np.empty(rois.shape, np.float32)
+    for i, r in enumerate(rois):
+        gx = cv2.Sobel(r, cv2.CV_32F, 1, 0, ksize=SOBEL_K)
+        gy = cv2.Sobel(r, cv2.CV_32F, 0, 1, ksize=SOBEL_K)
+        G[i] = np.sqrt(gx * gx + gy * gy)
+    Gn = G / (G.mean(axis=(1, 2), keepdims=True) + 1e-8)
+    th, tw = H // win, W // win
+    tiles = Gn[:, :th * win, :tw * win].reshape(N, th, win, tw, win).std(axis=(2, 4)).reshape(N, -1)
+    return np.percentile(tiles, 90, axis=1) - np.median(tiles, axis=1)
+
+def _block_energy_batch(G):
+    g = G.astype(np.float32)
+    v = np.abs(g[:, :, 7:-1:8] - g[:, :, 8::8])
+    h = np.abs(g[:, 7:-1:8, :] - g[:, 8::8, :])
+    v_mean = v.reshape(len(g), -1).mean(axis=1) if v.size else np.zeros(len(g))
+    h_mean = h.reshape(len(g), -1).mean(axis=1) if h.size else np.zeros(len(g))
+    return v_mean.astype(np.float64) + h_mean
+
+def _chroma_mismatch_batch(faces):
+    grads = []
+    for f in faces:
+        yuv = cv2.cvtColor(f, cv2.COLOR_BGR2YUV).astype(np.float32)
+        grads.append(np.stack([cv2.Sobel(yuv[:, :, c], cv2.CV_32F, 1, 1) for c in range(3)]))
+    D = np.asarray(grads, np.float64).reshape(len(faces), 3, -1)
+    D -= D.mean(axis=2, keepdims=True)
+    norm = np.sqrt((D * D).sum(axis=2))
+    cu = (D[:, 0] * D[:, 1]).sum(axis=1) / (norm[:, 0] * norm[:, 1])
+    cv = (D[:, 0] * D[:, 2]).sum(axis=1) / (norm[:, 0] * norm[:, 2])
+    return 1.0 - 0.5 * (cu + cv)
+
+def extract_features_batch(faces, profile=None):
+    """(N, F) float32 raw features, profile feature order, for N same-size BGR crops.
+
+    Same features as extract_features; the FFT, tiling and correlation steps run
+    over the whole stack instead of crop by crop (agrees to float32 rounding).
+    """
+    prof = profiles.get(profile)
+    wanted = prof["features"]
+    faces = np.asarray(faces)
+    if len(faces) == 0:
+        return np.zeros((0, len(wanted)), np.float32)
+    G = np.stack([preprocess_gray(f, blur_k=prof["gauss_blur_k"]) for f in faces])
+    cols = {"sharp_var": [np.mean([cv2.Laplacian(g, cv2.CV_32F, ksize=k).var() for k in prof["laplacian_ks"]])
+                          for g in G]}
+    if "high_ratio" in wanted:
+        cols["high_ratio"] = _high_ratio_batch(G)
+    if "edge_glitch" in wanted:
+        cols["edge_glitch"] = _edge_glitch_batch(G[:, int(G.shape[1] * ROI_LOWER_FRAC):, :])
+    if "block_energy" in wanted:
+        cols["block_energy"] = _block_energy_batch(G)
+    if "chroma_mismatch" in wanted:
+        cols["chroma_mismatch"] = _chroma_mismatch_batch(faces)
+    return np.stack([np.asarray(cols[k], np.float64) for k in wanted], axis=1).astype(np.float32)
+
+def suspicions(features, bundle):
+    """Suspicion for each row of a raw feature matrix, bit-identical to frame_score on the same features."""
+    Z = bundle["scaler"].transform(features)
+    W = bundle["W"]
+    # row-wise float32 dot, as frame_score: a single Z @ W sums in a different order (~1e-7 apart)
+    raw = np.fromiter((np.dot(W, z) for z in Z), np.float64, len(Z)) + float(bundle["B"])
+    return 1.0 / (1.0 + np.exp(-raw))
+
+def score_batch(faces, profile=None, bundle=None):
+    """{'features': (N, F), 'suspicion': (N,)} for N same-size BGR crops in one batched pass (no overlays)."""
+    bundle = bundle or registry.bundle(profile)
+    feats = extract_features_batch(faces, profile)
+    return {"features": feats, "suspicion": suspicions(feats, bundle)}
@@ -1,25 +1,163 @@
 # backend/tune_loss.py
 from pathlib import Path
-import argparse
+from concurrent.futures import ThreadPoolExecutor
+import argparse, json
 import numpy as np
 import pandas as pd
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import roc_auc_score, average_precision_score, precision_recall_curve, f1_score
-from sklearn.model_selection import GroupShuffleSplit
+from sklearn.model_selection import GroupShuffleSplit, StratifiedKFold
+
+import profiles
+
+def _floats(s):
+    return np.array([float(x) for x in s.split(",") if x.strip()], np.float32)
+
+def best_threshold(scores, labels) -> float:
+    """F1-maximising threshold from the PR curve (0.5 when undefined, e.g. one class only)."""
+    if labels.min() == labels.max():
+        return 0.5
+    prec, rec, thr = precision_recall_curve(labels, scores)
+    f1s = 2*prec*rec/(prec+rec+1e-8)
+    j = np.nanargmax(f1s)
+    return 0.5 if j >= len(thr) else float(thr[j])
+
+def video_folds(labels, k: int, seed: int) -> list:
+    """Stratified (train, test) index folds over videos; [] if a class has fewer than 2 videos."""
+    n = min(k, int(np.bincount(labels, minlength=2).min()))
+    if n < 2:
+        return []
+    return list(StratifiedKFold(n, shuffle=True, random_state=seed).split(np.zeros(len(labels)), labels))
+
+def cv_f1(scores, labels, folds):
+    """Pooled F1 of thresholds each chosen on the other folds; None without folds."""
+    if not folds:
+        return None
+    pred = np.zeros(len(labels), bool)
+    for tr, te in folds:
+        pred[te] = scores[te] >= best_threshold(scores[tr], labels[tr])
+    return float(f1_score(labels, pred))
+
+def _pad_groups(values, codes, n_groups):
+    """Scatter per-frame values into a NaN-padded [videos, frames] matrix (frame order kept)."""
+    order = np.argsort(codes, kind="stable")
+    v, c = values[order], codes[order]
+    counts = np.bincount(c, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    pos = np.arange(len(c)) - starts[c]
+    M = np.full((n_groups, counts.max()), np.nan, np.float32)
+    M[c, pos] = v
+    return M, counts
+
+def ema_grouped(M, alphas):
+    """EMA along axis 1 of a NaN-padded [V, L] matrix for every alpha at once -> [A, V, L]."""
+    a = np.asarray(alphas, np.float32)[:, None]
+    out = np.empty((len(a),) + M.shape, np.float32)
+    prev = np.repeat(M[None, :, 0], len(a), axis=0)
+    out[:, :, 0] = prev
+    for t in range(1, M.shape[1]):
+        x = M[None, :, t]
+        cur = a * x + (1 - a) * prev
+        out[:, :, t] = cur                      # NaN past the end of a video
+        prev = np.where(np.isnan(x), prev, cur)
+    return out
+
+def _f1(dec, y):
+    """F1 over the video axis (-2) of [..., V, T] decisions."""
+    tp = (dec & y).sum(-2); fp = (dec & ~y).sum(-2); fn = (~dec & y).sum(-2)
+    return 2 * tp / np.maximum(1, 2 * tp + fp + fn), tp, fp, fn
+
+def _grid_for_stride(M, counts, labels, stride, alphas, percentiles, k_fracs, thresholds, folds):
+    """Video-level F1 for every alpha x percentile x k_frac at one stride.
+
+    thresh_video is the best threshold on all videos; f1 is held out: per fold the
+    threshold is chosen on the other folds and the decisions on the fold are pooled.
+    """
+    Ms = M[:, ::stride]
+    n = -(-counts // stride)                                                   # frames per video after stride
+    E = ema_grouped(Ms, alphas)                                                # [A,V,L]
+    scores = np.nanpercentile(E, percentiles, axis=2)                          # [P,A,V]
+    hits = np.stack([(e[:, :, None] >= thresholds).sum(1) for e in E])         # [A,V,T]
+    k_req = np.maximum(3, (k_fracs[:, None] * n[None, :]).astype(int))         # [K,V]
+    dec = ((scores[:, None, :, :, None] >= thresholds)
+           & (hits[None, None] >= k_req[None, :, None, :, None]))             # [P,K,A,V,T]
+    y = labels.astype(bool)[:, None]
+    f1_fit, _, _, _ = _f1(dec, y)                                              # [P,K,A,T]
+    best = f1_fit.argmax(-1)
+    tp = fp = fn = 0
+    for tr, te in folds:
+        ti = _f1(dec[..., tr, :], y[tr])[0].argmax(-1)                          # [P,K,A]
+        held = np.take_along_axis(dec[..., te, :], ti[..., None, None], -1)   # [P,K,A,V_te,1]
+        _, t, f, m = _f1(held, y[te])
+        tp, fp, fn = tp + t[..., 0], fp + f[..., 0], fn + m[..., 0]
+    f1_cv = 2 * tp / np.maximum(1, 2 * tp + fp + fn)
+    rows = []
+    for (pi, ki, ai), ti in np.ndenumerate(best):
+        rows.append(dict(alpha=float(alphas[ai]), percentile=float(percentiles[pi]),
+                         k_frac=float(k_fracs[ki]), stride=int(stride),
+                         thresh_video=float(thresholds[ti]), f1=float(f1_cv[pi, ki, ai]),
+                         f1_fit=float(f1_fit[pi, ki, ai, ti])))
+    return rows
+
+def pareto_front(rows):
+    """Configs not beaten on both F1 (higher) and stride (higher = fewer frames scored)."""
+    front = [r for r in rows
+             if not any(o["f1"] >= r["f1"] and o["stride"] >= r["stride"]
+                        and (o["f1"] > r["f1"] or o["stride"] > r["stride"]) for o in rows)]
+    # one representative per (f1, stride) point, smallest alpha/percentile first for stability
+    uniq = {}
+    for r in sorted(front, key=lambda r: (r["alpha"], r["percentile"], r["k_frac"])):
+        uniq.setdefault((r["f1"], r["stride"]), r)
+    return sorted(uniq.values(), key=lambda r: (-r["f1"], -r["stride"]))
+
+def grid_search(pva, yva, gva, args, folds):
+    """All configs and their Pareto front; `folds` index videos in first-appearance order (pd.factorize)."""
+    codes, _ = pd.factorize(gva)
+    n_vid = codes.max() + 1
+    M, counts = _pad_groups(pva.astype(np.float32), codes, n_vid)
+    labels = np.round(np.bincount(codes, weights=yva, minlength=n_vid) / counts).astype(np.int32)
+    alphas, percs = _floats(args.grid_alphas), _floats(args.grid_percentiles)
+    kfracs = _floats(args.grid_kfracs)
+    strides = [int(x) for x in _floats(args.grid_strides)]
+    thresholds = np.linspace(0.0, 1.0, 201, dtype=np.float32)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as ex:
+        parts = ex.map(lambda s: _grid_for_stride(M, counts, labels, s, alphas, percs, kfracs, thresholds, folds),
+                       strides)
+        rows = [r for part in parts for r in part]
+    return rows, pareto_front(rows)
 
 def main():
     ap = argparse.ArgumentParser(description="Fit weights on z-scored features; write weights.py with thresholds.")
-    ap.add_argument("--dataset", default="backend/dataset.csv")
-    ap.add_argument("--scaler-cache", default="backend/scaler_values_cache.npz")
-    ap.add_argument("--out-weights", default="backend/weights.py")
+    ap.add_argument("--profile", choices=sorted(profiles.PROFILES), default=profiles.DEFAULT_PROFILE,
+                    help="Feature profile; paths below default to that profile's artifacts")
+    ap.add_argument("--dataset", default=None)
+    ap.add_argument("--scaler-cache", default=None)
+    ap.add_argument("--out-weights", default=None)
     ap.add_argument("--val-size", type=float, default=0.25)
     ap.add_argument("--seed", type=int, default=42)
     ap.add_argument("--alpha", type=float, default=0.3, help="EMA alpha for video-level scoring")
     ap.add_argument("--percentile", type=float, default=95.0, help="Percentile over EMA for video-level")
+    ap.add_argument("--cv-folds", type=int, default=5,
+                    help="Folds over validation videos for held-out F1 of the chosen thresholds")
+    ap.add_argument("--grid", action="store_true",
+                    help="Also sweep alpha x percentile x k_frac x stride and print the Pareto front")
+    ap.add_argument("--grid-out", default=None, help="Also write the grid report (JSON) here")
+    ap.add_argument("--grid-alphas", default="0.1,0.15,0.2,0.3,0.4,0.5,0.6")
+    ap.add_argument("--grid-percentiles", default="50,75,90,95,99")
+    ap.add_argument("--grid-kfracs", default="0.02,0.05,0.1,0.2")
+    ap.add_argument("--grid-strides", default="1,2,3,4,6", help="Row stride within each video's dataset frames")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--no-publish", action="store_true",
+                    help="Don't publish the new scaler+weights as the profile's model bundle")
     args = ap.parse_args()
+    paths = profiles.artifact_paths(args.profile)
+    args.dataset = args.dataset or str(paths["dataset"])
+    args.scaler_cache = args.scaler_cache or str(paths["scaler"])
+    args.out_weights = args.out_weights or str(paths["weights"])
 
     df = pd.read_csv(args.dataset)
-    cols = ["sharp_var","high_ratio","edge_glitch","block_energy","chroma_mismatch"]
+    cols = list(profiles.get(args.profile)["features"])
     X_raw = df[cols].values.astype(np.float32)
     y     = df["label"].values.astype(np.int32)
     groups= df["video"].values
@@ -41,11 +179,18 @@ def main():
     pva = clf.predict_proba(Xva)[:,1]
     auc = roc_auc_score(yva, pva)
     ap  = average_precision_score(yva, pva)
-    prec, rec, thr = precision_recall_curve(yva, pva)
-    f1s = 2*prec*rec/(prec+rec+1e-8)
-    i = np.nanargmax(f1s)
-    THRESH = 0.5 if i >= len(thr) else float(thr[i])
-    F1 = f1_score(yva, (pva >= THRESH).astype(int))
+
+    # thresholds are fitted on all validation videos; F1 is reported held out (cross-validated
+    # over videos), since F1 on the data a threshold was picked on is optimistic by construction
+    codes, _ = pd.factorize(gva)
+    n_vid = codes.max() + 1
+    video_labels = np.round(np.bincount(codes, weights=yva, minlength=n_vid)
+                            / np.bincount(codes, minlength=n_vid)).astype(np.int32)
+    folds = video_folds(video_labels, args.cv_folds, args.seed)
+    frame_folds = [(np.flatnonzero(np.isin(codes, tr)), np.flatnonzero(np.isin(codes, te))) for tr, te in folds]
+
+    THRESH = best_threshold(pva, yva)
+    F1 = cv_f1(pva, yva, frame_folds)
 
     # Video-level threshold using EMA+p95 over validation split
     def ema(xs, a):
@@ -55,39 +200,23 @@ def main():
             out.append(prev)
         return np.array(out, np.float32)
 
-    # group pva by video, compute EMA then percentile
-    vid_to_probs = {}
-    for prob, vid in zip(pva, gva):
-        vid_to_probs.setdefault(vid, []).append(float(prob))
-
-    video_scores, video_labels = [], []
-    for vid, probs in vid_to_probs.items():
-        arr = np.array(probs, np.float32)
-        e = ema(arr, args.alpha)
-        score = float(np.percentile(e, args.percentile))
-        video_scores.append(score)
-        # majority label (frames share the same label)
-        lab = int(np.round(np.mean(yva[[k for k,(v2) in enumerate(gva) if v2==vid]])))
-        video_labels.append(lab)
-
-    video_scores = np.array(video_scores, np.float32)
-    video_labels = np.array(video_labels, np.int32)
-    pv_prec, pv_rec, pv_thr = precision_recall_curve(video_labels, video_scores)
-    pv_f1s = 2*pv_prec*pv_rec/(pv_prec+pv_rec+1e-8)
-    j = np.nanargmax(pv_f1s)
-    THRESH_VIDEO = 0.5 if j >= len(pv_thr) else float(pv_thr[j])
-    F1v = f1_score(video_labels, (video_scores >= THRESH_VIDEO).astype(int))
+    video_scores = np.array([np.percentile(ema(pva[codes == v], args.alpha), args.percentile)
+                             for v in range(n_vid)], np.float32)
+    THRESH_VIDEO = best_threshold(video_scores, video_labels)
+    F1v = cv_f1(video_scores, video_labels, folds)
 
     W = clf.coef_.ravel().astype(np.float32)
     B = float(clf.intercept_[0])
 
-    print(f"[val] frame-level:  ROC-AUC={auc:.3f}  AP={ap:.3f}  F1@{THRESH:.3f}={F1:.3f}")
-    print(f"[val] video-level:  F1@{THRESH_VIDEO:.3f}={F1v:.3f}  (EMA a={args.alpha}, p={args.percentile})")
+    held = lambda f: "n/a (fewer than 2 validation videos of a class)" if f is None else f"{f:.3f}"
+    print(f"[val] frame-level:  ROC-AUC={auc:.3f}  AP={ap:.3f}  thr={THRESH:.3f}  held-out F1={held(F1)}")
+    print(f"[val] video-level:  thr={THRESH_VIDEO:.3f}  held-out F1={held(F1v)}  "
+          f"(EMA a={args.alpha}, p={args.percentile}, {len(folds)} folds)")
     print(f"[weights] W={W.tolist()}  B={B:.4f}")
 
     out = Path(args.out_weights)
     out.write_text(
-f"""# Auto-generated by tune_loss.py
+f"""# Auto-generated by tune_loss.py (profile: {args.profile})
 import numpy as np
 W = np.array({W.tolist()}, dtype=np.float32)
 B = {B:.8f}
@@ -96,6 +225,25 @@ THRESH_VIDEO = {THRESH_VIDEO:.6f}  # video-level threshold (EMA+p{int(args.perce
 """
     )
     print(f"[done] wrote {out.resolve()}")
+    # only the profile's own weights path goes live; --out-weights elsewhere is an experiment
+    if not args.no_publish and out.resolve() == Path(paths["weights"]).resolve():
+        import artifacts
+        artifacts.publish(args.profile, scaler_path=args.scaler_cache, weights_path=out)
+
+    if args.grid:
+        if not folds:
+            raise SystemExit("[grid] needs at least 2 validation videos of each class for a held-out F1")
+        import time
+        t0 = time.perf_counter()
+        rows, front = grid_search(pva, yva, gva, args, folds)
+        dt = time.perf_counter() - t0
+        print(f"[grid] {len(rows)} configs in {dt:.2f}s; Pareto front (held-out F1 vs stride):")
+        for r in front:
+            print(f"  stride={r['stride']} a={r['alpha']:.2f} p={r['percentile']:.0f} "
+                  f"k_frac={r['k_frac']:.2f} thr={r['thresh_video']:.3f} F1={r['f1']:.3f} (fit {r['f1_fit']:.3f})")
+        if args.grid_out:
+            Path(args.grid_out).write_text(json.dumps({"best": front[0], "pareto": front}, indent=2))
+            print(f"[done] wrote {Path(args.grid_out).resolve()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,289 @@
+# backend/uploads.py
+"""Chunked, resumable uploads (create -> PUT ranges -> finalize).
+
+Bytes go straight to their final file in UPLOAD_FOLDER (no multipart spool and
+no second copy). State lives next to it in <id>.upload.json, written
+atomically under a per-upload flock, so any gunicorn worker can take the next
+chunk and a dropped connection resumes from `offset`. Chunks must continue
+from the current offset; resent bytes that overlap are skipped.
+
+SHA-256 is computed as the bytes arrive. The running hash object is kept per
+process; if a chunk lands in a process that doesn't hold it (or after a
+restart), the received prefix is rehashed from disk once.
+
+For fast-start MP4s (moov before mdat), start_early() starts scoring while
+chunks are still arriving: a feeder thread tails the growing file into a FIFO
+and OpenCV/FFmpeg decodes from the FIFO, blocking until more bytes are written.
+"""
+from pathlib import Path
+import fcntl
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+
+READ_BLOCK = 1 << 20
+FEED_IDLE_TIMEOUT = 120.0   # seconds without new bytes before an early analysis gives up
+_HASHERS = {}               # upload id -> (offset, sha256), this process only
+_HASH_LOCK = threading.Lock()
+
+class UploadError(Exception):
+    def __init__(self, message: str, status: int = 400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+# ---------- state ----------
+
+def _state_path(folder: Path, upload_id: str) -> Path:
+    return folder / f"{upload_id}.upload.json"
+
+def _save(folder: Path, st: dict):
+    tmp = folder / f"{st['id']}.upload.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps(st))
+    os.replace(tmp, _state_path(folder, st["id"]))
+
+def load(folder: Path, upload_id: str) -> dict:
+    try:
+        uuid.UUID(upload_id)
+        return json.loads(_state_path(folder, upload_id).read_text())
+    except (ValueError, OSError):
+        raise UploadError("unknown upload id", 404)
+
+class _locked:
+    """Exclusive per-upload lock shared by every process."""
+    def __init__(self, folder: Path, upload_id: str):
+        self.path = folder / f"{upload_id}.upload.lock"
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+def create(folder: Path, filename: str, size: int = None, options: dict = None) -> dict:
+    upload_id = str(uuid.uuid4())
+    st = {"id": upload_id, "filename": filename, "path": str(folder / f"{upload_id}_{filename}"),
+          "size": size, "offset": 0, "created": time.time(), "options": options or {},
+          "sha256": None, "early": None}
+    Path(st["path"]).touch()
+    _save(folder, st)
+    return st
+
+def public(st: dict) -> dict:
+    return {"upload_id": st["id"], "offset": st["offset"], "size": st["size"],
+            "complete": st["size"] is not None and st["offset"] >= st["size"],
+            "sha256": st["sha256"], "early_analysis": st["early"]}
+
+# ---------- writing ----------
+
+def _hasher(st: dict):
+    """sha256 object positioned at st['offset'] (rehash the prefix if this process doesn't hold it)."""
+    with _HASH_LOCK:
+        held = _HASHERS.get(st["id"])
+    if held is not None and held[0] == st["offset"]:
+        return held[1]
+    h, left = hashlib.sha256(), st["offset"]
+    with open(st["path"], "rb") as f:
+        while left > 0:
+            b = f.read(min(READ_BLOCK, left))
+            if not b:
+                break
+            h.update(b); left -= len(b)
+    return h
+
+def parse_content_range(header: str, length: int):
+    """'bytes a-b/total' (total may be '*') -> (start, total or None); plain uploads start at 0."""
+    if not header:
+        return 0, None
+    try:
+        unit, rng = header.split(" ", 1)
+        span, total = rng.split("/")
+        start, end = (int(x) for x in span.split("-"))
+    except ValueError:
+        raise UploadError("bad Content-Range; expected 'bytes start-end/total'")
+    if unit != "bytes" or end < start or (length is not None and end - start + 1 != length):
+        raise UploadError("Content-Range does not match the body")
+    return start, (None if total == "*" else int(total))
+
+def write_range(folder: Path, upload_id: str, start: int, stream, total: int = None,
+                max_size: int = None) -> dict:
+    """Append the body at `start` (must be <= offset; overlap is skipped). Returns the new state."""
+    with _locked(folder, upload_id):
+        st = load(folder, upload_id)
+        if total is not None:
+            if st["size"] is not None and st["size"] != total:
+                raise UploadError("total size changed", 409, offset=st["offset"])
+            st["size"] = total
+        if max_size and st["size"] and st["size"] > max_size:
+            raise UploadError("upload too large", 413)
+        if start > st["offset"]:
+            raise UploadError("chunk starts past the received offset", 409, offset=st["offset"])
+        h = _hasher(st)
+        skip = st["offset"] - start
+        fd = os.open(st["path"], os.O_WRONLY)
+        try:
+            while True:
+                b = stream.read(READ_BLOCK)
+                if not b:
+                    break
+                if skip:
+                    cut = min(skip, len(b)); b = b[cut:]; skip -= cut
+                    if not b:
+                        continue
+                if st["size"] is not None and st["offset"] + len(b) > st["size"]:
+                    raise UploadError("body runs past the declared size", 400)
+                os.pwrite(fd, b, st["offset"])
+                h.update(b)
+                st["offset"] += len(b)
+        finally:
+            # a dropped connection keeps what arrived; the client resumes from offset
+            os.close(fd)
+            with _HASH_LOCK:
+                _HASHERS[upload_id] = (st["offset"], h)
+            _save(folder, st)
+        return st
+
+def finalize(folder: Path, upload_id: str, sha256: str = None) -> dict:
+    with _locked(folder, upload_id):
+        st = load(folder, upload_id)
+        if st["size"] is None:
+            st["size"] = st["offset"]
+        if st["offset"] < st["size"]:
+            raise UploadError("upload incomplete", 409, offset=st["offset"], size=st["size"])
+        digest = _hasher(st).hexdigest()
+        if sha256 and sha256.lower() != digest:
+            raise UploadError("sha256 mismatch", 422, sha256=digest)
+        st["sha256"] = digest
+        with _HASH_LOCK:
+            _HASHERS.pop(upload_id, None)
+        _save(folder, st)
+        return st
+
+def set_early(folder: Path, upload_id: str, early: dict):
+    with _locked(folder, upload_id):
+        st = load(folder, upload_id)
+        st["early"] = early
+        _save(folder, st)
+
+# ---------- fast-start detection + early analysis ----------
+
+def fast_start(path: str, received: int):
+    """True if the moov atom is complete before mdat, False if mdat comes first, None if not known yet."""
+    off = 0
+    with open(path, "rb") as f:
+        while off + 8 <= received:
+            f.seek(off)
+            size, kind = struct.unpack(">I4s", f.read(8))
+            if size == 1:
+                if off + 16 > received:
+                    return None
+                size = struct.unpack(">Q", f.read(8))[0]
+            if kind == b"moov":
+                return off + size <= received or None
+            if kind == b"mdat" or size == 0:
+                return False
+            if size < 8:
+                return False
+            off += size
+    return None
+
+def result_path(folder: Path, upload_id: str) -> Path:
+    return folder / f"{upload_id}.result.json"
+
+def _feed(path: str, size: int, fifo: str):
+    """Copy the growing upload into the FIFO; closes it (EOF) at `size` or after an idle timeout."""
+    fed, idle_since = 0, time.monotonic()
+    with open(fifo, "wb") as out, open(path, "rb") as src:
+        while fed < size:
+            b = src.read(min(READ_BLOCK, size - fed))
+            if b:
+                out.write(b); out.flush()
+                fed += len(b); idle_since = time.monotonic()
+            elif time.monotonic() - idle_since > FEED_IDLE_TIMEOUT:
+                break
+            else:
+                time.sleep(0.05)
+    return fed
+
+def start_early(folder: Path, st: dict, analyze) -> bool:
+    """Score the upload from a FIFO while it is still arriving.
+
+    `analyze(video_path)` runs the analysis and returns the result dict; it is
+    written to <id>.result.json together with whether the whole file was fed.
+    """
+    early = {"pid": os.getpid(), "started_at_offset": st["offset"], "status": "running"}
+    with _locked(folder, st["id"]):  # claim it: only one process/request starts the early analysis
+        cur = load(folder, st["id"])
+        if cur["early"] is not None:
+            return False
+        cur["early"] = early
+        _save(folder, cur)
+    tmpdir = tempfile.mkdtemp(prefix="novaguard-")
+    fifo = os.path.join(tmpdir, Path(st["path"]).name)
+    os.mkfifo(fifo)
+    fed = {}
+
+    def feeder():
+        try:
+            fed["bytes"] = _feed(st["path"], st["size"], fifo)
+        except (BrokenPipeError, OSError):
+            fed["bytes"] = -1   # decoder closed the FIFO early (error or frame budget reached)
+
+    def run():
+        t = threading.Thread(target=feeder, daemon=True)
+        t.start()
+        try:
+            res = analyze(Path(fifo))
+            res["video"] = st["path"]
+        except BaseException as e:  # Busy, SystemExit from runner, decode errors
+            res = {"error": repr(e)}
+        finally:
+            if t.is_alive():
+                # unblock a feeder still waiting for a reader, or writing to one that left
+                try:
+                    os.close(os.open(fifo, os.O_RDONLY | os.O_NONBLOCK))
+                except OSError:
+                    pass
+            t.join(timeout=5)
+            try:
+                os.remove(fifo); os.rmdir(tmpdir)
+            except OSError:
+                pass
+        if "error" in res:
+            status = "failed"
+        elif fed.get("bytes") == st["size"] or res.get("partial"):
+            status = "done"
+        else:
+            status = "incomplete"   # upload stalled: the decoder saw EOF before the end
+        tmp = result_path(folder, st["id"]).with_suffix(".tmp")
+        tmp.write_text(json.dumps({"status": status, "result": res}))
+        os.replace(tmp, result_path(folder, st["id"]))
+        set_early(folder, st["id"], dict(early, status=status))
+
+    threading.Thread(target=run, daemon=True).start()
+    return True
+
+def wait_early(folder: Path, st: dict, timeout: float):
+    """(status, result) of a started early analysis after at most `timeout` seconds.
+
+    status is 'done' (result usable), 'running' (not finished in time), or
+    'failed' / 'incomplete' / 'gone' (its process died): result None, analyze the file instead.
+    """
+    rp = result_path(folder, st["id"])
+    deadline = time.monotonic() + timeout
+    while True:
+        if rp.exists():
+            rec = json.loads(rp.read_text())
+            return rec["status"], (rec["result"] if rec["status"] == "done" else None)
+        try:
+            os.kill(st["early"]["pid"], 0)
+        except OSError:
+            return "gone", None  # the worker running it died
+        if time.monotonic() >= deadline:
+            return "running", None
+        time.sleep(0.1)